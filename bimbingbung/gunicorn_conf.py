@@ -0,0 +1,42 @@
+"""Gunicorn settings for serving the site in production.
+
+Used with `gunicorn -c bimbingbung/gunicorn_conf.py bimbingbung.wsgi`. Every setting can be overridden from the
+environment, so the same file serves containers of any size.
+
+Workers are threaded (gthread). Each worker process handles `GUNICORN_THREADS` requests at once. Most requests wait
+on the database, so threads keep a request that waits from holding up the others. gevent would need psycopg2 to be
+patched for cooperative IO, which gthread doesn't.
+"""
+from multiprocessing import cpu_count
+from os import environ
+
+
+def env_int(name, default):
+    return int(environ.get(name, default))
+
+
+bind = environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# One worker per core, and one more so a core isn't idle while a worker restarts
+workers = env_int('GUNICORN_WORKERS', cpu_count() + 1)
+worker_class = 'gthread'
+threads = env_int('GUNICORN_THREADS', 4)
+
+# Workers are restarted when they haven't checked in for this long. Threaded workers check in while their requests
+# run, so this doesn't limit how long a request may take.
+timeout = env_int('GUNICORN_TIMEOUT', 120)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Longer than nginx keeps idle upstream connections open, so nginx always closes them first
+keepalive = env_int('GUNICORN_KEEPALIVE', 75)
+
+# Recycle workers now and then, so a slow leak can't grow without bound. The jitter keeps them from all restarting
+# at the same time.
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 200)
+
+# nginx runs on the same host
+forwarded_allow_ips = environ.get('GUNICORN_FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+accesslog = environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
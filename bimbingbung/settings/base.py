@@ -14,6 +14,8 @@ from __future__ import absolute_import, unicode_literals
 
 from datetime import timedelta
 
+from kombu import Queue
+
 import dj_database_url
 from os import environ
 
@@ -115,11 +117,32 @@ WSGI_APPLICATION = 'bimbingbung.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.10/ref/settings/#databases
 
+# Set DB_POOLER when DATABASE_URL points at a local pooler, like pgbouncer in transaction pooling mode. Connections to
+# the pooler are cheap, so they are closed after every request and task, which returns the server connection to the
+# pool. Otherwise connections are kept open for DB_CONN_MAX_AGE seconds and reused by later requests and tasks.
+DB_POOLER = environ.get('DB_POOLER', '').lower() in ('1', 'true', 'yes')
+DB_CONN_MAX_AGE = int(environ.get('DB_CONN_MAX_AGE', 0 if DB_POOLER else 60))
+
+# Reused connections that were idle for DB_CONN_HEALTH_CHECK_IDLE seconds are checked before the next request or task,
+# and reopened when the database has dropped them. Connections in steady use aren't checked, since it costs a query.
+DB_CONN_HEALTH_CHECKS = environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes')
+DB_CONN_HEALTH_CHECK_IDLE = int(environ.get('DB_CONN_HEALTH_CHECK_IDLE', 30))
+
+DATABASE_URL = environ.get('DATABASE_URL', 'sqlite:///%s' % (os.path.join(BASE_DIR, 'db.sqlite3'),))
+
 DATABASES = {
-    'default': dj_database_url.config(
-        default='sqlite:///%s' % (os.path.join(BASE_DIR, 'db.sqlite3'),))
+    'default': dj_database_url.parse(DATABASE_URL, conn_max_age=DB_CONN_MAX_AGE),
+
+    # Exports stream rows through server-side cursors on a connection of their own. Behind a pooler, point
+    # DATABASE_DIRECT_URL at the database itself, so a long export doesn't hold a pooled connection.
+    'exports': dict(
+        dj_database_url.parse(environ.get('DATABASE_DIRECT_URL', DATABASE_URL), conn_max_age=0),
+        TEST={'MIRROR': 'default'},
+    ),
 }
 
+EXPORT_DATABASE = 'exports'
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.10/topics/i18n/
@@ -177,6 +200,33 @@ REDIS_HOST = "127.0.0.1"
 REDIS_DB = 0
 REDIS_CONNECT_RETRY = True
 
+# Cache, shared by the web and Celery processes when CACHE_URL points at Redis, e.g. redis://127.0.0.1:6379/1. Without
+# it each process caches in its own memory. See `core.cache` for the namespaced keys and their invalidation.
+REDIS_CACHE = {
+    'BACKEND': 'django_redis.cache.RedisCache',
+    'KEY_PREFIX': 'dooit',
+    'OPTIONS': {
+        'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        'SOCKET_CONNECT_TIMEOUT': 1,
+        'SOCKET_TIMEOUT': 1,
+        # A cache that's down is read as empty, rather than failing the request
+        'IGNORE_EXCEPTIONS': True,
+    },
+}
+CACHE_URL = environ.get('CACHE_URL')
+CACHES = {
+    'default': dict(REDIS_CACHE, LOCATION=CACHE_URL) if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Share of cache lookups counted for `./manage.py cache_stats`, from 0 to 1. Each one counted costs another round trip to
+# the cache, so they're not counted unless it's set.
+CACHE_STATS_SAMPLE_RATE = float(environ.get('CACHE_STATS_SAMPLE_RATE', 0))
+
+# Clears the cache before each test, since it isn't rolled back with the test database
+TEST_RUNNER = 'core.testing.TestRunner'
+
 # Broker configuration
 BROKER_HOST = "127.0.0.1"
 BROKER_BACKEND = "redis"
@@ -198,6 +248,48 @@ CELERY_TASK_RESULT_EXPIRES = 10
 CELERYBEAT_SCHEDULER = "djcelery.schedulers.DatabaseScheduler"
 CELERY_ALWAYS_EAGER = False
 
+# Tasks are split over queues, each consumed by its own worker (see docker/supervisor.conf), so long exports can't hold
+# up the periodic tasks. Export tasks named after their export are routed by `content.celery.ExportTaskRouter`.
+CELERY_DEFAULT_QUEUE = 'default'
+CELERY_QUEUES = (
+    Queue('default'),
+    Queue('reports'),
+    Queue('analytics'),
+    Queue('maintenance'),
+)
+CELERY_ROUTES = (
+    {
+        'content.tasks.run_report_job': {'queue': 'reports'},
+        'content.tasks.export_report_chunk': {'queue': 'reports'},
+        'content.tasks.merge_report_chunks': {'queue': 'reports'},
+        'content.tasks.ga_task_handler': {'queue': 'analytics'},
+        'content.tasks.remove_report_archives': {'queue': 'maintenance'},
+    },
+    'content.celery.ExportTaskRouter',
+)
+
+# Workers reserve one task per process by default, so a task never waits behind a long export on a busy process while
+# another is free. Workers of short tasks may reserve more.
+CELERYD_PREFETCH_MULTIPLIER = int(environ.get('CELERYD_PREFETCH_MULTIPLIER', 1))
+
+# Tasks run by a worker process reuse its database connection up to this many times before it's closed
+CELERY_DB_REUSE_MAX = int(environ.get('CELERY_DB_REUSE_MAX', 0 if DB_POOLER else 100))
+
+# Time limits in seconds of generating each export, as (soft, hard). Reaching the soft limit fails the report job. The
+# hard limit replaces the worker process if the task doesn't stop.
+REPORT_TIME_LIMITS = {
+    'default': (30 * 60, 35 * 60),
+    'Survey_Summary': (2 * 60 * 60, 2 * 60 * 60 + 5 * 60),
+    'Baseline_Survey': (4 * 60 * 60, 4 * 60 * 60 + 5 * 60),
+    'Endline_Survey': (4 * 60 * 60, 4 * 60 * 60 + 5 * 60),
+    'EATool1_Survey': (2 * 60 * 60, 2 * 60 * 60 + 5 * 60),
+    'EATool2_Survey': (2 * 60 * 60, 2 * 60 * 60 + 5 * 60),
+}
+
+# Time limits of writing one chunk of a chunked export, and of merging the chunks
+REPORT_CHUNK_TIME_LIMITS = (10 * 60, 11 * 60)
+REPORT_MERGE_TIME_LIMITS = (30 * 60, 35 * 60)
+
 
 CELERYBEAT_SCHEDULE = {
     'remove-report-archives': {
@@ -229,8 +321,9 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        # Requests without a session cookie are passed on without reading the database
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'EXCEPTION_HANDLER': 'bimbingbung.exception_handler.structured_exception_handler',
     'NON_FIELD_ERRORS_KEY': 'errors'
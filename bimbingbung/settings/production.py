@@ -11,6 +11,13 @@ SENDFILE_BACKEND = 'sendfile.backends.nginx'
 SENDFILE_ROOT = os.environ.get('SENDFILE_ROOT', os.path.join(MEDIA_ROOT, 'protected'))
 
 
+# Redis runs alongside the app, see docker/supervisor.conf
+CACHE_URL = os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/1')
+CACHES = {
+    'default': dict(REDIS_CACHE, LOCATION=CACHE_URL),
+}
+
+
 try:
     from .local import *
 except ImportError:
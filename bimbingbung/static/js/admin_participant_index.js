@@ -1,77 +1,98 @@
 $(document).ready(function() {
-        var csrftoken;
-        csrftoken = Cookies.get('csrftoken');
+    var csrftoken = Cookies.get('csrftoken');
 
-       $('.mark-is-read').each(function(index){
-            $(this).change(function(){
-                /*console.log($(this).val() + ':' + this.checked);*/
-                $(".mark-is-read").prop("readonly", true);
-                $.ajax({
-                    beforeSend: function(xhr, settings) {
-                        if (!csrfSafeMethod(settings.type) && !this.crossDomain) {
-                            xhr.setRequestHeader("X-CSRFToken", csrftoken);
-                        }
-                    },
-                    url: '/admin/content/participants/mark-read/' + $(this).val() + '/',
-                    method: "POST"
-                });
-                $(".mark-is-read").prop("readonly", false);
-            });
-       });
+    // Checkbox classes, mapped to the model and flag they moderate
+    var moderationFlags = {
+        'mark-is-read': {model: 'participant', flag: 'is_read'},
+        'mark-is-shortlisted': {model: 'participant', flag: 'is_shortlisted'},
+        'mark-is-winner': {model: 'participant', flag: 'is_winner'},
+        'feedback-mark-is-read': {model: 'feedback', flag: 'is_read'}
+    };
 
-       $('.mark-is-shortlisted').each(function(index){
-            $(this).change(function(){
-                /*console.log($(this).val() + ':' + this.checked);*/
-                $(".mark-is-shortlisted").prop("readonly", true);
-                $.ajax({
-                    beforeSend: function(xhr, settings) {
-                        if (!csrfSafeMethod(settings.type) && !this.crossDomain) {
-                            xhr.setRequestHeader("X-CSRFToken", csrftoken);
-                        }
-                    },
-                    url: '/admin/content/participants/mark-shortlisted/' + $(this).val() + '/',
-                    method: "POST"
-                });
-                $(".mark-is-shortlisted").prop("readonly", false);
-            });
-       });
+    // Changes made in quick succession are sent together, one request per model, flag and value
+    var FLUSH_DELAY = 300;
+    var pending = {};
+    var flushTimer = null;
 
-       $('.mark-is-winner').each(function(index){
-            $(this).change(function(){
-                /*console.log($(this).val() + ':' + this.checked);*/
-                $(".mark-is-winner").prop("readonly", true);
-                $.ajax({
-                    beforeSend: function(xhr, settings) {
-                        if (!csrfSafeMethod(settings.type) && !this.crossDomain) {
-                            xhr.setRequestHeader("X-CSRFToken", csrftoken);
-                        }
-                    },
-                    url: '/admin/content/participants/mark-winner/' + $(this).val() + '/',
-                    method: "POST"
-                });
-                $(".mark-is-winner").prop("readonly", false);
-            });
-       });
+    function checkboxFor(className, id) {
+        return $('.' + className + '[value="' + id + '"]');
+    }
+
+    function flush() {
+        var batches = pending;
+        pending = {};
+        flushTimer = null;
 
-       $('.feedback-mark-is-read').each(function(index){
-            $(this).change(function(){
-                console.log($(this).val() + ':' + this.checked);
-                $(".feedback-mark-is-read").prop("readonly", true);
-                $.ajax({
-                    beforeSend: function(xhr, settings) {
-                        if (!csrfSafeMethod(settings.type) && !this.crossDomain) {
-                            xhr.setRequestHeader("X-CSRFToken", csrftoken);
-                        }
-                    },
-                    url: '/admin/content/feedback/mark-read/' + $(this).val() + '/',
-                    method: "POST"
+        $.each(batches, function(key, batch) {
+            $.ajax({
+                beforeSend: function(xhr, settings) {
+                    if (!csrfSafeMethod(settings.type) && !this.crossDomain) {
+                        xhr.setRequestHeader("X-CSRFToken", csrftoken);
+                    }
+                },
+                url: '/admin/content/moderation/bulk-update/',
+                method: "POST",
+                contentType: 'application/json',
+                data: JSON.stringify({
+                    model: batch.model,
+                    ids: batch.ids,
+                    flags: batch.flags
+                })
+            }).done(function(response) {
+                // Sync with the stored state, in case another moderator changed it in the meantime
+                $.each(response.items, function(index, item) {
+                    checkboxFor(batch.className, item.id).prop('checked', item[batch.flag]);
                 });
-                $(".feedback-mark-is-read").prop("readonly", false);
+            }).fail(function() {
+                // The checkboxes were updated optimistically, so undo the change
+                $.each(batch.ids, function(index, id) {
+                    checkboxFor(batch.className, id).prop('checked', !batch.value);
+                });
+                alert('The changes could not be saved. Please try again.');
             });
-       });
+        });
+    }
+
+    function queueChange(className, id, value) {
+        var target = moderationFlags[className];
+
+        // Only the latest change to a checkbox is sent
+        $.each(pending, function(key, batch) {
+            if (batch.className === className) {
+                batch.ids = $.grep(batch.ids, function(pk) { return pk !== id; });
+                if (batch.ids.length === 0) {
+                    delete pending[key];
+                }
+            }
+        });
+
+        var key = className + ':' + value;
+        if (!pending[key]) {
+            var flags = {};
+            flags[target.flag] = value;
+            pending[key] = {
+                className: className,
+                model: target.model,
+                flag: target.flag,
+                value: value,
+                flags: flags,
+                ids: []
+            };
+        }
+        pending[key].ids.push(id);
+
+        clearTimeout(flushTimer);
+        flushTimer = setTimeout(flush, FLUSH_DELAY);
+    }
+
+    $.each(moderationFlags, function(className) {
+        $(document).on('change', '.' + className, function() {
+            queueChange(className, parseInt($(this).val(), 10), this.checked);
+        });
+    });
 });
 
 function csrfSafeMethod(method) {
     // these HTTP methods do not require CSRF protection
     return (/^(GET|HEAD|OPTIONS|TRACE)$/.test(method));
-}
\ No newline at end of file
+}
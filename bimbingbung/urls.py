@@ -6,6 +6,7 @@ from django.contrib import admin
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken import views as framework_views
 
+from core import views as core_views
 from search import views as search_views
 from content import views as content_views
 from users import views as user_views
@@ -50,6 +51,9 @@ api_urls = [
 
     #all badge url
     url(r'badge-urls/', content_views.BadgesView.as_view(), name='badge-urls'),
+    url(r'badge-manifest/$', content_views.BadgeManifestView.as_view(), name='badge-manifest'),
+    url(r'badge-manifest/(?P<version>[0-9a-f]{40})/$', content_views.BadgeManifestView.as_view(),
+        name='badge-manifest-version'),
 
     # include viewset routes
     url(r'', include(router.urls)),
@@ -66,6 +70,7 @@ urlpatterns = [
     url(r'^documents/', include(wagtaildocs_urls)),
 
     url(r'^search/$', search_views.search, name='search'),
+    url(r'^healthz$', core_views.healthz, name='healthz'),
 
     url(r'^api/', include(api_urls, namespace='api')),
     url(r'^social/', include(social_urls, namespace='social')),
@@ -1,16 +1,12 @@
 from django.conf.urls import url, include
 
-from .admin_views import participant_mark_read, report_goal_exports, report_challenge_exports, report_aggregate_exports, \
-    report_index_page, report_survey_exports, feedback_mark_read, quiz_challenge_entries, report_budget_exports
-
-from .admin_views import participant_mark_shortlisted
-from .admin_views import participant_mark_winner
+from .admin_views import moderation_bulk_update, report_goal_exports, report_challenge_exports, \
+    report_aggregate_exports, report_index_page, report_survey_exports, quiz_challenge_entries, report_budget_exports, \
+    participant_picture_review, report_jobs_page, report_job_download
 
 urlpatterns = [
-    # Participants
-    url(r'^participants/mark-read/(?P<participant_pk>\d+)/$', participant_mark_read, name='participant-mark-read'),
-    url(r'^participants/mark-shortlisted/(?P<participant_pk>\d+)/$', participant_mark_shortlisted, name='participant-mark-shortlisted'),
-    url(r'^participants/mark-winner/(?P<participant_pk>\d+)/$', participant_mark_winner, name='participant-mark-winner'),
+    # Participant and feedback moderation
+    url(r'^moderation/bulk-update/$', moderation_bulk_update, name='moderation-bulk-update'),
 
     # Reports
     url(r'^reports/$', report_index_page, name='reports-index'),
@@ -19,10 +15,12 @@ urlpatterns = [
     url(r'^reports/aggregates/$', report_aggregate_exports, name='reports-aggregates'),
     url(r'^reports/surveys/$', report_survey_exports, name='reports-surveys'),
     url(r'^reports/budget/$', report_budget_exports, name='reports-budget'),
+    url(r'^reports/jobs/$', report_jobs_page, name='reports-jobs'),
+    url(r'^reports/jobs/(?P<job_pk>\d+)/download/$', report_job_download, name='reports-job-download'),
 
     # Custom quiz entry view
     url(r'^challenge/quizentries/$', quiz_challenge_entries, name='challenge-quizentries'),
 
-    # Feedback controls
-    url(r'^feedback/mark-read/(?P<feedback_pk>\d+)/$', feedback_mark_read, name='feedback-mark-read'),
+    # Picture submission review gallery
+    url(r'^challenge/picturereview/$', participant_picture_review, name='challenge-picturereview'),
 ]
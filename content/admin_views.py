@@ -1,27 +1,46 @@
 from datetime import datetime
+import json
+import os
 
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Prefetch
+from django.template.loader import get_template, render_to_string
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
 from django.shortcuts import render, redirect, get_object_or_404, reverse
 from django.contrib.auth.decorators import permission_required
+from django.http import Http404, HttpResponseBadRequest
 from django.http.response import JsonResponse, StreamingHttpResponse
 from django.utils.translation import ugettext_lazy as _
 
+from sendfile import sendfile
 from wagtail.wagtailadmin import messages
 
-from content.analytics_api import initialize_analytics_reporting, get_report, connect_ga_to_user
+from content.analytics_api import initialize_analytics_reporting, sync_ga_campaigns
 
-from content.tasks import export_goal_summary, export_user_summary, export_challenge_summary, \
-    export_challenge_quiz_summary, export_challenge_picture, export_challenge_freetext, export_challenge_quiz, \
-    export_savings_summary, export_aggregate_summary, export_aggregate_goal_data_per_category, \
-    export_aggregate_rewards_data, export_aggregate_data_per_badge, export_aggregate_data_per_streak, \
-    export_aggregate_user_type, export_survey_summary, export_baseline_survey, export_ea1tool_survey, \
-    export_ea2tool_survey, export_endline_survey, export_budget_user, export_budget_expense_category, \
-    export_budget_aggregate
+from content.tasks import start_report_job, dispatch_report_job, get_archive_filename
 
-from .models import Challenge, Participant, Feedback
+from .models import Challenge, Participant, ParticipantPicture, Feedback, Entry, ParticipantAnswer, ReportJob
 
 
-SUCCESS_MESSAGE_EMAIL_SENT = _('Report and password has been sent in an email.')
+SUCCESS_MESSAGE_REPORT_QUEUED = _('The report is being generated. The password will be sent in an email.')
+WARNING_MESSAGE_REPORT_IN_FLIGHT = _('This report is already being generated.')
+
+REPORT_JOBS_PAGE_SIZE = 25
+
+QUIZ_ENTRIES_PAGE_SIZE = 50
+QUIZ_ENTRIES_PLACEHOLDER = '<!-- quiz entries -->'
+
+PICTURE_REVIEW_PAGE_SIZE = 48
+
+# Bulk actions on the picture review page, mapped to the participant fields they update
+PICTURE_REVIEW_ACTIONS = {
+    'SHORTLIST': {'is_shortlisted': True},
+    'UNSHORTLIST': {'is_shortlisted': False},
+    'WINNER': {'is_winner': True},
+    'UNWINNER': {'is_winner': False},
+    'READ': {'is_read': True},
+}
 
 
 def participant_list_view(request):
@@ -32,40 +51,40 @@ def participant_list_view(request):
     return render(request, 'content/admin/participant/list.html', context)
 
 
-@permission_required('participant.can_change')
-@ensure_csrf_cookie
-def participant_mark_read(request, participant_pk):
-    participant = get_object_or_404(Participant, pk=participant_pk)
-    participant.is_read = not participant.is_read
-    participant.save()
-    return JsonResponse({})
+# Models that can be moderated in bulk, with the flags that may be changed and the permission required to do so
+MODERATION_MODELS = {
+    'participant': (Participant, ('is_read', 'is_shortlisted', 'is_winner'), 'participant.can_change'),
+    'feedback': (Feedback, ('is_read',), 'feedback.can_change'),
+}
 
 
-@permission_required('participant.can_change')
-@ensure_csrf_cookie
-def participant_mark_shortlisted(request, participant_pk):
-    participant = get_object_or_404(Participant, pk=participant_pk)
-    participant.is_shortlisted = not participant.is_shortlisted
-    participant.save()
-    return JsonResponse({})
+@require_POST
+def moderation_bulk_update(request):
+    """Sets moderation flags on a list of participants or feedback entries with a single update.
 
+    Expects a JSON body like `{"model": "participant", "ids": [1, 2], "flags": {"is_shortlisted": true}}`, and responds
+    with the resulting flags of each object.
+    """
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        model, allowed_flags, permission = MODERATION_MODELS[data['model']]
+        ids = [int(pk) for pk in data['ids']]
+        flags = data['flags']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid moderation request.'}, status=400)
 
-@permission_required('participant.can_change')
-@ensure_csrf_cookie
-def participant_mark_winner(request, participant_pk):
-    participant = get_object_or_404(Participant, pk=participant_pk)
-    participant.is_winner = not participant.is_winner
-    participant.save()
-    return JsonResponse({})
+    if not request.user.has_perm(permission):
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
 
+    if not flags or any(f not in allowed_flags or not isinstance(v, bool) for f, v in flags.items()):
+        return JsonResponse({'error': 'Invalid moderation flags.'}, status=400)
 
-@permission_required('feedback.can_change')
-@ensure_csrf_cookie
-def feedback_mark_read(request, feedback_pk):
-    feedback = get_object_or_404(Feedback, pk=feedback_pk)
-    feedback.is_read = not feedback.is_read
-    feedback.save()
-    return JsonResponse({})
+    queryset = model.objects.filter(pk__in=ids)
+    queryset.update(**flags)
+
+    return JsonResponse({
+        'items': list(queryset.values('id', *allowed_flags))
+    })
 
 
 #############
@@ -87,6 +106,47 @@ def report_index_page(request):
     return render(request, 'admin/reports/index.html')
 
 
+def queue_report_job(request, export_name, unique_time, **options):
+    job, created = start_report_job(request.user, export_name, unique_time, **options)
+    if created:
+        messages.success(request, SUCCESS_MESSAGE_REPORT_QUEUED)
+    else:
+        messages.warning(request, WARNING_MESSAGE_REPORT_IN_FLIGHT)
+    return redirect(reverse('content-admin:reports-jobs'))
+
+
+@permission_required('content.access_reports')
+def report_jobs_page(request):
+    if request.method == 'POST':
+        if request.POST.get('action') == 'RESUME':
+            job = get_object_or_404(ReportJob.objects.exclude(state=ReportJob.STATE_DONE), pk=request.POST.get('job'))
+            dispatch_report_job(job)
+            messages.success(request, _('Resuming %s.') % job)
+        return redirect(reverse('content-admin:reports-jobs'))
+
+    paginator = Paginator(ReportJob.objects.select_related('requested_by'), REPORT_JOBS_PAGE_SIZE)
+    try:
+        page = paginator.page(request.GET.get('p', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+
+    return render(request, 'admin/reports/jobs.html', context={'page': page})
+
+
+@permission_required('content.access_reports')
+def report_job_download(request, job_pk):
+    """The password protected archive of a finished report."""
+    job = get_object_or_404(ReportJob, pk=job_pk, state=ReportJob.STATE_DONE)
+
+    filename = get_archive_filename(job)
+    if not os.path.isfile(filename):
+        raise Http404('The report archive has been removed.')
+
+    return sendfile(request, filename, attachment=True, attachment_filename=str(job) + '.zip')
+
+
 # Challenge reports
 def report_challenge_exports(request):
 
@@ -107,10 +167,7 @@ def report_challenge_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_challenge_summary.delay(request.user.email, export_name, unique_time, date_from=date_from, date_to=date_to)
-
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-challenges'))
+            return queue_report_job(request, export_name, unique_time, date_from=date_from, date_to=date_to)
         elif request.POST.get('action') == 'EXPORT-CHALLENGE-QUIZ-SUMMARY':
             export_name = 'Challenge_Quiz_Summary'
             unique_time = get_report_generation_time()
@@ -119,9 +176,7 @@ def report_challenge_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_challenge_quiz_summary.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-challenges'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-CHALLENGE-PICTURE':
             challenge_name = request.POST['picture-challenge-name']
             export_name = 'Challenge_Picture'
@@ -130,9 +185,7 @@ def report_challenge_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_challenge_picture.delay(request.user.email, export_name, unique_time, challenge_name=challenge_name)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-challenges'))
+            return queue_report_job(request, export_name, unique_time, challenge_name=challenge_name)
         elif request.POST.get('action') == 'EXPORT-CHALLENGE-QUIZ':
             challenge_name = request.POST['quiz-challenge-name']
             export_name = 'Challenge_Quiz'
@@ -141,9 +194,7 @@ def report_challenge_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_challenge_quiz.delay(request.user.email, export_name, unique_time, challenge_name=challenge_name)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-challenges'))
+            return queue_report_job(request, export_name, unique_time, challenge_name=challenge_name)
         elif request.POST.get('action') == 'EXPORT-CHALLENGE-FREETEXT':
             challenge_name = request.POST['freetext-challenge-name']
             export_name = 'Challenge_Freetext'
@@ -152,9 +203,7 @@ def report_challenge_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_challenge_freetext.delay(request.user.email, export_name, unique_time, challenge_name=challenge_name)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-challenges'))
+            return queue_report_job(request, export_name, unique_time, challenge_name=challenge_name)
     elif request.method == 'GET':
         context = {
             'quiz_challenges': list(Challenge.objects.filter(type=Challenge.CTP_QUIZ)),
@@ -179,9 +228,7 @@ def report_goal_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_goal_summary.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-goals'))
+            return queue_report_job(request, export_name, unique_time)
             # return response
         elif request.POST.get('action') == 'EXPORT-USER':
             export_name = 'User_Summary'
@@ -191,9 +238,7 @@ def report_goal_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_user_summary.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-goals'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-SAVINGS':
             export_name = 'Savings_Summary'
             unique_time = get_report_generation_time()
@@ -202,9 +247,7 @@ def report_goal_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_savings_summary.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-goals'))
+            return queue_report_job(request, export_name, unique_time)
     elif request.method == 'GET':
         return render(request, 'admin/reports/goals.html')
 
@@ -223,9 +266,7 @@ def report_aggregate_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_aggregate_summary.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-aggregates'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-AGGREGATE-GOAL-PER-CATEGORY':
             export_name = 'Aggregate_Goal_Per_Category'
             unique_time = get_report_generation_time()
@@ -234,9 +275,7 @@ def report_aggregate_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_aggregate_goal_data_per_category.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-aggregates'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-AGGREGATE-REWARDS-DATA':
             export_name = 'Aggregate_Rewards_Data'
             unique_time = get_report_generation_time()
@@ -245,9 +284,7 @@ def report_aggregate_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_aggregate_rewards_data.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-aggregates'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-AGGREGATE-DATA-PER-BADGE':
             export_name = 'Aggregate_Data_Per_Badge'
             unique_time = get_report_generation_time()
@@ -256,9 +293,7 @@ def report_aggregate_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_aggregate_data_per_badge.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-aggregates'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-AGGREGATE-DATA-PER-STREAK':
             export_name = 'Aggregate_Data_Per_Streak'
             unique_time = get_report_generation_time()
@@ -267,9 +302,7 @@ def report_aggregate_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_aggregate_data_per_streak.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-aggregates'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-AGGREGATE-USER-TYPE':
             export_name = 'Aggregate_User_Type'
             unique_time = get_report_generation_time()
@@ -278,14 +311,12 @@ def report_aggregate_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_aggregate_user_type.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-aggregates'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'RECONCILE-GA-CAMPAIGN':
             print("Starting GA connection")
             analytics = initialize_analytics_reporting()
-            response = get_report(analytics)
-            connect_ga_to_user(response)
+            # Reconciling by hand goes over the whole window, in case the scheduled syncs missed anything
+            sync_ga_campaigns(analytics, full=True)
             print("Finished GA connection")
             return render(request, 'admin/reports/aggregates.html')
     elif request.method == 'GET':
@@ -306,9 +337,7 @@ def report_survey_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_survey_summary.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-surveys'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-BASELINE-SURVEY':
             export_name = 'Baseline_Survey'
             unique_time = get_report_generation_time()
@@ -317,9 +346,7 @@ def report_survey_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_baseline_survey.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-surveys'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-EATOOL1-SURVEY':
             export_name = 'EATool1_Survey'
             unique_time = get_report_generation_time()
@@ -328,9 +355,7 @@ def report_survey_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_ea1tool_survey.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-surveys'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-EATOOL2-SURVEY':
             export_name = 'EATool2_Survey'
             unique_time = get_report_generation_time()
@@ -339,9 +364,7 @@ def report_survey_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_ea2tool_survey.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-surveys'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-ENDLINE-SURVEY':
             export_name = 'Endline_Survey'
             unique_time = get_report_generation_time()
@@ -350,20 +373,124 @@ def report_survey_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_endline_survey.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-surveys'))
+            return queue_report_job(request, export_name, unique_time)
     elif request.method == 'GET':
         return render(request, 'admin/reports/surveys.html')
 
 
+def get_quiz_entry_participants(challenge):
+    """Participants of a quiz challenge, with their entries, answers and the selected options loaded up front."""
+    answers = ParticipantAnswer.objects \
+        .select_related('question', 'selected_option') \
+        .order_by('question__order', 'id')
+    entries = Entry.objects \
+        .prefetch_related(Prefetch('answers', queryset=answers)) \
+        .order_by('id')
+
+    return Participant.objects \
+        .filter(user__is_staff=False, challenge=challenge) \
+        .select_related('user', 'user__profile') \
+        .prefetch_related(Prefetch('entries', queryset=entries)) \
+        .order_by('id')
+
+
 def quiz_challenge_entries(request):
+    """Quiz submissions of one challenge, a page of participants at a time.
+
+    The page around the entries is rendered first, and each participant's table is streamed as it is rendered.
+    """
     if request.method == 'GET':
+        quiz_challenges = list(Challenge.objects.filter(type=Challenge.CTP_QUIZ).order_by('name'))
+
+        challenge = None
+        challenge_id = request.GET.get('challenge', '')
+        for c in quiz_challenges:
+            if str(c.pk) == challenge_id:
+                challenge = c
+        if challenge is None and quiz_challenges:
+            challenge = quiz_challenges[0]
+
+        page = None
+        if challenge is not None:
+            paginator = Paginator(get_quiz_entry_participants(challenge), QUIZ_ENTRIES_PAGE_SIZE)
+            try:
+                page = paginator.page(request.GET.get('p', 1))
+            except PageNotAnInteger:
+                page = paginator.page(1)
+            except EmptyPage:
+                page = paginator.page(paginator.num_pages)
+
         context = {
-            'quiz_challenges': list(Challenge.objects.filter(type=Challenge.CTP_QUIZ))
+            'quiz_challenges': quiz_challenges,
+            'challenge': challenge,
+            'page': page,
+            'entries_placeholder': QUIZ_ENTRIES_PLACEHOLDER,
         }
+        head, tail = render_to_string('admin/challenge/quizentries.html', context=context, request=request) \
+            .split(QUIZ_ENTRIES_PLACEHOLDER, 1)
+
+        def stream():
+            yield head
+            if page is not None:
+                row_template = get_template('admin/challenge/quizentry_row.html')
+                for participant in page:
+                    entry = next(iter(participant.entries.all()), None)
+                    yield row_template.render({
+                        'participant': participant,
+                        'challenge': challenge,
+                        'answers': entry.answers.all() if entry is not None else [],
+                    })
+            yield tail
+
+        return StreamingHttpResponse(stream())
+
+
+@permission_required('participant.can_change')
+@ensure_csrf_cookie
+def participant_picture_review(request):
+    """Gallery of picture challenge submissions for picking shortlists and winners."""
+    if request.method == 'POST':
+        fields = PICTURE_REVIEW_ACTIONS.get(request.POST.get('action'), None)
+        participant_ids = request.POST.getlist('participant')
+        if not all(pk.isdigit() for pk in participant_ids):
+            return HttpResponseBadRequest(_('Invalid participant.'))
+        if fields is not None and participant_ids:
+            updated = Participant.objects.filter(pk__in=participant_ids).update(**fields)
+            messages.success(request, _('%d participants updated.') % updated)
+        return redirect(request.get_full_path())
+
+    pictures = ParticipantPicture.objects \
+        .exclude(picture='') \
+        .select_related('participant', 'participant__user', 'participant__user__profile', 'participant__challenge') \
+        .order_by('-date_answered', '-id')
+
+    challenge_id = request.GET.get('challenge', '')
+    if challenge_id.isdigit():
+        pictures = pictures.filter(participant__challenge_id=challenge_id)
+    if request.GET.get('shortlisted') == '1':
+        pictures = pictures.filter(participant__is_shortlisted=True)
+    if request.GET.get('winner') == '1':
+        pictures = pictures.filter(participant__is_winner=True)
+
+    paginator = Paginator(pictures, PICTURE_REVIEW_PAGE_SIZE)
+    try:
+        page = paginator.page(request.GET.get('p', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+
+    filters = request.GET.copy()
+    filters.pop('p', None)
+
+    context = {
+        'page': page,
+        'filters': filters.urlencode(),
+        'challenges': Challenge.objects.filter(type=Challenge.CTP_PICTURE).order_by('-activation_date'),
+        'selected_challenge': challenge_id,
+    }
 
-        return render(request, 'admin/challenge/quizentries.html', context=context)
+    return render(request, 'admin/challenge/picturereview.html', context=context)
 
 
 # Budget exports
@@ -380,9 +507,7 @@ def report_budget_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_budget_user.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-budget'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-BUDGET-EXPENSE-CATEGORY':
             export_name = 'Budget_Expense_Category'
             unique_time = get_report_generation_time()
@@ -391,9 +516,7 @@ def report_budget_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_budget_expense_category.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-budget'))
+            return queue_report_job(request, export_name, unique_time)
         elif request.POST.get('action') == 'EXPORT-BUDGET-AGGREGATE':
             export_name = 'Budget_Aggregate'
             unique_time = get_report_generation_time()
@@ -402,8 +525,6 @@ def report_budget_exports(request):
                                               + export_name \
                                               + unique_time \
                                               + '.zip'
-            export_budget_aggregate.delay(request.user.email, export_name, unique_time)
-            messages.success(request, SUCCESS_MESSAGE_EMAIL_SENT)
-            return redirect(reverse('content-admin:reports-budget'))
+            return queue_report_job(request, export_name, unique_time)
     elif request.method == 'GET':
         return render(request, 'admin/reports/budget.html')
@@ -1,16 +1,35 @@
+from collections import defaultdict
+from datetime import timedelta
 from os import environ
+import uuid
 
+from django.db import transaction
+from django.utils import timezone
 from googleapiclient.discovery import build
 from oauth2client.service_account import ServiceAccountCredentials
 
 import httplib2
 
+from content.models import AnalyticsSyncMark
 from users.models import CampaignInformation, UserUUID
 
 SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
 DISCOVERY_URI = ('https://analyticsreporting.googleapis.com/$discovery/rest')
 VIEW_ID = environ.get('VIEW_ID', '')
 
+# GAIDs and campaign information looked up per query
+GA_BATCH_SIZE = 500
+
+# Rows requested per page of the campaign report. The API allows up to 100,000.
+GA_PAGE_SIZE = 10000
+
+# The campaign sync's watermark, see `content.models.AnalyticsSyncMark`
+GA_CAMPAIGN_SOURCE = 'ga-campaigns'
+
+# Days synced when there's no watermark yet, and days before the watermark synced again, since GA processes data late
+GA_INITIAL_DAYS = 90
+GA_SYNC_OVERLAP_DAYS = 2
+
 
 def initialize_analytics_reporting():
     """Initializes an analyticsreporting service object.
@@ -47,92 +66,174 @@ def initialize_analytics_reporting():
     return analytics
 
 
-def get_report(analytics):
-    # Use the Analytics Service Object to query the Analytics Reporting API V4.
+def get_report(analytics, start_date, end_date, page_token=None):
+    """Requests a page of campaign rows from the Analytics Reporting API V4.
+
+    :param start_date: The first day to report, as a date.
+    :param end_date:   The last day to report, as a date.
+    :param page_token: The `nextPageToken` of the previous page. The first page is requested without it.
+    """
+    report_request = {
+        'viewId': VIEW_ID,
+        'dateRanges': [{'startDate': start_date.isoformat(), 'endDate': end_date.isoformat()}],
+        'metrics': [{'expression': 'ga:newUsers'}],
+        'dimensions': [
+            {'name': 'ga:dimension1'},
+            {'name': 'ga:campaign'},
+            {'name': 'ga:source'},
+            {'name': 'ga:medium'},
+        ],
+        'pageSize': GA_PAGE_SIZE,
+    }
+    if page_token:
+        report_request['pageToken'] = page_token
+
+    return analytics.reports().batchGet(body={'reportRequests': [report_request]}).execute()
+
+
+def get_next_page_token(response):
+    for report in response.get('reports', []):
+        if report.get('nextPageToken'):
+            return report['nextPageToken']
+    return None
+
+
+def sync_ga_campaigns(analytics, today=None, full=False):
+    """Connects the campaigns of users reported by Google Analytics since the last sync.
+
+    The days after the stored watermark are requested, along with a few days before it, since GA keeps processing data
+    for a while after the fact. Every page of the report is reconciled, and reconciling is idempotent, so overlapping
+    days and runs that failed halfway can safely be synced again. The watermark only moves once all pages are read.
 
+    :param today: The last day to sync, today by default.
+    :param full:  Sync the whole initial window again, regardless of the watermark.
+    :return:      The numbers of campaign information created and updated.
+    """
     if analytics is None:
         print('Unable to initiate analytics')
-        return
+        return 0, 0
 
-    return analytics.reports().batchGet(
-        body={
-            'reportRequests': [
-                {
-                    'viewId': VIEW_ID,
-                    'dateRanges': [{'startDate': '90daysAgo', 'endDate': 'today'}],
-                    'metrics': [{'expression': 'ga:newUsers'}],
-                    'dimensions': [
-                        {'name': 'ga:dimension1'},
-                        {'name': 'ga:campaign'},
-                        {'name': 'ga:source'},
-                        {'name': 'ga:medium'},
-                    ],
-                }]
-        }
-    ).execute()
+    if today is None:
+        today = timezone.localtime(timezone.now()).date()
 
+    mark, _ = AnalyticsSyncMark.objects.get_or_create(source=GA_CAMPAIGN_SOURCE)
+    if full or mark.last_date is None:
+        start_date = today - timedelta(days=GA_INITIAL_DAYS)
+    else:
+        start_date = mark.last_date - timedelta(days=GA_SYNC_OVERLAP_DAYS)
 
-def connect_ga_to_user(response):
-    """Reads the data return from the Analytics API
-    Collects the campaign, source and medium information and creates a CampaignInformation
-    linking to the user.
-    """
+    created = updated = 0
+    page_token = None
+    while True:
+        response = get_report(analytics, start_date, today, page_token)
+        page_created, page_updated = connect_ga_to_user(response)
+        created += page_created
+        updated += page_updated
 
-    if response is None:
-        return
+        page_token = get_next_page_token(response)
+        if not page_token:
+            break
 
-    for report in response.get('reports', []):
-        column_header = report.get('columnHeader', {})
-        dimension_headers = column_header.get('dimensions', [])
-        rows = report.get('data', {}).get('rows', [])
+    if mark.last_date is None or today > mark.last_date:
+        mark.last_date = today
+        mark.save(update_fields=['last_date', 'updated_at'])
+    return created, updated
 
-        for row in rows:
-            dimensions = row.get('dimensions', [])
 
-            user_uuid = None
-            campaign = ''
-            source = ''
-            medium = ''
+def get_campaign_rows(response):
+    """Reads the campaign rows of an Analytics API response.
 
-            try:
-                user_uuid = UserUUID.objects.get(gaid=dimensions[0])
-            except UserUUID.DoesNotExist:
-                # No user with that GAID exists
+    :return: A list of (GAID, campaign, source, medium) tuples, in the order of the response. Rows with incomplete data
+             or a malformed GAID are left out.
+    """
+    if response is None:
+        return []
+
+    campaign_rows = []
+    for report in response.get('reports', []):
+        for row in report.get('data', {}).get('rows', []):
+            dimensions = row.get('dimensions', [])
+            if len(dimensions) < 4:
+                # GA returned incomplete data
                 continue
 
             try:
-                campaign = dimensions[1]
-                source = dimensions[2]
-                medium = dimensions[3]
-            except IndexError:
-                # GA returned incomplete data
+                gaid = uuid.UUID(dimensions[0])
+            except ValueError:
                 continue
 
-            # print("C: " + campaign + "  S: " + source + "  M: " + medium)
-
-            if CampaignInformation.objects.filter(user_uuid=user_uuid).exists():
-                # If user's campaign information is not set, set to what GA has returned
-                ci = CampaignInformation.objects.get(user_uuid=user_uuid)
-                if ci.campaign == '':
-                    ci.campaign = campaign
-                if ci.source == '':
-                    ci.source = source
-                if ci.medium == '':
-                    ci.medium = medium
-                ci.save()
-            else:
-                # Setting campaign info for the first time for user
-                CampaignInformation.objects.create(user=user_uuid.user,
-                                                   user_uuid=user_uuid,
-                                                   campaign=campaign,
-                                                   source=source,
-                                                   medium=medium)
+            campaign_rows.append((gaid, dimensions[1], dimensions[2], dimensions[3]))
+    return campaign_rows
+
+
+def in_batches(values, batch_size=GA_BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), batch_size):
+        yield values[start:start + batch_size]
+
+
+@transaction.atomic
+def connect_ga_to_user(response):
+    """Reads the data return from the Analytics API
+    Collects the campaign, source and medium information and creates a CampaignInformation
+    linking to the user.
+
+    Information that's already set is kept, only empty fields are filled in. The users and their campaign information
+    are read in bulk, new information is inserted in bulk, and changes are written with an update per field and value.
+
+    :return: The numbers of campaign information created and updated.
+    """
+    rows = get_campaign_rows(response)
+
+    user_uuids = {}
+    for gaids in in_batches({row[0] for row in rows}):
+        user_uuids.update((user_uuid.gaid, user_uuid) for user_uuid in UserUUID.objects.filter(gaid__in=gaids))
+
+    infos = {}
+    for uuid_ids in in_batches(user_uuid.id for user_uuid in user_uuids.values()):
+        infos.update((info.user_uuid_id, info)
+                     for info in CampaignInformation.objects.filter(user_uuid_id__in=uuid_ids))
+
+    created = []
+    changes = defaultdict(dict)
+    for gaid, campaign, source, medium in rows:
+        user_uuid = user_uuids.get(gaid)
+        if user_uuid is None:
+            # No user with that GAID exists
+            continue
+
+        info = infos.get(user_uuid.id)
+        if info is None:
+            # Setting campaign info for the first time for user
+            info = CampaignInformation(user_id=user_uuid.user_id, user_uuid=user_uuid,
+                                       campaign=campaign, source=source, medium=medium)
+            infos[user_uuid.id] = info
+            created.append(info)
+            continue
+
+        # If user's campaign information is not set, set to what GA has returned
+        for field, value in (('campaign', campaign), ('source', source), ('medium', medium)):
+            if getattr(info, field) == '':
+                setattr(info, field, value)
+                if info.pk is not None:
+                    changes[info.pk][field] = value
+
+    CampaignInformation.objects.bulk_create(created)
+
+    updates = defaultdict(list)
+    for pk, fields in changes.items():
+        for field, value in fields.items():
+            updates[(field, value)].append(pk)
+    for (field, value), pks in updates.items():
+        for batch in in_batches(pks):
+            CampaignInformation.objects.filter(pk__in=batch).update(**{field: value})
+
+    return len(created), len(changes)
 
 
 def main():
     analytics = initialize_analytics_reporting()
-    response = get_report(analytics)
-    connect_ga_to_user(response)
+    sync_ga_campaigns(analytics)
 
 
 if __name__ == '__main__':
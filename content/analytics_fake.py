@@ -0,0 +1,53 @@
+import json
+
+
+class FakeRequest(object):
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeAnalyticsReporting(object):
+    """Stands in for the Analytics Reporting API service returned by `initialize_analytics_reporting`, for tests and
+    local development without Google credentials.
+
+    It serves a fixed list of rows in pages, with page tokens like the API's, and keeps the body of every request so
+    the requested date ranges and pages can be checked.
+    """
+
+    def __init__(self, rows, column_header=None, page_size=1000):
+        self.rows = rows
+        self.column_header = column_header or {}
+        self.page_size = page_size
+        self.requests = []
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Serves the rows of a recorded API response."""
+        with open(path) as f:
+            report = json.load(f)['reports'][0]
+        return cls(report.get('data', {}).get('rows', []), report.get('columnHeader'), **kwargs)
+
+    def reports(self):
+        return self
+
+    def batchGet(self, body):
+        self.requests.append(body)
+        report_request = body['reportRequests'][0]
+
+        start = int(report_request.get('pageToken') or 0)
+        end = start + min(report_request.get('pageSize', self.page_size), self.page_size)
+
+        report = {
+            'columnHeader': self.column_header,
+            'data': {
+                'rows': self.rows[start:end],
+                'rowCount': len(self.rows),
+            },
+        }
+        if end < len(self.rows):
+            report['nextPageToken'] = str(end)
+
+        return FakeRequest({'reports': [report]})
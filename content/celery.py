@@ -13,3 +13,12 @@ app = Celery('hello_django')
 # pickle the object when using Windows.
 app.config_from_object('django.conf:settings')
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
+
+
+class ExportTaskRouter(object):
+    """Routes the tasks that generate an export, which are named after it, to the reports queue."""
+
+    def route_for_task(self, task, args=None, kwargs=None):
+        if task.startswith('export_'):
+            return {'queue': 'reports'}
+        return None
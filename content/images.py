@@ -0,0 +1,174 @@
+from collections import OrderedDict
+from hashlib import sha1
+from io import BytesIO
+import json
+from os.path import splitext
+
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from core.cache import get_or_set
+
+from .exceptions import InvalidQueryParam
+from .models import Badge
+
+
+# Size variants served by the image endpoints, as the maximum length of the longest side in pixels
+IMAGE_SIZES = OrderedDict((
+    ('thumb', 100),
+    ('medium', 480),
+))
+
+# Renditions of the badge art listed in the badge manifest, per Android screen density. Badges are shown at 96dp.
+BADGE_RENDITION_FILTERS = OrderedDict((
+    ('mdpi', 'max-96x96'),
+    ('hdpi', 'max-144x144'),
+    ('xhdpi', 'max-192x192'),
+    ('xxhdpi', 'max-288x288'),
+))
+
+RENDITION_FORMAT = 'JPEG'
+RENDITION_EXTENSION = '.jpg'
+RENDITION_QUALITY = 80
+
+# Phone cameras store rotation as EXIF metadata. Renditions are saved without EXIF, so the rotation is applied to the
+# pixels instead.
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_ORIENTATION_TRANSPOSES = {
+    2: (Image.FLIP_LEFT_RIGHT,),
+    3: (Image.ROTATE_180,),
+    4: (Image.FLIP_TOP_BOTTOM,),
+    5: (Image.ROTATE_270, Image.FLIP_LEFT_RIGHT),
+    6: (Image.ROTATE_270,),
+    7: (Image.ROTATE_90, Image.FLIP_LEFT_RIGHT),
+    8: (Image.ROTATE_90,),
+}
+
+
+def get_rendition_name(name, size):
+    return '{}.{}{}'.format(splitext(name)[0], size, RENDITION_EXTENSION)
+
+
+def get_requested_size(request):
+    """Returns the image size requested with the `size` query param, or None for the original image."""
+    size = request.query_params.get('size', None)
+    if size is not None and size not in IMAGE_SIZES:
+        raise InvalidQueryParam('Image size must be one of: {}'.format(', '.join(IMAGE_SIZES.keys())))
+    return size
+
+
+def get_image_path(field_file, size=None):
+    """Path of the requested size variant of an image. Falls back to the original while variants are still being
+    generated.
+    """
+    if size is not None:
+        rendition_name = get_rendition_name(field_file.name, size)
+        if field_file.storage.exists(rendition_name):
+            return field_file.storage.path(rendition_name)
+    return field_file.path
+
+
+def delete_renditions(field_file):
+    """Removes the size variants of an image. Replaced images can be saved under the name of the old one, which would
+    otherwise still be served in its place until the new variants are generated.
+    """
+    for size in IMAGE_SIZES:
+        field_file.storage.delete(get_rendition_name(field_file.name, size))
+
+
+def orient(image):
+    try:
+        exif = image._getexif() or {}
+    except (AttributeError, IndexError, KeyError, OSError):
+        # Not a JPEG, or the EXIF data is malformed
+        exif = {}
+
+    for method in EXIF_ORIENTATION_TRANSPOSES.get(exif.get(EXIF_ORIENTATION_TAG), ()):
+        image = image.transpose(method)
+    return image
+
+
+def create_renditions(field_file):
+    """Generates the size variants of an uploaded image next to the original in the same storage.
+
+    Variants are re-encoded as JPEG without metadata, which removes EXIF data such as location from the images served
+    to other users. The original is kept as uploaded.
+    """
+    storage = field_file.storage
+
+    with storage.open(field_file.name, 'rb') as f:
+        original = Image.open(f)
+        original.load()
+
+    original = orient(original)
+    if original.mode in ('RGBA', 'LA', 'P'):
+        # JPEG has no transparency
+        original = original.convert('RGBA')
+        background = Image.new('RGB', original.size, (255, 255, 255))
+        background.paste(original, mask=original.split()[-1])
+        original = background
+    elif original.mode != 'RGB':
+        original = original.convert('RGB')
+
+    for size, max_length in IMAGE_SIZES.items():
+        image = original.copy()
+        image.thumbnail((max_length, max_length), Image.LANCZOS)
+
+        buffer = BytesIO()
+        image.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY, optimize=True, progressive=True)
+
+        rendition_name = get_rendition_name(field_file.name, size)
+        storage.delete(rendition_name)
+        storage.save(rendition_name, ContentFile(buffer.getvalue()))
+
+
+def get_file_hash(field_file):
+    digest = sha1()
+    with field_file.storage.open(field_file.name, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_image_entry(image):
+    return OrderedDict((
+        ('url', image.file.url),
+        ('width', image.width),
+        ('height', image.height),
+        ('hash', get_file_hash(image.file)),
+    ))
+
+
+def build_badge_manifest():
+    """Lists the art of every badge, with a rendition per screen density. Each image has a hash of its contents, so
+    clients only download the images that changed. URLs are relative to the site.
+
+    The version is a hash of the listing, and changes whenever any badge or image does.
+    """
+    badges = []
+    for badge in Badge.objects.filter(image__isnull=False).select_related('image').order_by('id'):
+        try:
+            renditions = OrderedDict(
+                (density, get_image_entry(badge.image.get_rendition(filter_spec)))
+                for density, filter_spec in BADGE_RENDITION_FILTERS.items()
+            )
+            original = get_image_entry(badge.image)
+        except IOError:
+            # The image file is missing from storage
+            continue
+
+        badges.append(OrderedDict((
+            ('id', badge.id),
+            ('slug', badge.slug),
+            ('badge_type', badge.badge_type),
+            ('image', original),
+            ('renditions', renditions),
+        )))
+
+    version = sha1(json.dumps(badges).encode('utf-8')).hexdigest()
+    return OrderedDict((('version', version), ('badges', badges)))
+
+
+def get_badge_manifest():
+    """The badge manifest, built once and cached until a badge or image changes."""
+    return get_or_set(Badge.MANIFEST_CACHE_NAMESPACE, [], build_badge_manifest, Badge.MANIFEST_CACHE_TIMEOUT)
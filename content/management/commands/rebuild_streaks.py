@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from content.models import Goal, GoalTargetStreak, UserSavingStreak
+
+
+class Command(BaseCommand):
+    help = """Rebuilds the saving and weekly target streaks of all users and goals from their transactions"""
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding saving streaks...')
+        users = 0
+        for user_id in User.objects.values_list('id', flat=True).iterator():
+            with transaction.atomic():
+                streak, created = UserSavingStreak.objects.select_for_update().get_or_create(user_id=user_id)
+                streak.rebuild().save()
+            users += 1
+
+        self.stdout.write('Rebuilding weekly target streaks...')
+        goals = 0
+        for goal in Goal.objects.iterator():
+            with transaction.atomic():
+                streak, created = GoalTargetStreak.objects.select_for_update().get_or_create(
+                    goal=goal, defaults={'weekly_target': goal.weekly_target})
+                streak.weekly_target = goal.weekly_target
+                streak.rebuild().save()
+            goals += 1
+
+        self.stdout.write('%d users, %d goals' % (users, goals))
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+import survey.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0097_budget_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_name', models.CharField(max_length=100, verbose_name='export name')),
+                ('unique_time', models.CharField(max_length=50, verbose_name='unique time')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email')),
+                ('chunk_bounds', survey.fields.JSONField(blank=True, editable=False, null=True, verbose_name='chunk bounds')),
+                ('chunks_done', models.IntegerField(default=0, verbose_name='chunks done')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+            ],
+            options={
+                'ordering': ('-created_at',),
+                'verbose_name': 'report job',
+                'verbose_name_plural': 'report jobs',
+            },
+        ),
+    ]
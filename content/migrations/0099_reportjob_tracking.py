@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from hashlib import sha1
+import json
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import survey.fields
+
+
+def set_state_and_request_key(apps, schema_editor):
+    ReportJob = apps.get_model('content', 'ReportJob')
+
+    for job in ReportJob.objects.all():
+        job.state = 'done' if job.finished_at is not None else 'failed'
+        # Same as ReportJob.make_request_key, for jobs without options
+        job.request_key = sha1(json.dumps([job.export_name, {}], sort_keys=True).encode('utf-8')).hexdigest()
+        job.save(update_fields=['state', 'request_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('content', '0098_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='requested_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='options',
+            field=survey.fields.JSONField(blank=True, default=dict, verbose_name='options'),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='request_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=40, verbose_name='request key'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='state',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10, verbose_name='state'),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='error',
+            field=models.TextField(blank=True, verbose_name='error'),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='row_count',
+            field=models.IntegerField(blank=True, null=True, verbose_name='row count'),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='started at'),
+        ),
+        migrations.RunPython(set_state_and_request_key, migrations.RunPython.noop),
+    ]
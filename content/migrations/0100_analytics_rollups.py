@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0099_reportjob_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupHighWaterMark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_users', models.IntegerField(default=0)),
+                ('goals_created', models.IntegerField(default=0)),
+                ('savings_volume', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('badges_earned', models.IntegerField(default=0)),
+                ('challenge_completions', models.IntegerField(default=0)),
+                ('budgets_created', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GoalPrototypeDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('prototype', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.GoalPrototype')),
+                ('goals_created', models.IntegerField(default=0)),
+                ('new_goal_users', models.IntegerField(default=0)),
+                ('savings_volume', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BadgeDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('badge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.Badge')),
+                ('earned', models.IntegerField(default=0)),
+                ('new_earners', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChallengeDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.Challenge')),
+                ('participants', models.IntegerField(default=0)),
+                ('completions', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExpenseCategoryDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.ExpenseCategory')),
+                ('expenses_created', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='goalprototypedailyrollup',
+            unique_together=set([('date', 'prototype')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='badgedailyrollup',
+            unique_together=set([('date', 'badge')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='challengedailyrollup',
+            unique_together=set([('date', 'challenge')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='expensecategorydailyrollup',
+            unique_together=set([('date', 'category')]),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('content', '0100_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSavingStreak',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_monday', models.DateField(null=True)),
+                ('run_length', models.PositiveIntegerField(default=0)),
+                ('longest_run', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='saving_streak', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GoalTargetStreak',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekly_target', models.DecimalField(decimal_places=2, max_digits=18)),
+                ('last_monday', models.DateField(null=True)),
+                ('week_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('run_length', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('goal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='target_streak', to='content.Goal')),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_transaction_weeks(apps, schema_editor):
+    Goal = apps.get_model('content', 'Goal')
+    GoalTransaction = apps.get_model('content', 'GoalTransaction')
+
+    for goal in Goal.objects.only('id', 'user_id', 'start_date').iterator():
+        weeks = {}
+        for trans_id, date in GoalTransaction.objects.filter(goal_id=goal.id).values_list('id', 'date'):
+            day = date.date()
+            # Same as GoalTransaction.save
+            week_key = day - timedelta(days=day.weekday())
+            week_index = (day - goal.start_date).days // 7
+            weeks.setdefault((week_key, week_index), []).append(trans_id)
+
+        for (week_key, week_index), trans_ids in weeks.items():
+            GoalTransaction.objects \
+                .filter(id__in=trans_ids) \
+                .update(user_id=goal.user_id, week_key=week_key, week_index=week_index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('content', '0101_streaks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goaltransaction',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='goaltransaction',
+            name='week_key',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='goaltransaction',
+            name='week_index',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_transaction_weeks, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='goaltransaction',
+            index_together=set([('goal', 'date'), ('goal', 'week_key'), ('user', 'date')]),
+        ),
+    ]
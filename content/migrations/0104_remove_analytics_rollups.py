@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0103_analyticssyncmark'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='BadgeDailyRollup',
+        ),
+        migrations.DeleteModel(
+            name='ChallengeDailyRollup',
+        ),
+        migrations.DeleteModel(
+            name='DailyRollup',
+        ),
+        migrations.DeleteModel(
+            name='ExpenseCategoryDailyRollup',
+        ),
+        migrations.DeleteModel(
+            name='GoalPrototypeDailyRollup',
+        ),
+        migrations.DeleteModel(
+            name='RollupHighWaterMark',
+        ),
+    ]
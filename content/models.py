@@ -1,14 +1,18 @@
 from collections import OrderedDict
-from datetime import timedelta
+from datetime import datetime, timedelta
 from functools import reduce
+from hashlib import sha1
+import json
 from math import ceil, floor
 from os.path import splitext
 from uuid import uuid4
 
-from django.apps import apps
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import Count
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.shortcuts import reverse
 
 from django.utils import timezone
@@ -26,6 +30,10 @@ from wagtail.wagtailcore import models as wagtail_models
 from wagtail.wagtailimages import edit_handlers as wagtail_image_edit
 from wagtail.wagtailimages import models as wagtail_image_models
 
+from core.cache import get_or_set, invalidate_on, memoize
+from core.models import DirtyFieldsMixin
+from survey.fields import JSONField
+
 from .storage import ChallengeStorage, GoalImgStorage, ParticipantPictureStorage
 from .edit_handlers import ReadOnlyPanel
 
@@ -182,6 +190,12 @@ class BadgeSettings(BaseSetting):
     class Meta:
         verbose_name = 'Badge Setup'
 
+    @classmethod
+    @memoize('badge-settings', timeout=60 * 60)
+    def for_site(cls, site):
+        # Read whenever a badge may be awarded, which is on most saves
+        return super(BadgeSettings, cls).for_site(site)
+
     def get_streak_badge(self, weeks):
         if weeks == WEEK_STREAK_2:
             return self.streak_2
@@ -915,7 +929,8 @@ class ParticipantPicture(models.Model):
     def display_picture(self):
         url = reverse('api:participantpicture-picture', kwargs={'pk': self.pk})
         return format_html(
-            '<a href="{0:s}" data-featherlight="image"><img style="width:100px;height:100px" src="{0:s}"/></a>'.format(url), self.picture)
+            '<a href="{0}?size=medium" data-featherlight="image">'
+            '<img style="width:100px;height:100px" src="{0}?size=thumb" loading="lazy"/></a>', url)
 
     # Translators: CMS field name (refers to dates)
     date_answered = models.DateTimeField(_('answered on'), default=timezone.now)
@@ -1134,6 +1149,10 @@ class GoalPrototype(models.Model):
     ), default=INACTIVE)
     default_price = models.DecimalField(max_digits=18, decimal_places=2, default=0.0, editable=True)
 
+    # The prototype list served by the API, keyed by host because image URLs are absolute
+    LIST_CACHE_NAMESPACE = 'goal-prototypes'
+    LIST_CACHE_TIMEOUT = 60
+
     @property
     def is_active(self):
         return self.state == GoalPrototype.ACTIVE
@@ -1149,6 +1168,10 @@ class GoalPrototype(models.Model):
     def deactivate(self):
         self.state = GoalPrototype.INACTIVE
 
+    @classmethod
+    def get_cached_list(cls, host, serialize):
+        return get_or_set(cls.LIST_CACHE_NAMESPACE, [host], serialize, cls.LIST_CACHE_TIMEOUT)
+
     def __str__(self):
         return self.name
 
@@ -1169,7 +1192,7 @@ GoalPrototype.panels = [
 
 
 @python_2_unicode_compatible
-class Goal(models.Model):
+class Goal(DirtyFieldsMixin, models.Model):
     INACTIVE = 0
     ACTIVE = 1
 
@@ -1210,7 +1233,24 @@ class Goal(models.Model):
         # Ensure Weekly Target
         if self.weekly_target is None:
             self.weekly_target = self.get_calculated_weekly_target()
-        return super(Goal, self).save(*args, **kwargs)
+
+        start_date_changed = not self._state.adding and 'start_date' in self.get_dirty_fields()
+
+        result = super(Goal, self).save(*args, **kwargs)
+
+        if start_date_changed:
+            self.update_transaction_weeks()
+        return result
+
+    def update_transaction_weeks(self):
+        """Counts the week indexes of the transactions again, from the current start date."""
+        weeks = {}
+        for trans_id, date in self.transactions.values_list('id', 'date'):
+            week_index = GoalTransaction.get_week_index(self.start_date, date.date())
+            weeks.setdefault(week_index, []).append(trans_id)
+
+        for week_index, trans_ids in weeks.items():
+            GoalTransaction.objects.filter(id__in=trans_ids).update(week_index=week_index)
 
     def add_new_badge(self, badge):
         if not hasattr(self, '_new_badges'):
@@ -1309,45 +1349,28 @@ class Goal(models.Model):
         monday = Goal._monday(d)
         return monday, monday + timedelta(days=6)
 
+    @memoize('goal-weekly-totals', timeout=60 * 60)
     def get_weekly_aggregates(self):
-        date = self.start_date
-
-        # Ensure elements so weeks with no transactions will have 0
-        agg = [0 for _ in range(self.weeks)]
-
-        week_id = 0
-        for trans in self.transactions.all().order_by('date'):
-            if WeekCalc.day_diff(date, trans.date.date()) >= 7:
-                # Next weekly window
-                week_id += 1
-                date = (date + timedelta(days=7))
-
-            # Ignore savings after the deadline
-            if week_id >= len(agg):
-                break
-
-            agg[week_id] += trans.value
-
-        return agg
+        return self._sum_weeks(self.transactions.all())
 
     def get_weekly_aggregates_to_date(self):
-        date = self.start_date
+        return self._sum_weeks(self.transactions.filter(date__lte=timezone.now()))
 
+    def _sum_weeks(self, transactions):
         # Ensure elements so weeks with no transactions will have 0
         agg = [0 for _ in range(self.weeks)]
 
-        week_id = 0
-        for trans in self.transactions.all().order_by('date'):
-            if WeekCalc.day_diff(date, timezone.now().date()) >= 7:
-                # Next weekly window
-                week_id += 1
-                date = (date + timedelta(days=7))
+        totals = transactions \
+            .values('week_index') \
+            .annotate(total=Sum('value')) \
+            .order_by()
+        for row in totals:
+            # Savings before the start date count towards the first week
+            week_index = max(row['week_index'], 0)
 
             # Ignore savings after the deadline
-            if week_id >= len(agg):
-                break
-
-            agg[week_id] += trans.value
+            if week_index < len(agg):
+                agg[week_index] += row['total']
 
         return agg
 
@@ -1358,101 +1381,33 @@ class Goal(models.Model):
         return target if weeks == 0 else ceil(target / weeks) - initial_savings
 
     @classmethod
-    def get_current_streak(cls, user, now=None, weeks_back=6):
-        """Calculates the weekly savings streak for a user, starting at the current time.
+    def get_current_streak(cls, user, now=None):
+        """The number of weeks in a row, up to the current week, that the user has saved. Read from the user's
+        `UserSavingStreak`, so streaks of any length are counted.
         """
-        trans_model = apps.get_model('content', 'GoalTransaction')
-
-        now_date = now
-        if now is None:
-            now_date = timezone.now()
-
-        since_date = now_date - timedelta(weeks=weeks_back)
-
-        trans = trans_model.objects \
-            .filter(goal__user=user, date__gt=since_date) \
-            .order_by('-date')
-
-        last_monday = Goal._monday(now_date.date())
-
-        # No Transactions at all mean no streak
-        streak = 0
+        now_date = (timezone.now() if now is None else now).date()
 
-        for t in trans:
-            monday = Goal._monday(t.date.date())
+        streak = UserSavingStreak.for_user(user.id)
+        if streak.last_monday is not None and streak.last_monday > Goal._monday(now_date):
+            # Looking back from before the latest savings
+            streak = UserSavingStreak(user=user).rebuild(before=Goal._monday(now_date) + timedelta(days=7))
 
-            if last_monday != monday:
-                diff = (last_monday - monday).days
-                if diff > 7:
-                    # Streak broken
-                    break
-                else:
-                    streak += 1
-                    last_monday = monday
-
-        if streak > 0:
-            # Any Transactions make for at least 1 week's streak. Weeks are inclusive.
-            streak += 1
-
-        return streak
+        return streak.get_streak(now_date)
 
     @classmethod
-    def get_current_weekly_target_badge(self, user, goal, now=None, weeks_back=6):
-        """Calculates number of weeks in a row that the user has reached the weekly savings target
+    def get_current_weekly_target_badge(cls, user, goal, now=None):
+        """The number of weeks in a row, up to the current week, that the user has reached the goal's weekly savings
+        target. Read from the goal's `GoalTargetStreak`, so streaks of any length are counted.
         """
-        trans_model = apps.get_model('content', 'GoalTransaction')
-
-        now_date = now
-        if now is None:
-            now_date = timezone.now()
-
-        # How far back you check
-        since_date = now_date - timedelta(weeks=weeks_back)
-
-        # get all transactions for the specific goal
-        transactions = trans_model.objects \
-            .filter(goal=goal, date__gt=since_date) \
-            .order_by('-date')
-
-        last_monday = Goal._monday(now_date.date())
-
-        # No Transactions at all mean no streak
-        streak = 0
-
-        week_savings_total = 0
-        broke_out_of_loop = False
-
-        for t in transactions:
-            monday = Goal._monday(t.date.date())
-
-            if last_monday != monday:
-                # t is now in a different week
-                if week_savings_total >= goal.weekly_target:
-                    # Streak maintained
-                    streak += 1
-                    if monday == (last_monday + timedelta(
-                            days=-7)):  # This is to check that the user did not stop saving for an entire week
-                        last_monday = monday  # move one week back
-                        week_savings_total = t.value  # start with the first transaction of this week
-                    else:
-                        # The user did not save for an entire week and the streak is broken
-                        broke_out_of_loop = True
-                        break
-                else:
-                    # Streak broken
-                    broke_out_of_loop = True
-                    break
-            else:
-                week_savings_total += t.value
+        now_date = (timezone.now() if now is None else now).date()
 
-        if not broke_out_of_loop:
-            # If you did not break out of the loop the transactions ended and there could be another week in the streak
-            # left so we have to check
-            if week_savings_total >= goal.weekly_target:
-                # Streak maintained
-                streak += 1
+        streak = GoalTargetStreak.for_goal(goal)
+        if streak.last_monday is not None and streak.last_monday > Goal._monday(now_date):
+            # Looking back from before the latest savings
+            streak = GoalTargetStreak(goal=goal, weekly_target=goal.weekly_target) \
+                .rebuild(before=Goal._monday(now_date) + timedelta(days=7))
 
-        return streak
+        return streak.get_streak(now_date)
 
     def is_goal_deadline_missed(self):
         if timezone.now().date() > self.end_date and self.is_active and self.value < self.target:
@@ -1471,12 +1426,24 @@ class Goal(models.Model):
             self.value = value
 
 
+# User counts change when goals are created, deleted or moved to another prototype or user, so the cached prototype
+# list is cleared. Goals are saved on every deposit, which doesn't change the counts.
+invalidate_on(GoalPrototype.LIST_CACHE_NAMESPACE, GoalPrototype)
+invalidate_on(GoalPrototype.LIST_CACHE_NAMESPACE, Goal, fields={'prototype_id', 'user_id', 'state'})
+
+
 @python_2_unicode_compatible
 class GoalTransaction(models.Model):
     date = models.DateTimeField(_('date'))
     value = models.DecimalField(_('value'), max_digits=12, decimal_places=2)
     goal = models.ForeignKey(Goal, related_name='transactions')
 
+    # Set on save, so transactions can be filtered and grouped by user and week without joins or date arithmetic. The
+    # week key is the Monday of the transaction's week, and the week index counts weeks from the goal's start date.
+    user = models.ForeignKey(User, related_name='+', null=True, editable=False)
+    week_key = models.DateField(null=True, editable=False)
+    week_index = models.IntegerField(null=True, editable=False)
+
     class Meta:
         # Translators: Collection name on CMS
         verbose_name = _('goal transaction')
@@ -1485,6 +1452,28 @@ class GoalTransaction(models.Model):
         verbose_name_plural = _('goal transactions')
 
         unique_together = ('date', 'value', 'goal')
+        index_together = (
+            ('goal', 'date'),
+            ('goal', 'week_key'),
+            ('user', 'date'),
+        )
+
+    def save(self, *args, **kwargs):
+        self.user_id = self.goal.user_id
+        self.week_key = Goal._monday(self.day)
+        self.week_index = GoalTransaction.get_week_index(self.goal.start_date, self.day)
+        return super(GoalTransaction, self).save(*args, **kwargs)
+
+    @staticmethod
+    def get_week_index(start_date, day):
+        if isinstance(start_date, datetime):
+            start_date = start_date.date()
+        return WeekCalc.week_diff(start_date, day, WeekCalc.Rounding.DOWN)
+
+    @property
+    def day(self):
+        """The date of the transaction. A date may have been assigned to `date` instead of a datetime."""
+        return self.date.date() if isinstance(self.date, datetime) else self.date
 
     @property
     def is_deposit(self):
@@ -1498,6 +1487,188 @@ class GoalTransaction(models.Model):
         return '{} {}'.format(self.date, self.value)
 
 
+class UserSavingStreak(models.Model):
+    """The run of weeks in a row in which a user saved, kept up to date as transactions are added.
+
+    Weeks start on Monday. The run ends in `last_monday`, the latest week in which the user saved. Transactions are
+    counted as they are created. A transaction dated before the latest week, or a changed or deleted transaction, means
+    the streak is rebuilt from the user's transactions.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='saving_streak')
+    last_monday = models.DateField(null=True)
+    run_length = models.PositiveIntegerField(default=0)
+    longest_run = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def advance(self, date):
+        """Counts a transaction made on the given date.
+
+        :return: False when the date is before the latest week, which can't be counted without rebuilding.
+        """
+        monday = Goal._monday(date)
+        if self.last_monday is None or monday > self.last_monday + timedelta(days=7):
+            self.run_length = 1
+        elif monday == self.last_monday + timedelta(days=7):
+            self.run_length += 1
+        elif monday < self.last_monday:
+            return False
+
+        self.last_monday = monday
+        self.longest_run = max(self.longest_run, self.run_length)
+        return True
+
+    def rebuild(self, before=None):
+        """Counts all of the user's transactions again, or only those of the weeks before the given Monday."""
+        self.last_monday = None
+        self.run_length = 0
+        self.longest_run = 0
+
+        weeks = GoalTransaction.objects.filter(user_id=self.user_id)
+        if before is not None:
+            weeks = weeks.filter(week_key__lt=before)
+        for week_key in weeks.order_by('week_key').values_list('week_key', flat=True).distinct():
+            self.advance(week_key)
+        return self
+
+    def get_streak(self, date):
+        """The streak as seen from the week of the given date.
+
+        The current week counts towards the streak whether the user has saved in it yet or not, as long as they saved
+        in the weeks before it.
+        """
+        monday = Goal._monday(date)
+        if self.last_monday == monday:
+            previous_weeks = self.run_length - 1
+        elif self.last_monday == monday - timedelta(days=7):
+            previous_weeks = self.run_length
+        else:
+            previous_weeks = 0
+        return previous_weeks + 1 if previous_weeks > 0 else 0
+
+    @classmethod
+    def for_user(cls, user_id):
+        """The user's streak, built from their transactions if it doesn't exist yet."""
+        with transaction.atomic():
+            streak, created = cls.objects.select_for_update().get_or_create(user_id=user_id)
+            if created:
+                streak.rebuild().save()
+        return streak
+
+    @classmethod
+    def record(cls, user_id, date):
+        with transaction.atomic():
+            streak, created = cls.objects.select_for_update().get_or_create(user_id=user_id)
+            if created or not streak.advance(date):
+                streak.rebuild()
+            streak.save()
+        return streak
+
+
+class GoalTargetStreak(models.Model):
+    """The run of weeks in a row in which a goal's weekly target was reached, kept up to date as transactions are added.
+
+    Savings are totalled for the latest week with transactions, `last_monday`, until a transaction of a later week
+    closes it. `run_length` counts the weeks in a row before it that reached the target. Like `UserSavingStreak`, the
+    streak is rebuilt when it can't be advanced, and also when the goal's weekly target changes.
+    """
+    goal = models.OneToOneField(Goal, on_delete=models.CASCADE, related_name='target_streak')
+    weekly_target = models.DecimalField(max_digits=18, decimal_places=2)
+    last_monday = models.DateField(null=True)
+    week_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    run_length = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def advance(self, date, value):
+        """Adds a transaction made on the given date to the week's total.
+
+        :return: False when the date is before the latest week, which can't be counted without rebuilding.
+        """
+        monday = Goal._monday(date)
+        if self.last_monday is not None and monday < self.last_monday:
+            return False
+
+        if self.last_monday is None or monday > self.last_monday + timedelta(days=7):
+            self.run_length = 0
+        elif monday == self.last_monday + timedelta(days=7):
+            self.run_length = self.run_length + 1 if self.week_total >= self.weekly_target else 0
+
+        if monday != self.last_monday:
+            self.last_monday = monday
+            self.week_total = 0
+        self.week_total += value
+        return True
+
+    def rebuild(self, before=None):
+        """Counts all of the goal's transactions again, or only those of the weeks before the given Monday."""
+        self.last_monday = None
+        self.week_total = 0
+        self.run_length = 0
+
+        weeks = GoalTransaction.objects.filter(goal_id=self.goal_id)
+        if before is not None:
+            weeks = weeks.filter(week_key__lt=before)
+        weeks = weeks.values('week_key').annotate(total=Sum('value')).order_by('week_key')
+        for week in weeks:
+            self.advance(week['week_key'], week['total'])
+        return self
+
+    def get_streak(self, date):
+        """The streak as seen from the week of the given date. The target has to be reached in the current week for the
+        weeks before it to count.
+        """
+        if self.last_monday != Goal._monday(date) or self.week_total < self.weekly_target:
+            return 0
+        return self.run_length + 1
+
+    @classmethod
+    def for_goal(cls, goal):
+        """The goal's streak, built from its transactions if it doesn't exist yet or its target changed."""
+        with transaction.atomic():
+            streak, created = cls.objects.select_for_update().get_or_create(
+                goal=goal, defaults={'weekly_target': goal.weekly_target})
+            if created or streak.weekly_target != goal.weekly_target:
+                streak.weekly_target = goal.weekly_target
+                streak.rebuild().save()
+        return streak
+
+    @classmethod
+    def record(cls, goal, date, value):
+        with transaction.atomic():
+            streak, created = cls.objects.select_for_update().get_or_create(
+                goal=goal, defaults={'weekly_target': goal.weekly_target})
+            if created or streak.weekly_target != goal.weekly_target:
+                streak.weekly_target = goal.weekly_target
+                streak.rebuild()
+            elif not streak.advance(date, value):
+                streak.rebuild()
+            streak.save()
+        return streak
+
+
+@receiver(post_save, sender=GoalTransaction)
+def record_streaks(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        UserSavingStreak.record(instance.user_id, instance.week_key)
+        GoalTargetStreak.record(instance.goal, instance.week_key, instance.value)
+    else:
+        clear_streaks(sender, instance)
+
+
+@receiver(post_delete, sender=GoalTransaction)
+def clear_streaks(sender, instance, **kwargs):
+    # Rebuilt from the remaining transactions when next read
+    UserSavingStreak.objects.filter(user_id=instance.user_id).delete()
+    GoalTargetStreak.objects.filter(goal_id=instance.goal_id).delete()
+
+
+# The weeks of a goal change with its dates, and their totals with its transactions
+invalidate_on(Goal.get_weekly_aggregates, Goal, args=lambda goal: (goal,))
+invalidate_on(Goal.get_weekly_aggregates, GoalTransaction, args=lambda trans: (trans.goal_id,))
+
+
 # ============ #
 # Achievements #
 # ============ #
@@ -1572,6 +1743,10 @@ class Badge(models.Model):
 
     user = models.ManyToManyField(User, through='UserBadge', related_name='badges')
 
+    # The badge art manifest served by the API, see `content.images.get_badge_manifest`
+    MANIFEST_CACHE_NAMESPACE = 'badge-manifest'
+    MANIFEST_CACHE_TIMEOUT = 24 * 60 * 60
+
     class Meta:
         # Translators: Collection name on CMS
         verbose_name = _('badge')
@@ -1587,6 +1762,13 @@ class Badge(models.Model):
         return self.name
 
 
+invalidate_on(Badge.MANIFEST_CACHE_NAMESPACE, Badge, wagtail_image_models.Image)
+
+# Deleting a badge unsets it in the settings with an update, which sends no signals
+invalidate_on(BadgeSettings.for_site, BadgeSettings, args=lambda settings: (BadgeSettings, settings.site_id))
+invalidate_on(BadgeSettings.for_site, Badge)
+
+
 Badge.panels = [
     wagtail_edit_handlers.MultiFieldPanel([
         wagtail_edit_handlers.FieldPanel('name'),
@@ -1639,7 +1821,7 @@ class AchievementStat:
         self.weeks_since_saved = 0
 
         # TODO: Only consider deposits (transactions of positive values)
-        last_trans = GoalTransaction.objects.filter(goal__user=user).order_by('-date').first()
+        last_trans = GoalTransaction.objects.filter(user=user).order_by('-date').first()
         if last_trans:
             self.last_saving_datetime = last_trans.date
             self.weeks_since_saved = floor((timezone.now() - last_trans.date).days / 7)
@@ -1746,7 +1928,7 @@ def award_transaction_first(request, goal):
     if goal.pk is None:
         raise ValueError(_('Goal instance must be saved before it can be awarded badges.'))
 
-    if GoalTransaction.objects.filter(goal__user=goal.user).count() >= 1:
+    if GoalTransaction.objects.filter(user_id=goal.user_id).exists():
         user_badge, created = UserBadge.objects.get_or_create(user=goal.user, badge=badge)
         if created:
             return user_badge
@@ -2178,3 +2360,141 @@ class Expense(models.Model):
 
     def __str__(self):
         return 'Expense {} {}'.format(self.preferred_name, self.value)
+
+
+###########
+# Reports #
+###########
+
+
+@python_2_unicode_compatible
+class ReportJob(models.Model):
+    """A report export requested from the admin, tracked from the request until the archive is ready.
+
+    Large exports are split into chunks of rows, which are written to separate files by parallel tasks. Finished
+    chunks are kept on disk until the export is merged, so a failed export can be resumed without redoing them.
+    """
+    STATE_PENDING = 'pending'
+    STATE_RUNNING = 'running'
+    STATE_DONE = 'done'
+    STATE_FAILED = 'failed'
+    STATES = (
+        (STATE_PENDING, _('Pending')),
+        (STATE_RUNNING, _('Running')),
+        (STATE_DONE, _('Done')),
+        (STATE_FAILED, _('Failed')),
+    )
+    IN_FLIGHT_STATES = (STATE_PENDING, STATE_RUNNING)
+
+    # In flight jobs older than this are assumed to have been lost by the workers, and don't block new requests
+    STALE_AFTER = timedelta(hours=6)
+
+    export_name = models.CharField(_('export name'), max_length=100)
+    unique_time = models.CharField(_('unique time'), max_length=50)
+    email = models.EmailField(_('email'), blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    # Keyword arguments of the export, like the challenge name
+    options = JSONField(_('options'), default=dict, blank=True)
+
+    # Hash of the export name and options, used to find identical requests
+    request_key = models.CharField(_('request key'), max_length=40, db_index=True, editable=False)
+
+    state = models.CharField(_('state'), max_length=10, choices=STATES, default=STATE_PENDING, db_index=True)
+    error = models.TextField(_('error'), blank=True)
+    row_count = models.IntegerField(_('row count'), null=True, blank=True)
+
+    # List of [start_id, end_id) ranges, the last one open ended. Null until the export has been planned, and for
+    # exports that are not chunked.
+    chunk_bounds = JSONField(_('chunk bounds'), null=True, blank=True, editable=False)
+    chunks_done = models.IntegerField(_('chunks done'), default=0)
+
+    created_at = models.DateTimeField(_('created at'), default=timezone.now)
+    started_at = models.DateTimeField(_('started at'), null=True, blank=True)
+    finished_at = models.DateTimeField(_('finished at'), null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = _('report job')
+        verbose_name_plural = _('report jobs')
+
+    @staticmethod
+    def make_request_key(export_name, options):
+        return sha1(json.dumps([export_name, options], sort_keys=True, cls=DjangoJSONEncoder)
+                    .encode('utf-8')).hexdigest()
+
+    @classmethod
+    def in_flight(cls):
+        """Jobs that are still being generated, leaving out the ones that went stale."""
+        return cls.objects.filter(state__in=cls.IN_FLIGHT_STATES, created_at__gt=timezone.now() - cls.STALE_AFTER)
+
+    @classmethod
+    def find_in_flight(cls, export_name, options):
+        """Returns a job for the same export and options that is still being generated, if there is one."""
+        return cls.in_flight().filter(request_key=cls.make_request_key(export_name, options)).first()
+
+    def save(self, *args, **kwargs):
+        if not self.request_key:
+            self.request_key = self.make_request_key(self.export_name, self.options)
+        super(ReportJob, self).save(*args, **kwargs)
+
+    @property
+    def chunk_count(self):
+        return len(self.chunk_bounds) if self.chunk_bounds is not None else 0
+
+    @property
+    def is_finished(self):
+        return self.state == self.STATE_DONE
+
+    @property
+    def progress(self):
+        """Percentage of the export done. Exports that aren't chunked only report 0 or 100."""
+        if self.is_finished:
+            return 100
+        if not self.chunk_count:
+            return 0
+        return floor(self.chunks_done * 100 / self.chunk_count)
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return None
+        return (self.finished_at or timezone.now()) - self.started_at
+
+    def mark_running(self):
+        self.state = self.STATE_RUNNING
+        self.error = ''
+        self.finished_at = None
+        if self.started_at is None:
+            self.started_at = timezone.now()
+        self.save(update_fields=['state', 'error', 'started_at', 'finished_at'])
+
+    def mark_done(self, row_count):
+        self.state = self.STATE_DONE
+        self.row_count = row_count
+        self.finished_at = timezone.now()
+        self.save(update_fields=['state', 'row_count', 'finished_at'])
+
+    def mark_failed(self, error):
+        self.state = self.STATE_FAILED
+        self.error = error
+        self.finished_at = timezone.now()
+        self.save(update_fields=['state', 'error', 'finished_at'])
+
+    def __str__(self):
+        return self.export_name + self.unique_time
+
+
+#############
+# Analytics #
+#############
+
+
+class AnalyticsSyncMark(models.Model):
+    """The last day of Google Analytics data that has been synced, see `content.analytics_api.sync_ga_campaigns`."""
+    source = models.CharField(max_length=50, unique=True)
+    last_date = models.DateField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '{}: {}'.format(self.source, self.last_date)
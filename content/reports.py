@@ -0,0 +1,137 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Sum
+
+from .models import Goal, GoalTransaction, UserBadge, WeekCalc
+
+
+GOAL_PROTOTYPE_AGGREGATES_SQL = """
+SELECT per_user.prototype_id,
+       COUNT(*) AS users,
+       SUM(per_user.goals) AS goals,
+       SUM(per_user.total_value) AS total_value,
+       SUM(per_user.achieved_goals) AS achieved_goals,
+       SUM(CASE WHEN per_user.achieved_goals > 0 THEN 1 ELSE 0 END) AS users_achieved,
+       SUM(per_user.half_achieved) AS users_half_achieved,
+       SUM(CASE WHEN per_user.achieved_goals > 0 THEN per_user.goals ELSE 0 END) AS goals_of_achievers
+FROM (
+    SELECT per_goal.prototype_id,
+           per_goal.user_id,
+           COUNT(*) AS goals,
+           SUM(per_goal.value) AS total_value,
+           SUM(CASE WHEN per_goal.target >= 1 AND per_goal.value >= per_goal.target
+                    THEN 1 ELSE 0 END) AS achieved_goals,
+           MAX(CASE WHEN per_goal.target >= 1 AND per_goal.value * 2 >= per_goal.target
+                    THEN 1 ELSE 0 END) AS half_achieved
+    FROM (
+        SELECT goal.id, goal.prototype_id, goal.user_id, goal.target,
+               COALESCE(SUM(trans.value), 0) AS value
+        FROM {goal} goal
+        INNER JOIN {user} u ON u.id = goal.user_id
+        LEFT OUTER JOIN {transaction} trans ON trans.goal_id = goal.id
+        WHERE goal.prototype_id IS NOT NULL AND u.is_staff = %s AND u.is_active = %s
+        GROUP BY goal.id, goal.prototype_id, goal.user_id, goal.target
+    ) per_goal
+    GROUP BY per_goal.prototype_id, per_goal.user_id
+) per_user
+GROUP BY per_user.prototype_id
+"""
+
+
+def percentage(part, total):
+    if not part or not total:
+        return 0
+    return part / total * 100
+
+
+def goal_prototype_aggregates():
+    """Savings metrics of the goals of each prototype, for the aggregate goal per category export.
+
+    A goal's value is summed from its transactions in a subquery, then grouped per user, and then per prototype, so
+    the value based metrics of all prototypes are computed by the database in one query. Weeks saved are counted in a
+    single pass over the transactions. Goals of staff and inactive users are not counted.
+
+    Progress follows `Goal.progress`: a goal is achieved when its value reaches its target, and targets below 1 count
+    as no progress.
+
+    :return: A dictionary of metrics keyed by prototype id. Prototypes without goals are left out.
+    """
+    sql = GOAL_PROTOTYPE_AGGREGATES_SQL.format(
+        goal=connection.ops.quote_name(Goal._meta.db_table),
+        user=connection.ops.quote_name(User._meta.db_table),
+        transaction=connection.ops.quote_name(GoalTransaction._meta.db_table),
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [False, True])
+        columns = [col[0] for col in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    weeks = goal_prototype_weeks_saved()
+
+    aggregates = {}
+    for row in rows:
+        total_weeks, weeks_saved = weeks.get(row['prototype_id'], (0, 0))
+        aggregates[row['prototype_id']] = {
+            'total_users_at_least_one_goal': row['users'],
+            'total_goals_set': row['goals'],
+            'total_users_achieved_at_least_one_goal': row['users_achieved'],
+            'average_total_goal_amount': row['total_value'] / row['goals'] if row['total_value'] else 0,
+            'average_percentage_of_goal_reached': percentage(row['achieved_goals'], row['goals']),
+            'total_users_50_percent_achieved': row['users_half_achieved'],
+            'total_users_100_percent_achieved': row['goals_of_achievers'],
+            'percentage_of_weeks_saved_out_of_total_weeks': percentage(weeks_saved, total_weeks),
+        }
+    return aggregates
+
+
+def goal_prototype_weeks_saved():
+    """Total weeks and weeks with savings of the goals of each prototype.
+
+    A week counts as saved when the transactions in it don't add up to zero. Weeks are counted from the goal's start
+    date, and transactions after its last week are ignored. The transactions are summed per goal week by the database.
+
+    :return: A dictionary of (total weeks, weeks saved) tuples keyed by prototype id.
+    """
+    goals = Goal.objects \
+        .filter(user__is_staff=False, user__is_active=True, prototype__isnull=False) \
+        .values_list('id', 'prototype_id', 'start_date', 'end_date')
+
+    goal_weeks = {}
+    totals = defaultdict(lambda: [0, 0])
+    for goal_id, prototype_id, start_date, end_date in goals:
+        weeks = WeekCalc.week_diff(start_date, end_date, WeekCalc.Rounding.UP) or 1
+        goal_weeks[goal_id] = (prototype_id, weeks)
+        totals[prototype_id][0] += weeks
+
+    saved_weeks = GoalTransaction.objects \
+        .filter(user__is_staff=False, user__is_active=True, goal__prototype__isnull=False, week_index__gte=0) \
+        .values('goal_id', 'week_index') \
+        .annotate(total=Sum('value')) \
+        .exclude(total=0) \
+        .order_by()
+    for row in saved_weeks.iterator():
+        if row['goal_id'] not in goal_weeks:
+            # Goal created after the goals were read
+            continue
+        prototype_id, weeks = goal_weeks[row['goal_id']]
+        if row['week_index'] < weeks:
+            totals[prototype_id][1] += 1
+
+    return {prototype_id: tuple(total) for prototype_id, total in totals.items()}
+
+
+def badge_type_totals():
+    """Badges earned, and users that earned them at least once, per badge type. Badges of staff and inactive users
+    are not counted.
+
+    :return: A dictionary of totals keyed by badge type. Types nobody earned are left out.
+    """
+    rows = UserBadge.objects \
+        .filter(user__is_staff=False, user__is_active=True) \
+        .values('badge__badge_type') \
+        .annotate(earned=Count('id'), earners=Count('user', distinct=True)) \
+        .order_by()
+    return {row['badge__badge_type']: {'earned': row['earned'], 'earners': row['earners']} for row in rows}
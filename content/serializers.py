@@ -493,13 +493,18 @@ class ParticipantFreeTextSerializer(serializers.ModelSerializer):
 class GoalPrototypeSerializer(serializers.ModelSerializer):
     name = serializers.CharField()
     image_url = serializers.SerializerMethodField()
-    num_users = serializers.ReadOnlyField()
+    num_users = serializers.SerializerMethodField()
     default_price = serializers.DecimalField(18, 2, coerce_to_string=False)
 
     class Meta:
         model = GoalPrototype
         fields = ('id', 'name', 'image_url', "num_users", "default_price")
 
+    def get_num_users(self, obj):
+        # Listings annotate the count, instead of querying it per prototype
+        user_count = getattr(obj, 'user_count', None)
+        return obj.num_users if user_count is None else user_count
+
     def get_image_url(self, obj):
         request = self.context['request']
         if obj.image:
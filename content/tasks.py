@@ -1,22 +1,35 @@
 # -*- coding: utf-8 -*-
+import csv
+import logging
 import os
-import json
 
+from celery import group
 from celery.task import task
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
-from content.analytics_api import get_report, connect_ga_to_user, initialize_analytics_reporting
+from core.db import stream_queryset
+from content.analytics_api import initialize_analytics_reporting, sync_ga_campaigns
 from content.celery import app
+from content.images import create_renditions, delete_renditions
+from content.reports import goal_prototype_aggregates, badge_type_totals
 from content.models import Goal, GoalTransaction, UserBadge, Badge, Participant, Challenge, QuizQuestion, \
     QuestionOption, ParticipantAnswer, ParticipantPicture, ParticipantFreeText, GoalPrototype, Budget, ExpenseCategory, \
-    Expense
-from content.utilities import append_to_csv, create_csv, pass_zip_encrypt_email
-from survey.models import CoachSurveySubmission, CoachSurvey, CoachSurveySubmissionDraft
+    Expense, ReportJob, UserSavingStreak
+from content.utilities import append_to_csv, create_csv, pass_zip_encrypt_email, report_path, zip_path, chunk_path
+from survey.exports import SurveyExport
+from survey.reports import survey_aggregates
+from survey.models import CoachSurveySubmission, CoachSurvey
 from users.models import Profile, CampaignInformation
 
+logger = logging.getLogger('dooit.content.tasks')
+
 SUCCESS_MESSAGE_EMAIL_SENT = _('Report and password has been sent in an email.')
 ERROR_MESSAGE_NO_EMAIL = _('No email address associated with this account.')
 ERROR_MESSAGE_DATA_CLEANUP = _('Report generation ran during data cleanup - try again')
@@ -30,10 +43,14 @@ def just_print():
 @app.task(ignore_result=True, max_retries=10, default_retry_delay=10)
 def remove_report_archives():
     print("Starting removal")
+    # Reports, chunk files and partial chunks of jobs that are still being generated are named after the job
+    in_flight = tuple(job.export_name + job.unique_time
+                      for job in ReportJob.in_flight().only('export_name', 'unique_time'))
     try:
         for filename in os.listdir(settings.SENDFILE_ROOT):
-            if filename.endswith('.csv') or filename.endswith('.zip'):
-                os.remove(settings.SENDFILE_ROOT + '\\' + filename)
+            if not filename.endswith(('.csv', '.zip', '.tmp')) or filename.startswith(in_flight):
+                continue
+            os.remove(os.path.join(settings.SENDFILE_ROOT, filename))
     except FileNotFoundError:
         # Do nothing as there is no file to delete, name has changed
         pass
@@ -43,17 +60,264 @@ def remove_report_archives():
 def ga_task_handler():
     print("Starting GA connection")
     analytics = initialize_analytics_reporting()
-    response = get_report(analytics)
-    connect_ga_to_user(response)
-    print("Finished GA connection")
+    created, updated = sync_ga_campaigns(analytics)
+    print("Finished GA connection: %d created, %d updated" % (created, updated))
+
+
+##########################
+# Image Processing Tasks #
+##########################
+
+
+@app.task(ignore_result=True, max_retries=3, default_retry_delay=10)
+def generate_image_renditions(app_label, model_name, pk, field_name):
+    instance = apps.get_model(app_label, model_name).objects.filter(pk=pk).first()
+    if instance is None:
+        return
+
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return
+
+    try:
+        create_renditions(field_file)
+    except (IOError, SyntaxError):
+        # Pillow raises these for files that aren't valid images. The original is still served.
+        logger.warning('Could not create renditions for %s.%s %s', model_name, field_name, pk)
+
+
+def schedule_image_renditions(instance, field_name):
+    """Generates the size variants of an uploaded image in the background, once the upload is committed. Variants of
+    an image previously saved under the same name are removed right away, so the new original is served until then.
+    """
+    delete_renditions(getattr(instance, field_name))
+
+    meta = instance._meta
+    transaction.on_commit(
+        lambda: generate_image_renditions.delay(meta.app_label, meta.model_name, instance.pk, field_name))
+
+
+###############
+# Report Jobs #
+###############
+
+# Rows per chunk of a chunked export. Each chunk is written to its own file by a separate task.
+REPORT_CHUNK_SIZE = 500
+
+
+def get_chunked_exports():
+    """Exports that can be split into chunks, mapped to their header, queryset and row functions."""
+    return {
+        'Goal_Summary': (GOAL_SUMMARY_HEADER, goal_summary_queryset, goal_summary_row),
+        'User_Summary': (USER_SUMMARY_HEADER, user_summary_queryset, user_summary_row),
+    }
+
+
+def get_export_tasks():
+    """Exports that are generated by a single task, mapped to that task."""
+    return {
+        'Savings_Summary': export_savings_summary,
+        'Challenge_Summary': export_challenge_summary,
+        'Challenge_Quiz_Summary': export_challenge_quiz_summary,
+        'Challenge_Picture': export_challenge_picture,
+        'Challenge_Quiz': export_challenge_quiz,
+        'Challenge_Freetext': export_challenge_freetext,
+        'Aggregate_Summary': export_aggregate_summary,
+        'Aggregate_Goal_Per_Category': export_aggregate_goal_data_per_category,
+        'Aggregate_Rewards_Data': export_aggregate_rewards_data,
+        'Aggregate_Data_Per_Badge': export_aggregate_data_per_badge,
+        'Aggregate_Data_Per_Streak': export_aggregate_data_per_streak,
+        'Aggregate_User_Type': export_aggregate_user_type,
+        'Survey_Summary': export_survey_summary,
+        'Baseline_Survey': export_baseline_survey,
+        'EATool1_Survey': export_ea1tool_survey,
+        'EATool2_Survey': export_ea2tool_survey,
+        'Endline_Survey': export_endline_survey,
+        'Budget_User': export_budget_user,
+        'Budget_Expense_Category': export_budget_expense_category,
+        'Budget_Aggregate': export_budget_aggregate,
+    }
+
+
+def get_chunk_bounds(queryset, chunk_size):
+    """Splits a queryset into id ranges of at most `chunk_size` rows. The last range is open ended, so rows created
+    while the export runs are included."""
+    starts = list(queryset.order_by('id').values_list('id', flat=True))[::chunk_size]
+    return [[start, end] for start, end in zip(starts, starts[1:] + [None])]
+
+
+def get_report_filename(job):
+    return report_path(job.export_name, job.unique_time)
+
+
+def get_archive_filename(job):
+    return zip_path(job.export_name, job.unique_time)
+
+
+def get_shard_filename(job, index):
+    return chunk_path(job.export_name, job.unique_time, index)
+
+
+def count_csv_rows(filename):
+    """Number of records in a report, not counting the header."""
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, newline='', encoding='utf-8') as csvfile:
+        return max(sum(1 for _ in csv.reader(csvfile)) - 1, 0)
+
+
+def start_report_job(user, export_name, unique_time, **options):
+    """Queues an export, unless the same export is already being generated.
+
+    :return: A tuple of the job and whether it was created.
+    """
+    job = ReportJob.find_in_flight(export_name, options)
+    if job is not None:
+        return job, False
+
+    job = ReportJob.objects.create(requested_by=user, email=user.email or '', export_name=export_name,
+                                   unique_time=unique_time, options=options)
+    transaction.on_commit(lambda: dispatch_report_job(job))
+    return job, True
+
+
+def get_report_time_limits(export_name):
+    """The soft and hard time limits of generating an export, in seconds."""
+    return settings.REPORT_TIME_LIMITS.get(export_name, settings.REPORT_TIME_LIMITS['default'])
+
+
+def dispatch_report_job(job):
+    """Queues the task that generates the export of a job, limited to the time the export may take."""
+    soft_time_limit, time_limit = get_report_time_limits(job.export_name)
+    run_report_job.apply_async((job.pk,), soft_time_limit=soft_time_limit, time_limit=time_limit)
+
+
+@app.task(ignore_result=True, acks_late=True)
+def run_report_job(job_id):
+    """Generates the export of a job.
 
+    Chunked exports are split into chunks that are processed in parallel. This is also used to resume a failed export,
+    in which case only the chunks that haven't been written yet are queued. Chunk bounds are planned once, so a resumed
+    export writes the same chunks.
+    """
+    job = ReportJob.objects.get(pk=job_id)
+    if job.is_finished:
+        return
+
+    job.mark_running()
+
+    if job.export_name not in get_chunked_exports():
+        run_single_export(job)
+        return
+
+    if job.chunk_bounds is None:
+        header, get_queryset, get_row = get_chunked_exports()[job.export_name]
+        job.chunk_bounds = get_chunk_bounds(get_queryset(), REPORT_CHUNK_SIZE)
+        job.save(update_fields=['chunk_bounds'])
+
+    pending = [export_report_chunk.si(job.pk, index) for index in range(job.chunk_count)
+               if not os.path.isfile(get_shard_filename(job, index))]
+
+    if pending:
+        group(pending).apply_async()
+    else:
+        merge_report_chunks.delay(job.pk)
+
+
+def run_single_export(job):
+    task = get_export_tasks()[job.export_name]
+    try:
+        task(job.email, job.export_name, job.unique_time, **job.options)
+    except Exception as e:
+        logger.exception('Report %s failed', job)
+        job.mark_failed(str(e))
+        return
+
+    job.mark_done(count_csv_rows(get_report_filename(job)))
+
+
+@app.task(bind=True, ignore_result=True, acks_late=True, max_retries=3, default_retry_delay=30,
+          soft_time_limit=settings.REPORT_CHUNK_TIME_LIMITS[0], time_limit=settings.REPORT_CHUNK_TIME_LIMITS[1])
+def export_report_chunk(self, job_id, index):
+    """Writes one chunk of an export to its own file. The last chunk to finish queues the merge."""
+    job = ReportJob.objects.get(pk=job_id)
+    shard_filename = get_shard_filename(job, index)
+
+    if not os.path.isfile(shard_filename):
+        header, get_queryset, get_row = get_chunked_exports()[job.export_name]
+        start, end = job.chunk_bounds[index]
+        rows = get_queryset().filter(id__gte=start)
+        if end is not None:
+            rows = rows.filter(id__lt=end)
+
+        # Written under a temporary name first, so a crashed task never leaves a partial chunk behind
+        partial_filename = shard_filename + '.tmp'
+        try:
+            with open(partial_filename, 'w', newline='', encoding='utf-8') as csvfile:
+                for obj in stream_queryset(rows.order_by('id')):
+                    append_to_csv(get_row(obj), csvfile)
+        except Exception as e:
+            if self.request.retries >= self.max_retries:
+                logger.exception('Chunk %d of report %s failed', index, job)
+                job.mark_failed('Chunk {} failed: {}'.format(index, e))
+                return
+            raise self.retry(exc=e)
+        os.replace(partial_filename, shard_filename)
+
+    # Chunks are counted from the files on disk, so a retried chunk isn't counted twice
+    with transaction.atomic():
+        job = ReportJob.objects.select_for_update().get(pk=job_id)
+        chunks_done = sum(1 for i in range(job.chunk_count) if os.path.isfile(get_shard_filename(job, i)))
+        all_done = chunks_done == job.chunk_count and job.chunks_done < job.chunk_count
+        job.chunks_done = chunks_done
+        job.save(update_fields=['chunks_done'])
+
+    if all_done:
+        merge_report_chunks.delay(job_id)
+
+
+@app.task(ignore_result=True, acks_late=True,
+          soft_time_limit=settings.REPORT_MERGE_TIME_LIMITS[0], time_limit=settings.REPORT_MERGE_TIME_LIMITS[1])
+def merge_report_chunks(job_id):
+    """Joins the chunk files of an export in order, then archives and emails the report."""
+    job = ReportJob.objects.get(pk=job_id)
+    if job.is_finished:
+        return
+
+    try:
+        row_count = merge_report_shards(job)
+        pass_zip_encrypt_email(job.email, job.export_name, job.unique_time)
+    except Exception as e:
+        # The chunk files are kept until the merge succeeds, so the job can be resumed
+        logger.exception('Merging report %s failed', job)
+        job.mark_failed('Merge failed: {}'.format(e))
+        return
 
-###########################
-# Report Generation Tasks #
-###########################
+    for index in range(job.chunk_count):
+        os.remove(get_shard_filename(job, index))
 
+    job.mark_done(row_count)
 
-STORAGE_DIRECTORY = settings.SENDFILE_ROOT + '\\'
+
+def merge_report_shards(job):
+    """Writes the report of a chunked export from its chunk files.
+
+    :return: The number of rows written, not counting the header.
+    """
+    header, get_queryset, get_row = get_chunked_exports()[job.export_name]
+    filename = get_report_filename(job)
+    create_csv(filename)
+
+    row_count = 0
+    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
+        append_to_csv(header, csvfile)
+        writer = csv.writer(csvfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        for index in range(job.chunk_count):
+            with open(get_shard_filename(job, index), newline='', encoding='utf-8') as shard:
+                for row in csv.reader(shard):
+                    writer.writerow(row)
+                    row_count += 1
+    return row_count
 
 
 #####################
@@ -61,64 +325,71 @@ STORAGE_DIRECTORY = settings.SENDFILE_ROOT + '\\'
 #####################
 
 
+GOAL_SUMMARY_HEADER = (
+    'username', 'prototype_bahasa', 'prototype_english', 'goal_name', 'goal_target',
+    'goal_value', 'goal_progress', 'weekly_target', 'total_weeks', 'weeks_left',
+    'weeks_saved', 'week_saved_on_target', 'weeks_saved_below_target',
+    'weeks_saved_above_target', 'weeks_not_saved', 'withdrawals',
+
+    # Goal edit history
+    'original_goal_date', 'current_goal_date', 'original_weekly_target',
+    'current_weekly_target', 'original_goal_target', 'current_goal_target', 'date_edited',
+
+    'date_created', 'goal_achieved', 'goal_deleted', 'date_deleted')
+
+
+def goal_summary_queryset():
+    return Goal.objects.filter(user__is_staff=False, user__is_active=True).select_related('user', 'prototype')
+
+
+def goal_summary_row(goal):
+    return [
+        # Weekly savings
+        get_username(goal),
+        '',  # TODO: Goal prototype in Bahasa (Not implemented)
+        goal.prototype,
+        goal.name,
+        goal.target,
+        goal.value,
+        goal.progress,
+        goal.weekly_target,
+        goal.weeks,
+        goal.weeks_left,
+        num_weeks_saved(goal),
+        num_weeks_saved_on_target(goal),
+        num_weeks_saved_below(goal),
+        num_weeks_saved_above(goal),
+        num_weeks_not_saved(goal),
+        num_withdrawals(goal),
+
+        # Goal edits
+        goal.original_end_date,
+        goal.end_date,
+        goal.original_weekly_target,
+        goal.weekly_target,
+        goal.original_target,
+        goal.target,
+        goal.last_edit_date,
+
+        # Goal dates
+        goal.start_date,
+        date_achieved(goal),
+        not goal.is_active,
+        goal.date_deleted
+    ]
+
+
 @task(name="export_goal_summary")
 def export_goal_summary(email, export_name, unique_time):
-    goals = Goal.objects.filter(user__is_staff=False, user__is_active=True)
-
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
 
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-        append_to_csv(('username', 'prototype_bahasa', 'prototype_english', 'goal_name', 'goal_target',
-                       'goal_value', 'goal_progress', 'weekly_target', 'total_weeks', 'weeks_left',
-                       'weeks_saved', 'week_saved_on_target', 'weeks_saved_below_target',
-                       'weeks_saved_above_target', 'weeks_not_saved', 'withdrawals',
+        append_to_csv(GOAL_SUMMARY_HEADER, csvfile)
 
-                       # Goal edit history
-                       'original_goal_date', 'current_goal_date', 'original_weekly_target',
-                       'current_weekly_target', 'original_goal_target', 'current_goal_target', 'date_edited',
-
-                       'date_created', 'goal_achieved', 'goal_deleted', 'date_deleted'),
-                      csvfile)
-
-        for goal in goals:
-            data = [
-                # Weekly savings
-                get_username(goal),
-                '',  # TODO: Goal prototype in Bahasa (Not implemented)
-                goal.prototype,
-                goal.name,
-                goal.target,
-                goal.value,
-                goal.progress,
-                goal.weekly_target,
-                goal.weeks,
-                goal.weeks_left,
-                num_weeks_saved(goal),
-                num_weeks_saved_on_target(goal),
-                num_weeks_saved_below(goal),
-                num_weeks_saved_above(goal),
-                num_weeks_not_saved(goal),
-                num_withdrawals(goal),
-
-                # Goal edits
-                goal.original_end_date,
-                goal.end_date,
-                goal.original_weekly_target,
-                goal.weekly_target,
-                goal.original_target,
-                goal.target,
-                goal.last_edit_date,
-
-                # Goal dates
-                goal.start_date,
-                date_achieved(goal),
-                not goal.is_active,
-                goal.date_deleted
-            ]
-
-            append_to_csv(data, csvfile)
+        for goal in goal_summary_queryset():
+            append_to_csv(goal_summary_row(goal), csvfile)
 
     pass_zip_encrypt_email(email, export_name, unique_time)
 
@@ -230,64 +501,72 @@ def date_achieved(goal):
     return None
 
 
+USER_SUMMARY_HEADER = (
+    'username', 'name', 'mobile', 'email', 'gender', 'age', 'user_type_source_medium',
+    'date_joined', 'number_of_goals', 'total_badges_earned', 'first_goal_created_badges',
+    'first_savings_created_badges', 'halfway_badges', 'one_week_left_badges',
+    '2_week_streak_badges', '4_week_streak_badges', '6_week_streak_badges',
+    '2_week_on_track_badges', '4_week_on_track_badges', '8_week_on_track_badges',
+    'goal_reached_badges', 'budget_created_badges', 'budget_revision_badges',
+    'highest_streak_earned', 'total_streak_and_ontrack_badges', 'baseline_survey_complete',
+    'ea_tool1_completed', 'ea_tool2_completed', 'endline_survey_completed')
+
+
+def user_summary_queryset():
+    return Profile.objects.filter(user__is_staff=False, user__is_active=True).select_related('user')
+
+
+def user_summary_row(profile):
+    try:
+        campaign_info = CampaignInformation.objects.get(user=profile.user)
+        user_type = campaign_info.source + '/' + campaign_info.medium
+    except:
+        user_type = ''
+
+    return [
+        profile.user.username,
+        profile.user.first_name + " " + profile.user.last_name,
+        profile.mobile,
+        profile.user.email,
+        profile.gender,
+        profile.age,
+        user_type,
+        profile.user.date_joined,
+        number_of_goals(profile),
+        total_badges_earned(profile),
+        num_first_goal_created_badges(profile),
+        num_first_savings_created_badges(profile),
+        num_halfway_badges(profile),
+        num_one_week_left_badges(profile),
+        num_2_week_streak_badges(profile),
+        num_4_week_streak_badges(profile),
+        num_6_week_streak_badges(profile),
+        num_2_week_on_track_badges(profile),
+        num_4_week_on_track_badges(profile),
+        num_8_week_on_track_badges(profile),
+        num_goal_reached_badges(profile),
+        num_budget_created_badges(profile),
+        num_budget_revision_badges(profile),
+        highest_streak_earned(profile),
+        total_streaks_earned(profile),
+        total_streak_and_ontrack_badges(profile),
+        baseline_survey_complete(profile),
+        ea_tool1_completed(profile),
+        ea_tool2_completed(profile),
+        endline_survey_completed(profile)
+    ]
+
+
 @task(name="export_user_summary")
 def export_user_summary(email, export_name, unique_time):
-    profiles = Profile.objects.filter(user__is_staff=False, user__is_active=True)
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-        append_to_csv(('username', 'name', 'mobile', 'email', 'gender', 'age', 'user_type_source_medium',
-                       'date_joined', 'number_of_goals', 'total_badges_earned', 'first_goal_created_badges',
-                       'first_savings_created_badges', 'halfway_badges', 'one_week_left_badges',
-                       '2_week_streak_badges', '4_week_streak_badges', '6_week_streak_badges',
-                       '2_week_on_track_badges', '4_week_on_track_badges', '8_week_on_track_badges',
-                       'goal_reached_badges', 'budget_created_badges', 'budget_revision_badges',
-                       'highest_streak_earned', 'total_streak_and_ontrack_badges', 'baseline_survey_complete',
-                       'ea_tool1_completed', 'ea_tool2_completed', 'endline_survey_completed'),
-                      csvfile)
+        append_to_csv(USER_SUMMARY_HEADER, csvfile)
 
-        for profile in profiles:
-            try:
-                campaign_info = CampaignInformation.objects.get(user=profile.user)
-                user_type = campaign_info.source + '/' + campaign_info.medium
-            except:
-                user_type = ''
-
-            data = [
-                profile.user.username,
-                profile.user.first_name + " " + profile.user.last_name,
-                profile.mobile,
-                profile.user.email,
-                profile.gender,
-                profile.age,
-                user_type,
-                profile.user.date_joined,
-                number_of_goals(profile),
-                total_badges_earned(profile),
-                num_first_goal_created_badges(profile),
-                num_first_savings_created_badges(profile),
-                num_halfway_badges(profile),
-                num_one_week_left_badges(profile),
-                num_2_week_streak_badges(profile),
-                num_4_week_streak_badges(profile),
-                num_6_week_streak_badges(profile),
-                num_2_week_on_track_badges(profile),
-                num_4_week_on_track_badges(profile),
-                num_8_week_on_track_badges(profile),
-                num_goal_reached_badges(profile),
-                num_budget_created_badges(profile),
-                num_budget_revision_badges(profile),
-                highest_streak_earned(profile),
-                total_streaks_earned(profile),
-                total_streak_and_ontrack_badges(profile),
-                baseline_survey_complete(profile),
-                ea_tool1_completed(profile),
-                ea_tool2_completed(profile),
-                endline_survey_completed(profile)
-            ]
-
-            append_to_csv(data, csvfile)
+        for profile in user_summary_queryset():
+            append_to_csv(user_summary_row(profile), csvfile)
 
     pass_zip_encrypt_email(email, export_name, unique_time)
 
@@ -361,19 +640,7 @@ def num_challenge_participation_badges(profile):
 
 def highest_streak_earned(profile):
     """Returns the highest streak of weeks a user has saved, regardless of weekly target"""
-    goals = Goal.objects.filter(user=profile.user)
-    highest_streak = 0
-    current_count = 0
-    for goal in goals:
-        transactions = goal.get_weekly_aggregates_to_date()
-        for trans in transactions:
-            if trans != 0:
-                current_count += 1
-                if current_count > highest_streak:
-                    highest_streak = current_count
-            else:
-                current_count = 0
-    return highest_streak
+    return UserSavingStreak.for_user(profile.user_id).longest_run
 
 
 def total_streak_and_ontrack_badges(profile):
@@ -473,7 +740,7 @@ def endline_survey_completed(profile):
 def export_savings_summary(email, export_name, unique_time):
     goals = Goal.objects.filter(user__is_staff=False, user__is_active=True)
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -518,7 +785,7 @@ def export_challenge_summary(email, export_name, unique_time, date_from, date_to
     else:
         challenges = Challenge.objects.all()
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -575,7 +842,7 @@ def total_no_response(challenge):
 def export_challenge_quiz_summary(email, export_name, unique_time):
     challenges = Challenge.objects.filter(type=Challenge.CTP_QUIZ)
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -615,7 +882,7 @@ def export_challenge_quiz_summary(email, export_name, unique_time):
 def export_challenge_picture(email, export_name, unique_time, challenge_name):
     challenges = Challenge.objects.filter(type=Challenge.CTP_PICTURE, name=challenge_name)
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -664,7 +931,7 @@ def export_challenge_picture(email, export_name, unique_time, challenge_name):
 def export_challenge_quiz(email, export_name, unique_time, challenge_name):
     challenges = Challenge.objects.filter(type=Challenge.CTP_QUIZ, name=challenge_name)
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -723,7 +990,7 @@ def export_challenge_quiz(email, export_name, unique_time, challenge_name):
 def export_challenge_freetext(email, export_name, unique_time, challenge_name):
     challenges = Challenge.objects.filter(type=Challenge.CTP_FREEFORM, name=challenge_name)
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -777,7 +1044,7 @@ def export_challenge_freetext(email, export_name, unique_time, challenge_name):
 @task(name="export_aggregate_summary")
 def export_aggregate_summary(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -853,7 +1120,7 @@ def percentage_weeks_saved():
 @task(name="export_aggregate_goal_data_per_category")
 def export_aggregate_goal_data_per_category(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -865,17 +1132,20 @@ def export_aggregate_goal_data_per_category(email, export_name, unique_time):
 
         goal_prototypes = GoalPrototype.objects.all()
 
+        aggregates = goal_prototype_aggregates()
+
         for goal_prototype in goal_prototypes:
+            prototype_aggregates = aggregates.get(goal_prototype.pk, {})
             data = [
                 goal_prototype.name,
-                Goal.objects.filter(prototype=goal_prototype).values('user_id').distinct().count(),
-                Goal.objects.filter(prototype=goal_prototype).count(),
-                total_users_achieved_at_least_one_goal(goal_prototype),
-                average_total_goal_amount(goal_prototype),
-                average_percentage_of_goal_reached(goal_prototype),
-                total_users_50_percent_achieved(goal_prototype),
-                total_users_100_percent_achieved(goal_prototype),
-                percentage_of_weeks_saved_out_of_total_weeks(goal_prototype)
+                prototype_aggregates.get('total_users_at_least_one_goal', 0),
+                prototype_aggregates.get('total_goals_set', 0),
+                prototype_aggregates.get('total_users_achieved_at_least_one_goal', 0),
+                prototype_aggregates.get('average_total_goal_amount', 0),
+                prototype_aggregates.get('average_percentage_of_goal_reached', 0),
+                prototype_aggregates.get('total_users_50_percent_achieved', 0),
+                prototype_aggregates.get('total_users_100_percent_achieved', 0),
+                prototype_aggregates.get('percentage_of_weeks_saved_out_of_total_weeks', 0)
             ]
 
             append_to_csv(data, csvfile)
@@ -885,6 +1155,10 @@ def export_aggregate_goal_data_per_category(email, export_name, unique_time):
     return True, SUCCESS_MESSAGE_EMAIL_SENT
 
 
+# The per prototype helpers below compute each metric with a query per goal. The export uses
+# `content.reports.goal_prototype_aggregates` instead, and these are kept to verify it against.
+
+
 def total_users_achieved_at_least_one_goal(goal_prototype):
     """
     Returns the number of users that have achieved the goal prototype
@@ -999,7 +1273,7 @@ def percentage_of_weeks_saved_out_of_total_weeks(goal_prototype):
 @task(name="export_aggregate_rewards_data")
 def export_aggregate_rewards_data(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -1022,33 +1296,14 @@ def export_aggregate_rewards_data(email, export_name, unique_time):
 
 
 def total_users_at_least_one_streak():
-    """Returns the total number of users that have at least one streak"""
-    users_with_streaks = 0
-    users = User.objects.filter(is_staff=False, user__is_active=True)
-
-    for user in users:
-        goals = Goal.objects.filter(user=user, user__is_staff=False, user__is_active=True)
-        current_count = 0
+    """Returns the total number of users that have saved at least two weeks in a row"""
+    users = User.objects.filter(is_staff=False, is_active=True)
 
-        user_has_streak = False
-
-        goal_generator = (goal for goal in goals if user_has_streak is False)
-
-        for goal in goal_generator:
-            transactions = goal.get_weekly_aggregates_to_date()
-
-            transaction_generator = (transaction for transaction in transactions if user_has_streak is False)
-
-            for trans in transaction_generator:
-                if trans != 0:
-                    current_count += 1
-                    if current_count > 1:
-                        users_with_streaks += 1
-                        user_has_streak = True
-                else:
-                    current_count = 0
+    # Streaks are built when first needed, for users who haven't saved since they were introduced
+    for user_id in users.filter(saving_streak__isnull=True).values_list('id', flat=True).iterator():
+        UserSavingStreak.for_user(user_id)
 
-    return users_with_streaks
+    return UserSavingStreak.objects.filter(user__in=users, longest_run__gte=2).count()
 
 
 def average_percentage_weeks_saved_weekly_target_met():
@@ -1104,20 +1359,24 @@ def average_percentage_weeks_saved():
 @task(name="export_aggregate_data_per_badge")
 def export_aggregate_data_per_badge(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
         append_to_csv(('badge_name', 'total_earned_by_all_users', 'total_earned_at_least_once'),
                       csvfile)
 
+        # Badges of the same type are counted together
+        totals = badge_type_totals()
+
         badges = Badge.objects.all()
 
         for badge in badges:
+            badge_totals = totals.get(badge.badge_type, {})
             data = [
                 badge.name,
-                total_earned_by_all_users(badge),
-                total_earned_at_least_once(badge)
+                badge_totals.get('earned', 0),
+                badge_totals.get('earners', 0)
             ]
 
             append_to_csv(data, csvfile)
@@ -1127,21 +1386,9 @@ def export_aggregate_data_per_badge(email, export_name, unique_time):
     return True, SUCCESS_MESSAGE_EMAIL_SENT
 
 
-def total_earned_by_all_users(badge):
-    """Returns the total number of badges won for the given badge for all users"""
-    return Badge.objects.filter(user__is_staff=False, user__is_active=True,
-                                badge_type=badge.badge_type).values('user').count()
-
-
-def total_earned_at_least_once(badge):
-    """Return the total number of users that have earned the given badge at least once"""
-    return Badge.objects.filter(user__is_staff=False, user__is_active=True,
-                                badge_type=badge.badge_type).values('user').distinct().count()
-
-
 @task(name="export_aggregate_data_per_streak")
 def export_aggregate_data_per_streak(email, export_name, unique_time):
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -1352,7 +1599,7 @@ def get_total_users_not_reached_weekly_savings_for_weeks():
 @task(name="export_aggregate_user_type")
 def export_aggregate_user_type(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -1399,7 +1646,7 @@ def export_aggregate_user_type(email, export_name, unique_time):
 @task(name="export_survey_summary")
 def export_survey_summary(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -1407,157 +1654,34 @@ def export_survey_summary(email, export_name, unique_time):
                        'total_users_claim_over_17', 'total_no_engagement', 'total_no_first_conversation'),
                       csvfile)
 
-        # Baseline Survey
-
-        num_completed_users = CoachSurveySubmission.objects.filter(
-            user__is_staff=False,
-            user__is_active=True,
-            survey__bot_conversation=CoachSurvey.BASELINE).count()
-
-        num_in_progress_users = CoachSurveySubmissionDraft.objects.filter(
-            user__is_staff=False,
-            user__is_active=True,
-            survey__bot_conversation=CoachSurvey.BASELINE,
-            complete=False).count()
-
-        num_first_convo_no = 0
-        num_no_consent = 0
-        num_claim_over_17_users = 0
-
-        submitted_survey_drafts = CoachSurveySubmissionDraft.objects.filter(
-            user__is_staff=False,
-            user__is_active=True,
-            survey__bot_conversation=CoachSurvey.BASELINE,
-            consent=False)
-
-        # Counts number of first conversation no responses, others checks to see if they have no consent
-        for survey in submitted_survey_drafts:
-            if survey.has_submission:
-                submission_data = json.loads(survey.submission_data)
-                try:
-                    if submission_data['survey_baseline_intro'] == '0':
-                        num_first_convo_no += 1
-                    elif survey.consent is False:
-                        num_no_consent += 1
-                except KeyError:
-                    pass
-
-        submitted_surveys = CoachSurveySubmission.objects.filter(
-            user__is_staff=False,
-            user__is_active=True,
-            survey__bot_conversation=CoachSurvey.BASELINE)
-
-        for survey in submitted_surveys:
-            survey_data = survey.get_data()
-            try:
-                if survey_data['survey_baseline_q1_consent'] == 1:
-                    num_claim_over_17_users += 1
-            except KeyError:
-                pass
-
-        num_total_users = User.objects.filter(is_staff=False).count()
-        num_participated_survey = CoachSurveySubmission.objects\
-            .filter(user__is_staff=False, user__is_active=True, survey__bot_conversation=CoachSurvey.BASELINE)\
-            .values('user')\
-            .distinct()\
-            .count()
-
-        num_no_engagement = num_total_users - num_participated_survey - num_first_convo_no
-
-        data = [
-            'Baseline Survey',
-            num_completed_users,
-            num_in_progress_users,
-            num_no_consent,
-            num_claim_over_17_users,
-            num_no_engagement,
-            num_first_convo_no
-        ]
-        append_to_csv(data, csvfile)
-
-        # Ea Tool 1 Survey
-
-        num_completed_users = CoachSurveySubmission.objects.filter(
-            user__is_staff=False,
-            user__is_active=True,
-            survey__bot_conversation=CoachSurvey.EATOOL).count()
-
-        num_in_progress_users = CoachSurveySubmissionDraft.objects.filter(
-            user__is_staff=False,
-            user__is_active=True,
-            survey__bot_conversation=CoachSurvey.EATOOL,
-            complete=False).count()
-
-        num_first_convo_no = 0
-        num_no_consent = 0
-        num_claim_over_17_users = 0
-
-        submitted_survey_drafts = CoachSurveySubmissionDraft.objects.filter(
-            user__is_staff=False,
-            user__is_active=True,
-            survey__bot_conversation=CoachSurvey.EATOOL,
-            consent=False)
-
-        # Counts number of first conversation no responses, others checks to see if they have no consent
-        for survey in submitted_survey_drafts:
-            if survey.has_submission:
-                submission_data = json.loads(survey.submission_data)
-                try:
-                    if submission_data['survey_eatool_intro'] == '0':
-                        num_first_convo_no += 1
-                    elif survey.consent is False:
-                        num_no_consent += 1
-                except KeyError:
-                    pass
-
-        submitted_surveys = CoachSurveySubmission.objects.filter(
-            user__is_staff=False,
-            user__is_active=True,
-            survey__bot_conversation=CoachSurvey.EATOOL)
-
-        for survey in submitted_surveys:
-            survey_data = survey.get_data()
-            try:
-                if survey_data['survey_eatool_q1_consent'] == 1:
-                    num_claim_over_17_users += 1
-            except KeyError:
-                pass
-
-        num_total_users = User.objects.filter(is_staff=False).count()
-        num_participated_survey = CoachSurveySubmissionDraft.objects \
-            .filter(user__is_staff=False, user__is_active=True, survey__bot_conversation=CoachSurvey.EATOOL) \
-            .values('user') \
-            .distinct() \
-            .count()
-
-        num_no_engagement = num_total_users - num_participated_survey - num_first_convo_no
-
-        data = [
-            'EA Tool 1 Survey',
-            num_completed_users,
-            num_in_progress_users,
-            num_no_consent,
-            num_claim_over_17_users,
-            num_no_engagement,
-            num_first_convo_no
-        ]
-        append_to_csv(data, csvfile)
+        for aggregate in survey_aggregates():
+            data = [
+                aggregate['name'],
+                aggregate['completed'],
+                aggregate['in_progress'],
+                aggregate['no_consent'],
+                aggregate['claims_over_17'],
+                aggregate['no_engagement'],
+                aggregate['declined_intro']
+            ]
+            append_to_csv(data, csvfile)
 
-        # EA Tool 2 Survey
+    pass_zip_encrypt_email(email, export_name, unique_time)
 
-        data = [
-            'EA Tool 2 Survey',
+    return True, SUCCESS_MESSAGE_EMAIL_SENT
 
-        ]
-        append_to_csv(data, csvfile)
 
-        # Endline Survey
+def export_survey_submissions(surveys, email, export_name, unique_time):
+    """Exports the submissions of the surveys, one column per survey question."""
+    filename = report_path(export_name, unique_time)
+    create_csv(filename)
 
-        data = [
-            'Endline Survey',
+    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
+        export = SurveyExport(surveys)
+        append_to_csv(export.header(), csvfile)
 
-        ]
-        append_to_csv(data, csvfile)
+        for data in export.rows():
+            append_to_csv(data, csvfile)
 
     pass_zip_encrypt_email(email, export_name, unique_time)
 
@@ -1567,977 +1691,26 @@ def export_survey_summary(email, export_name, unique_time):
 @task(name="export_baseline_survey")
 def export_baseline_survey(email, export_name, unique_time):
     surveys = CoachSurvey.objects.filter(bot_conversation=CoachSurvey.BASELINE)
-
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
-    create_csv(filename)
-
-    # 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 999
-    q01_answers = {
-        1: '"Student in elementary school (SD)"',
-        2: '"Student in middle school (SMP)"',
-        3: '"Student in academic high school (SMA)"',
-        4: '"Student in vocational high school (SMK)"',
-        5: '"Student in college or above"',
-        6: '"Employee working in a job"',
-        7: '"Business owner or co-owner"',
-        8: '"Volunteer in church or community"',
-        9: '"Care giver of family members or children"',
-        10: '"Not working, studying, or volunteering"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 999
-    q02_answers = {
-        1: '"1st Year"',
-        2: '"2nd Year"',
-        3: '"3rd Year"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q05_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q06_answers = {
-        1: '"Less than 250 thousand"',
-        2: '"Between 250 thousand and 500 thousand"',
-        3: '"Between 500 thousand and 750 thousand"',
-        4: '"Between 750 thousand and 1 million"',
-        5: '"Between 1 million and 1,5 million"',
-        6: '"More than 1,5 million"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 888, 999
-    q07_answers = {
-        1: '"Permanent staff (signed contract with specific salary and benefits)"',
-        2: '"Indefinite term employment (probation, pathway to permanent staff)"',
-        3: '"Temporary/casual (working on short assignments or task, no contract)"',
-        4: '"Apprenticeship (learning new skill and receiving small monetary support to cover transport cost)"',
-        5: '"Daily worker (working on a day to day basis)"',
-        6: '"Helping family business with pay"',
-        7: '"Does not know"',
-        888: '888',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q08_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q09_answers = {
-        1: '"Less than 250 thousand"',
-        2: '"Between 250 thousand and 500 thousand"',
-        3: '"Between 500 thousand and 750 thousand"',
-        4: '"Between 750 thousand and 1 million"',
-        5: '"Between 1 million and 1,5 million"',
-        6: '"More than 1,5 million"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q10_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 7, 8, 999
-    q11_answers = {
-        1: '"Daily"',
-        2: '"Weekly"',
-        3: '"Monthly"',
-        4: '"Every 2 months"',
-        5: '"Every 3 or 4 months"',
-        6: '"Once or twice a year"',
-        7: '"Do not remember"',
-        8: '"Varies (different times, not a set frequency)"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q12_answers = {
-        1: '"Bank"',
-        2: '"Community savings group"',
-        3: '"At home (chicken bank)"',
-        4: '"Send to family for safekeeping"',
-        5: '"Buy gold or other valuables"',
-        6: '"Other"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 7, 8, 999
-    q13_answers = {
-        1: '"Less than 100 thousand"',
-        2: '"Between 100 thousand and 150 thousand"',
-        3: '"Between 150 thousand and 200 thousand"',
-        4: '"Between 200 thousand and 250 thousand"',
-        5: '"Between 250 thousand and 300 thousand"',
-        6: '"Between 300 thousand and 350 thousand"',
-        7: '"Between 350 thousand and 400 thousand"',
-        8: '"More than 400 thousand"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q14_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q15_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q16_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q17_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q18_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q19_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q20_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q21_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q22_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 999
-    q23_answers = {
-        1: '"Never"',
-        2: '"Once a month"',
-        3: '"Once a week"',
-        4: '"Once a day"',
-        5: '"Multiple times per day"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q24_answers = {
-        1: '"Calling or texting friends"',
-        2: '"Calling or texting family"',
-        3: '"Accessing social media"',
-        4: '"Accessing information on the internet"',
-        5: '"Using apps or tools to help me manage my life, like trackers or calendars."',
-        6: '"Other"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q25_answers = {
-        1: '"Calling or texting friends"',
-        2: '"Calling or texting family"',
-        3: '"Accessing social media"',
-        4: '"Accessing information on the internet"',
-        5: '"Using apps or tools to help me manage my life, like trackers or calendars."',
-        6: '"Other"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q26_answers = {
-        1: '"You"',
-        2: '"Mother"',
-        3: '"Father"',
-        4: '"Sibling"',
-        5: '"Another relative"',
-        6: '"Someone else"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 999
-    q27_1_answers = {
-        1: '"Approve"',
-        2: '"Neutral"',
-        3: '"Disapprove"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 999
-    q27_2_answers = {
-        1: '"Approve"',
-        2: '"Neutral"',
-        3: '"Disapprove"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 999
-    q27_3_answers = {
-        1: '"Approve"',
-        2: '"Neutral"',
-        3: '"Disapprove"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q28_answers = {
-        1: '"Less than 5 thousand rupiah"',
-        2: '"Between 5 thousand and 15 thousand rupiah"',
-        3: '"Between 15 thousand and 25 thousand rupiah"',
-        4: '"Between 25 thousand and 35 thousand rupiah"',
-        5: '"Between 35 thousand and 45 thousand rupiah"',
-        6: '"More than 45 thousand rupiah"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q29_1_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q29_2_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q29_3_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q29_4_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-        append_to_csv(('uuid', 'username', 'name', 'mobile', 'email', 'gender', 'age',
-                       'user_type_source_medium', 'date_joined', 'city', 'younger_than_17', 'consent_given',
-                       'submission_date',
-
-                       # Survey questions
-                       'q1_WhatIsYourOccupation',
-                       'q2_WhatGradeAreYouIn',
-                       'q3_WhatIsTheNameOfYourSMK',
-                       'q4_WhatCityDoYouLiveIn',
-                       'q5_HaveYouEverHadAPaidJobForLongerThanOneMonthIncludeWorkingInFamilyBusinessAndOrApprenticeshipsIfPaid',
-                       'q6_WithinWhatRangeDIdYourMonthlyEarningFallForYourLastJob',
-                       'q7_WhatWasYourEmploymentStatusInYourLastJob',
-                       'q8_HaveYouEverOwnedOrSharedOwnershipOfABusiness',
-                       'q9_WithinWhatRangeDidYourMonthlyBusinessEarningsFall',
-                       'q10_DoYouEverSaveSomeOfYourMoney',
-                       'q11_HowFrequentlyDoYouSaveMoney',
-                       'q12_WhereDoYouKeepMostOfYourSavings',
-                       'q13_InTheLast3MonthsApproximatelyHowMuchMoneyDidYouSaveInTotal',
-                       'q14_HaveYouEverSavedMoneyToPayForEducationCostsLikeFeesForATrainingCourse',
-                       'q15_HaveYouEverSavedMOneyToPayForTheCostOfLookingForAJobOrAttendingJobInterviews',
-                       'q16_HaveYouEverSavedMoneyToHaveSomeExtraInCaseOfEmergencies',
-                       'q17_HaveYouEverSavedMoneyToInvestInBusinessOpportunities',
-                       'q18_HaveYouEverSavedMoneyToSupportFamilyNeeds',
-                       'q19_HaveYouEverSavedMoneyToBuyPersonalItemsForEverydayUseLikeClothesOrFood',
-                       'q20_HaveYouEverSavedMoneyToBuyPersonalItemsForEverydayUseLikeClothesOrFood',
-                       'q21_HaveYouEverSavedMoneyToBuyItemsThatLastLongerLikeAPhoneComputerOrMotorbike',
-                       'q22_HaveYouEverSavedMoneyToGoOutWithFriendsForFun', 'q23_HowOftenDoYouUseAMobilePhone',
-                       'q24_WhatIsYourMobilePhoneMostUsefulFor',
-                       'q25_WhatIsYourMobilePhoneLeastUsefulFor',
-                       'q26_WhoOwnsTheMobilePhoneThatYouUse',
-                       'q27_1_HereAreSOmePeopleYouMightInteractWithPleaseTellMeIfYouThinkTheyApproveDisapproveOrAreNeutralTowardYouOrYourFriendsUsingMobilePhones',
-                       'q27_2',
-                       'q27_3',
-                       'q28_HowMuchCreditDoYouOrYourFamilyPutIntoYourMobilePhoneOnATypicalWeek',
-                       'q29_1_DoYouHaveTheFollowingAssetsInYourHome',
-                       'q29_2',
-                       'q29_3',
-                       'q29_4'),
-                      csvfile)
-
-        for survey in surveys:
-            # All baseline survey submissions that are complete
-            submissions = CoachSurveySubmission.objects.filter(user__is_staff=False,
-                                                               user__is_active=True,
-                                                               survey=survey)
-
-            for submission in submissions:
-                try:
-                    campaign_info = CampaignInformation.objects.get(user=submission.user)
-                    user_type = campaign_info.source + '/' + campaign_info.medium
-                except:
-                    user_type = ''
-                survey_data = submission.get_data()
-
-                data = [
-                    submission.user_unique_id,
-                    submission.username,
-                    submission.name,
-                    submission.mobile,
-                    submission.email,
-                    submission.gender,
-                    submission.age,
-                    user_type,  # user type
-                    submission.user.date_joined,
-                    survey_data['survey_baseline_q04_city'],
-                    survey_data['survey_baseline_q1_consent'],
-                    submission.consent,  # survey_data['survey_baseline_q2_consent']
-                    submission.created_at,
-
-                    # survey questions
-                    q01_answers[int(survey_data['survey_baseline_q01_occupation'])],
-                    q02_answers[int(survey_data['survey_baseline_q02_grade'])],
-                    survey_data['survey_baseline_q03_school_name'],
-                    survey_data['survey_baseline_q04_city'],
-                    q05_answers[int(survey_data['survey_baseline_q05_job_month'])],
-                    q06_answers[int(survey_data['survey_baseline_q06_job_earning_range'])],
-                    q07_answers[int(survey_data['survey_baseline_q07_job_status'])],
-                    q08_answers[int(survey_data['survey_baseline_q08_shared_ownership'])],
-                    q09_answers[int(survey_data['survey_baseline_q09_business_earning_range'])],
-                    q10_answers[int(survey_data['survey_baseline_q10_save'])],
-                    q11_answers[int(survey_data['survey_baseline_q11_savings_frequency'])],
-                    q12_answers[int(survey_data['survey_baseline_q12_savings_where'])],
-                    q13_answers[int(survey_data['survey_baseline_q13_savings_3_months'])],
-                    q14_answers[int(survey_data['survey_baseline_q14_saving_education'])],
-                    q15_answers[int(survey_data['survey_baseline_q15_job_hunt'])],
-                    q16_answers[int(survey_data['survey_baseline_q16_emergencies'])],
-                    q17_answers[int(survey_data['survey_baseline_q17_invest'])],
-                    q18_answers[int(survey_data['survey_baseline_q18_family'])],
-                    q19_answers[int(survey_data['survey_baseline_q19_clothes_food'])],
-                    '',  # Missing q20
-                    q21_answers[int(survey_data['survey_baseline_q21_gadgets'])],
-                    q22_answers[int(survey_data['survey_baseline_q22_friends'])],
-                    q23_answers[int(survey_data['survey_baseline_q23_mobile_frequency'])],
-                    q24_answers[int(survey_data['survey_baseline_q24_mobile_most_use'])],
-                    q25_answers[int(survey_data['survey_baseline_q25_mobile_least_use'])],
-                    q26_answers[int(survey_data['survey_baseline_q26_mobile_own'])],
-                    q27_1_answers[int(survey_data['survey_baseline_q27_1_friends'])],
-                    q27_2_answers[int(survey_data['survey_baseline_q27_2_family'])],
-                    q27_3_answers[int(survey_data['survey_baseline_q27_3_community'])],
-                    q28_answers[int(survey_data['survey_baseline_q28_mobile_credit'])],
-                    q29_1_answers[int(survey_data['survey_baseline_q29_1_desktop'])],
-                    q29_2_answers[int(survey_data['survey_baseline_q29_2_laptop'])],
-                    q29_3_answers[int(survey_data['survey_baseline_q29_3_mobile_no_data'])],
-                    q29_4_answers[int(survey_data['survey_baseline_q29_4_mobile_data'])]
-                ]
-
-                append_to_csv(data, csvfile)
-
-    pass_zip_encrypt_email(email, export_name, unique_time)
-
-    return True, SUCCESS_MESSAGE_EMAIL_SENT
+    return export_survey_submissions(surveys, email, export_name, unique_time)
 
 
 @task(name="export_endline_survey")
 def export_endline_survey(email, export_name, unique_time):
     surveys = CoachSurvey.objects.filter(bot_conversation=CoachSurvey.ENDLINE)
-
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
-    create_csv(filename)
-
-    # 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 999
-    q01_answers = {
-        1: '"Student in elementary school (SD)"',
-        2: '"Student in middle school (SMP)"',
-        3: '"Student in academic high school (SMA)"',
-        4: '"Student in vocational high school (SMK)"',
-        5: '"Student in college or above"',
-        6: '"Employee working in a job"',
-        7: '"Business owner or co-owner"',
-        8: '"Volunteer in church or community"',
-        9: '"Care giver of family members or children"',
-        10: '"Not working, studying, or volunteering"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 999
-    q02_answers = {
-        1: '"1st Year"',
-        2: '"2nd Year"',
-        3: '"3rd Year"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q05_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q06_answers = {
-        1: '"Less than 250 thousand"',
-        2: '"Between 250 thousand and 500 thousand"',
-        3: '"Between 500 thousand and 750 thousand"',
-        4: '"Between 750 thousand and 1 million"',
-        5: '"Between 1 million and 1,5 million"',
-        6: '"More than 1,5 million"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 888, 999
-    q07_answers = {
-        1: '"Permanent staff (signed contract with specific salary and benefits)"',
-        2: '"Indefinite term employment (probation, pathway to permanent staff)"',
-        3: '"Temporary/casual (working on short assignments or task, no contract)"',
-        4: '"Apprenticeship (learning new skill and receiving small monetary support to cover transport cost)"',
-        5: '"Daily worker (working on a day to day basis)"',
-        6: '"Helping family business with pay"',
-        7: '"Does not know"',
-        888: '888',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q08_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q09_answers = {
-        1: '"Less than 250 thousand"',
-        2: '"Between 250 thousand and 500 thousand"',
-        3: '"Between 500 thousand and 750 thousand"',
-        4: '"Between 750 thousand and 1 million"',
-        5: '"Between 1 million and 1,5 million"',
-        6: '"More than 1,5 million"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q10_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 7, 8, 999
-    q11_answers = {
-        1: '"Daily"',
-        2: '"Weekly"',
-        3: '"Monthly"',
-        4: '"Every 2 months"',
-        5: '"Every 3 or 4 months"',
-        6: '"Once or twice a year"',
-        7: '"Do not remember"',
-        8: '"Varies (different times, not a set frequency)"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q12_answers = {
-        1: '"Bank"',
-        2: '"Community savings group"',
-        3: '"At home (chicken bank)"',
-        4: '"Send to family for safekeeping"',
-        5: '"Buy gold or other valuables"',
-        6: '"Other"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 7, 8, 999
-    q13_answers = {
-        1: '"Less than 100 thousand"',
-        2: '"Between 100 thousand and 150 thousand"',
-        3: '"Between 150 thousand and 200 thousand"',
-        4: '"Between 200 thousand and 250 thousand"',
-        5: '"Between 250 thousand and 300 thousand"',
-        6: '"Between 300 thousand and 350 thousand"',
-        7: '"Between 350 thousand and 400 thousand"',
-        8: '"More than 400 thousand"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q14_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q15_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q16_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q17_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q18_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q19_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q20_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q21_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q22_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 999
-    q23_answers = {
-        1: '"Never"',
-        2: '"Once a month"',
-        3: '"Once a week"',
-        4: '"Once a day"',
-        5: '"Multiple times per day"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q24_answers = {
-        1: '"Calling or texting friends"',
-        2: '"Calling or texting family"',
-        3: '"Accessing social media"',
-        4: '"Accessing information on the internet"',
-        5: '"Using apps or tools to help me manage my life, like trackers or calendars."',
-        6: '"Other"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q25_answers = {
-        1: '"Calling or texting friends"',
-        2: '"Calling or texting family"',
-        3: '"Accessing social media"',
-        4: '"Accessing information on the internet"',
-        5: '"Using apps or tools to help me manage my life, like trackers or calendars."',
-        6: '"Other"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q26_answers = {
-        1: '"You"',
-        2: '"Mother"',
-        3: '"Father"',
-        4: '"Sibling"',
-        5: '"Another relative"',
-        6: '"Someone else"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 999
-    q27_1_answers = {
-        1: '"Approve"',
-        2: '"Neutral"',
-        3: '"Disapprove"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 999
-    q27_2_answers = {
-        1: '"Approve"',
-        2: '"Neutral"',
-        3: '"Disapprove"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 999
-    q27_3_answers = {
-        1: '"Approve"',
-        2: '"Neutral"',
-        3: '"Disapprove"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1, 2, 3, 4, 5, 6, 999
-    q28_answers = {
-        1: '"Less than 5 thousand rupiah"',
-        2: '"Between 5 thousand and 15 thousand rupiah"',
-        3: '"Between 15 thousand and 25 thousand rupiah"',
-        4: '"Between 25 thousand and 35 thousand rupiah"',
-        5: '"Between 35 thousand and 45 thousand rupiah"',
-        6: '"More than 45 thousand rupiah"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q29_1_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q29_2_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q29_3_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    # 1y, 0n, 999
-    q29_4_answers = {
-        0: '"No"',
-        1: '"Yes"',
-        998: '998',
-        999: '999',
-    }
-
-    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-        append_to_csv(('uuid', 'username', 'name', 'mobile', 'email', 'gender', 'age',
-                       'user_type_source_medium', 'date_joined', 'city', 'younger_than_17', 'consent_given',
-                       'submission_date',
-
-                       # Survey questions
-                       'q1_WhatIsYourOccupation',
-                       'q2_WhatGradeAreYouIn',
-                       'q3_WhatIsTheNameOfYourSMK',
-                       'q4_WhatCityDoYouLiveIn',
-                       'q5_HaveYouEverHadAPaidJobForLongerThanOneMonthIncludeWorkingInFamilyBusinessAndOrApprenticeshipsIfPaid',
-                       'q6_WithinWhatRangeDIdYourMonthlyEarningFallForYourLastJob',
-                       'q7_WhatWasYourEmploymentStatusInYourLastJob',
-                       'q8_HaveYouEverOwnedOrSharedOwnershipOfABusiness',
-                       'q9_WithinWhatRangeDidYourMonthlyBusinessEarningsFall',
-                       'q10_DoYouEverSaveSomeOfYourMoney',
-                       'q11_HowFrequentlyDoYouSaveMoney',
-                       'q12_WhereDoYouKeepMostOfYourSavings',
-                       'q13_InTheLast3MonthsApproximatelyHowMuchMoneyDidYouSaveInTotal',
-                       'q14_HaveYouEverSavedMoneyToPayForEducationCostsLikeFeesForATrainingCourse',
-                       'q15_HaveYouEverSavedMOneyToPayForTheCostOfLookingForAJobOrAttendingJobInterviews',
-                       'q16_HaveYouEverSavedMoneyToHaveSomeExtraInCaseOfEmergencies',
-                       'q17_HaveYouEverSavedMoneyToInvestInBusinessOpportunities',
-                       'q18_HaveYouEverSavedMoneyToSupportFamilyNeeds',
-                       'q19_HaveYouEverSavedMoneyToBuyPersonalItemsForEverydayUseLikeClothesOrFood',
-                       'q20_HaveYouEverSavedMoneyToBuyPersonalItemsForEverydayUseLikeClothesOrFood',
-                       'q21_HaveYouEverSavedMoneyToBuyItemsThatLastLongerLikeAPhoneComputerOrMotorbike',
-                       'q22_HaveYouEverSavedMoneyToGoOutWithFriendsForFun', 'q23_HowOftenDoYouUseAMobilePhone',
-                       'q24_WhatIsYourMobilePhoneMostUsefulFor',
-                       'q25_WhatIsYourMobilePhoneLeastUsefulFor',
-                       'q26_WhoOwnsTheMobilePhoneThatYouUse',
-                       'q27_1_HereAreSOmePeopleYouMightInteractWithPleaseTellMeIfYouThinkTheyApproveDisapproveOrAreNeutralTowardYouOrYourFriendsUsingMobilePhones',
-                       'q27_2',
-                       'q27_3',
-                       'q28_HowMuchCreditDoYouOrYourFamilyPutIntoYourMobilePhoneOnATypicalWeek',
-                       'q29_1_DoYouHaveTheFollowingAssetsInYourHome',
-                       'q29_2',
-                       'q29_3',
-                       'q29_4'),
-                      csvfile)
-
-        for survey in surveys:
-            # All baseline survey submissions that are complete
-            submissions = CoachSurveySubmission.objects.filter(user__is_staff=False,
-                                                               user__is_active=True,
-                                                               survey=survey)
-
-            for submission in submissions:
-                try:
-                    campaign_info = CampaignInformation.objects.get(user=submission.user)
-                    user_type = campaign_info.source + '/' + campaign_info.medium
-                except:
-                    user_type = ''
-                survey_data = submission.get_data()
-
-                data = [
-                    submission.user_unique_id,
-                    submission.username,
-                    submission.name,
-                    submission.mobile,
-                    submission.email,
-                    submission.gender,
-                    submission.age,
-                    user_type,  # user type
-                    submission.user.date_joined,
-                    survey_data['survey_endline_q04_city'],
-                    survey_data['survey_endline_q1_consent'],
-                    submission.consent,  # survey_data['survey_endline_q2_consent']
-                    submission.created_at,
-
-                    # survey questions
-                    q01_answers[int(survey_data['survey_endline_q01_occupation'])],
-                    q02_answers[int(survey_data['survey_endline_q02_grade'])],
-                    survey_data['survey_endline_q03_school_name'],
-                    survey_data['survey_endline_q04_city'],
-                    q05_answers[int(survey_data['survey_endline_q05_job_month'])],
-                    q06_answers[int(survey_data['survey_endline_q06_job_earning_range'])],
-                    q07_answers[int(survey_data['survey_endline_q07_job_status'])],
-                    q08_answers[int(survey_data['survey_endline_q08_shared_ownership'])],
-                    q09_answers[int(survey_data['survey_endline_q09_business_earning_range'])],
-                    q10_answers[int(survey_data['survey_endline_q10_save'])],
-                    q11_answers[int(survey_data['survey_endline_q11_savings_frequency'])],
-                    q12_answers[int(survey_data['survey_endline_q12_savings_where'])],
-                    q13_answers[int(survey_data['survey_endline_q13_savings_3_months'])],
-                    q14_answers[int(survey_data['survey_endline_q14_saving_education'])],
-                    q15_answers[int(survey_data['survey_endline_q15_job_hunt'])],
-                    q16_answers[int(survey_data['survey_endline_q16_emergencies'])],
-                    q17_answers[int(survey_data['survey_endline_q17_invest'])],
-                    q18_answers[int(survey_data['survey_endline_q18_family'])],
-                    q19_answers[int(survey_data['survey_endline_q19_clothes_food'])],
-                    '',  # Missing q20
-                    q21_answers[int(survey_data['survey_endline_q21_gadgets'])],
-                    q22_answers[int(survey_data['survey_endline_q22_friends'])],
-                    q23_answers[int(survey_data['survey_endline_q23_mobile_frequency'])],
-                    q24_answers[int(survey_data['survey_endline_q24_mobile_most_use'])],
-                    q25_answers[int(survey_data['survey_endline_q25_mobile_least_use'])],
-                    q26_answers[int(survey_data['survey_endline_q26_mobile_own'])],
-                    q27_1_answers[int(survey_data['survey_endline_q27_1_friends'])],
-                    q27_2_answers[int(survey_data['survey_endline_q27_2_family'])],
-                    q27_3_answers[int(survey_data['survey_endline_q27_3_community'])],
-                    q28_answers[int(survey_data['survey_endline_q28_mobile_credit'])],
-                    q29_1_answers[int(survey_data['survey_endline_q29_1_desktop'])],
-                    q29_2_answers[int(survey_data['survey_endline_q29_2_laptop'])],
-                    q29_3_answers[int(survey_data['survey_endline_q29_3_mobile_no_data'])],
-                    q29_4_answers[int(survey_data['survey_endline_q29_4_mobile_data'])]
-                ]
-
-                append_to_csv(data, csvfile)
-
-    pass_zip_encrypt_email(email, export_name, unique_time)
-
-    return True, SUCCESS_MESSAGE_EMAIL_SENT
+    return export_survey_submissions(surveys, email, export_name, unique_time)
 
 
 @task(name="export_ea1tool_survey")
 def export_ea1tool_survey(email, export_name, unique_time):
     surveys = CoachSurvey.objects.filter(bot_conversation=CoachSurvey.EATOOL)
-
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
-    create_csv(filename)
-
-    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-        append_to_csv(('uuid', 'username', 'name', 'mobile', 'email', 'gender', 'age',
-                       'user_type_source_medium', 'date_joined', 'city', 'younger_than_17', 'consent_given',
-                       'submission_date',
-
-                       # Survey questions
-                       'q1', 'q2', 'q3', 'q4', 'q5', 'q6', 'q7', 'q8', 'q9', 'q10', 'q11', 'q12',
-                       'q13', 'q14', 'q15', 'q16', 'q17', 'q18', 'q19', 'q20', 'q21', 'q22', 'q23', 'q24'
-                       ),
-                      csvfile)
-
-        for survey in surveys:
-            submissions = CoachSurveySubmission.objects.filter(user__is_staff=False,
-                                                               user__is_active=True,
-                                                               survey=survey)
-
-            for submission in submissions:
-                try:
-                    campaign_info = CampaignInformation.objects.get(user=submission.user)
-                    user_type = campaign_info.source + '/' + campaign_info.medium
-                except:
-                    user_type = ''
-                survey_data = submission.get_data()
-
-                data = [
-                    submission.user_unique_id,
-                    submission.username,
-                    submission.name,
-                    submission.mobile,
-                    submission.email,
-                    submission.gender,
-                    submission.age,
-                    user_type,  # user type
-                    submission.user.date_joined,
-                    '',  # City
-                    survey_data['survey_eatool_q1_consent'],
-                    submission.consent,  # survey_data['survey_eatool_q2_consent']
-                    submission.created_at,
-
-                    survey_data['survey_eatool_q01_appreciate'],
-                    survey_data['survey_eatool_q02_optimistic'],
-                    survey_data['survey_eatool_q03_career'],
-                    survey_data['survey_eatool_q04_adapt'],
-                    survey_data['survey_eatool_q05_duties'],
-                    survey_data['survey_eatool_q06_lazy'],
-                    survey_data['survey_eatool_q07_proud'],
-                    survey_data['survey_eatool_q08_dress'],
-                    survey_data['survey_eatool_q09_along'],
-                    survey_data['survey_eatool_q10_anyone'],
-                    survey_data['survey_eatool_q11_input'],
-                    survey_data['survey_eatool_q12_responsible'],
-                    survey_data['survey_eatool_q13_express'],
-                    survey_data['survey_eatool_q14_understand'],
-                    survey_data['survey_eatool_q15_read'],
-                    survey_data['survey_eatool_q16_learn'],
-                    survey_data['survey_eatool_q17_organise'],
-                    survey_data['survey_eatool_q18_sources'],
-                    survey_data['survey_eatool_q19_experience'],
-                    survey_data['survey_eatool_q20_adapting'],
-                    survey_data['survey_eatool_q21_interview'],
-                    survey_data['survey_eatool_q22_cv'],
-                    survey_data['survey_eatool_q23_cover'],
-                    survey_data['survey_eatool_q24_company']
-                ]
-
-                append_to_csv(data, csvfile)
-
-    pass_zip_encrypt_email(email, export_name, unique_time)
-
-    return True, SUCCESS_MESSAGE_EMAIL_SENT
+    return export_survey_submissions(surveys, email, export_name, unique_time)
 
 
 @task(name="export_ea2tool_survey")
 def export_ea2tool_survey(email, export_name, unique_time):
-    # surveys = CoachSurvey.objects.filter(bot_conversation=CoachSurvey.EATOOL2)
-
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
-    create_csv(filename)
-
-    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-        append_to_csv(('uuid', 'username', 'name', 'mobile', 'email', 'gender', 'age',
-                       'user_type_source_medium', 'date_joined', 'city', 'younger_than_17', 'consent_given',
-                       'submission_date',
-
-                       # Survey questions
-                       ),
-                      csvfile)
-
-    pass_zip_encrypt_email(email, export_name, unique_time)
-
-    return True, SUCCESS_MESSAGE_EMAIL_SENT
+    # The second EA Tool has no Coach conversation yet, so no survey is linked to it and the export only has the
+    # user columns. It uses the same export as the other surveys, so its header stays in line with theirs.
+    return export_survey_submissions(CoachSurvey.objects.none(), email, export_name, unique_time)
 
 
 #####################
@@ -2548,7 +1721,7 @@ def export_ea2tool_survey(email, export_name, unique_time):
 @task(name="export_budget_user")
 def export_budget_user(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -2614,19 +1787,20 @@ def export_budget_user(email, export_name, unique_time):
 @task(name="export_budget_expense_category")
 def export_budget_expense_category(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
         append_to_csv(('expense_category', 'total_users'),
                       csvfile)
 
+        totals = dict(Expense.objects.values_list('category').annotate(Count('id')).order_by())
+
         expense_categories = ExpenseCategory.objects.all()
         for expense_category in expense_categories:
-            num_expense_category = Expense.objects.filter(category=expense_category).count()
             data = [
                 expense_category.name,
-                num_expense_category
+                totals.get(expense_category.pk, 0)
             ]
 
             append_to_csv(data, csvfile)
@@ -2639,7 +1813,7 @@ def export_budget_expense_category(email, export_name, unique_time):
 @task(name="export_budget_aggregate")
 def export_budget_aggregate(email, export_name, unique_time):
 
-    filename = STORAGE_DIRECTORY + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
     create_csv(filename)
 
     with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
@@ -1,12 +1,21 @@
+import csv
 import json
+import os
+import shutil
+import tempfile
 from datetime import datetime, date, timedelta
+from io import BytesIO, StringIO
 import unittest
 from unittest import mock
 from unittest.mock import Mock, patch
 from unittest.mock import PropertyMock
 
 # django imports
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
@@ -19,7 +28,7 @@ import rest_framework.exceptions as rest_exceptions
 from wagtail.wagtailcore.models import Site, Page
 
 # auth imports?
-from users.models import User, RegUser, Profile
+from users.models import User, RegUser, Profile, CampaignInformation, UserUUID
 
 # content function imports
 from .models import award_challenge_win, QuizQuestion, FreeTextQuestion, PictureQuestion, QuestionOption, \
@@ -33,6 +42,9 @@ from .models import WeekCalc
 from .models import GoalPrototype, Goal, GoalTransaction
 from .models import Tip, TipFavourite
 from .models import Budget, ExpenseCategory
+from .models import ReportJob
+from .models import AnalyticsSyncMark
+from .models import UserSavingStreak
 
 # content serializer imports
 from .serializers import FeedbackSerializer
@@ -40,6 +52,17 @@ from .serializers import ParticipantRegisterSerializer
 from django.http import HttpRequest
 
 from wagtail.wagtailimages import models as wagtail_image_models
+from PIL import Image as PILImage
+
+from .analytics_api import GA_CAMPAIGN_SOURCE, connect_ga_to_user, sync_ga_campaigns
+from .analytics_fake import FakeAnalyticsReporting
+from .images import BADGE_RENDITION_FILTERS, IMAGE_SIZES, get_image_path, get_rendition_name
+from .reports import goal_prototype_aggregates
+from .utilities import chunk_path, zip_path
+from .tasks import generate_image_renditions, get_chunk_bounds, export_report_chunk, merge_report_chunks, \
+    dispatch_report_job, remove_report_archives
+from .celery import ExportTaskRouter
+from . import tasks as report_helpers
 
 
 # TODO: Mock datetime.now instead of using timedelta
@@ -390,6 +413,244 @@ class TestParticipantPicture(APITestCase):
         self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+class TestPictureReview(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@ymous.org', 'Blarg')
+
+        self.challenge = create_test_challenge(name='Picture Challenge')
+        self.challenge.type = Challenge.CTP_PICTURE
+        self.challenge.save()
+
+        self.participants = []
+        for i in range(3):
+            user = create_test_regular_user('anon' + str(i))
+            Profile.objects.create(user=user, mobile='111222333' + str(i))
+            participant = Participant.objects.create(user=user, challenge=self.challenge)
+            ParticipantPicture.objects.create(participant=participant, picture='{}-picture.jpg'.format(user.pk))
+            self.participants.append(participant)
+
+    def test_review_page(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('content-admin:challenge-picturereview'),
+                                   {'challenge': self.challenge.pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, "Picture review page failed to load.")
+        self.assertEqual(len(response.context['page']), 3, "Unexpected number of pictures.")
+        self.assertContains(response, '?size=thumb')
+
+    def test_bulk_shortlist(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('content-admin:challenge-picturereview'), {
+            'action': 'SHORTLIST',
+            'participant': [p.pk for p in self.participants[:2]]
+        })
+
+        shortlisted = Participant.objects.filter(is_shortlisted=True).values_list('pk', flat=True)
+        self.assertEqual(set(shortlisted), {p.pk for p in self.participants[:2]}, "Unexpected participants shortlisted.")
+
+    def test_bulk_invalid_ids(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('content-admin:challenge-picturereview'), {
+            'action': 'SHORTLIST',
+            'participant': [self.participants[0].pk, 'first']
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, "Invalid participant id was accepted.")
+        self.assertFalse(Participant.objects.filter(is_shortlisted=True).exists())
+
+
+class TestModerationBulkUpdate(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@ymous.org', 'Blarg')
+        self.challenge = create_test_challenge(name='Moderated Challenge')
+        self.participants = [Participant.objects.create(user=create_test_regular_user('anon' + str(i)),
+                                                        challenge=self.challenge) for i in range(3)]
+
+    def post(self, data):
+        return self.client.post(reverse('content-admin:moderation-bulk-update'), json.dumps(data),
+                                content_type='application/json')
+
+    def test_bulk_update(self):
+        self.client.force_login(self.admin)
+        ids = [p.pk for p in self.participants[:2]]
+        response = self.post({'model': 'participant', 'ids': ids, 'flags': {'is_winner': True}})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, "Bulk moderation failed.")
+        self.assertEqual({item['id']: item['is_winner'] for item in response.json()['items']},
+                         {pk: True for pk in ids}, "Response did not contain the new states.")
+        self.assertEqual(set(Participant.objects.filter(is_winner=True).values_list('pk', flat=True)), set(ids),
+                         "Unexpected participants marked as winners.")
+
+    def test_invalid_flag(self):
+        self.client.force_login(self.admin)
+        response = self.post({'model': 'feedback', 'ids': [1], 'flags': {'is_winner': True}})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, "Feedback has no winner flag.")
+
+    def test_permission_required(self):
+        self.client.force_login(create_test_admin_user('staff'))
+        response = self.post({'model': 'participant', 'ids': [self.participants[0].pk],
+                              'flags': {'is_read': True}})
+
+        self.assertNotEqual(response.status_code, status.HTTP_200_OK, "User without permission could moderate.")
+        self.assertFalse(Participant.objects.get(pk=self.participants[0].pk).is_read)
+
+
+class TestQuizEntries(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@ymous.org', 'Blarg')
+        self.challenge = Challenge.objects.create(name='Quiz Challenge', type=Challenge.CTP_QUIZ,
+                                                  activation_date=timezone.now() - timedelta(days=1),
+                                                  deactivation_date=timezone.now() + timedelta(days=1))
+        question = QuizQuestion.objects.create(challenge=self.challenge, text='Quiz question text')
+        option = QuestionOption.objects.create(question=question, text='Quiz question option', correct=True)
+
+        for i in range(3):
+            user = create_test_regular_user('anon' + str(i))
+            Profile.objects.create(user=user, mobile='111222333' + str(i))
+            participant = Participant.objects.create(user=user, challenge=self.challenge)
+            entry = Entry.objects.create(participant=participant)
+            ParticipantAnswer.objects.create(entry=entry, question=question, selected_option=option,
+                                             date_answered=timezone.now())
+
+    def test_entries_page(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('content-admin:challenge-quizentries'), {'challenge': self.challenge.pk})
+        content = b''.join(response.streaming_content).decode('utf-8')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, "Quiz entries page failed to load.")
+        self.assertEqual(content.count('Quiz question option'), 3, "Unexpected number of answers listed.")
+        self.assertIn('1112223332', content, "Participant mobile number not listed.")
+
+
+class TestChunkedReports(TestCase):
+    def setUp(self):
+        self.users = [create_test_regular_user('anon' + str(i)) for i in range(5)]
+        self.storage = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage)
+
+    def test_chunk_bounds(self):
+        ids = [u.pk for u in self.users]
+        bounds = get_chunk_bounds(User.objects.filter(pk__in=ids), 2)
+
+        self.assertEqual(bounds, [[ids[0], ids[2]], [ids[2], ids[4]], [ids[4], None]], "Unexpected chunk bounds.")
+
+    @patch('content.tasks.pass_zip_encrypt_email')
+    @patch('content.tasks.merge_report_chunks.delay')
+    def test_export_chunks_and_merge(self, merge_delay, zip_email):
+        for user in self.users:
+            Profile.objects.create(user=user, mobile='0800')
+
+        profile_ids = list(Profile.objects.order_by('id').values_list('id', flat=True))
+        job = ReportJob.objects.create(export_name='User_Summary', unique_time='_test',
+                                       chunk_bounds=get_chunk_bounds(Profile.objects.all(), 2))
+
+        with self.settings(SENDFILE_ROOT=self.storage):
+            for index in reversed(range(job.chunk_count)):
+                export_report_chunk(job.pk, index)
+
+            job.refresh_from_db()
+            self.assertEqual(job.chunks_done, 3, "Finished chunks were not counted.")
+            merge_delay.assert_called_once_with(job.pk)
+
+            merge_report_chunks(job.pk)
+
+        with open(os.path.join(self.storage, 'User_Summary_test.csv'), encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+
+        self.assertEqual(rows[0][0], 'username', "Header missing from merged report.")
+        self.assertEqual([r[0] for r in rows[1:]], [Profile.objects.get(pk=pk).user.username for pk in profile_ids],
+                         "Chunks were not merged in order.")
+        self.assertEqual(os.listdir(self.storage), ['User_Summary_test.csv'], "Chunk files were not removed.")
+        self.assertIsNotNone(ReportJob.objects.get(pk=job.pk).finished_at)
+        zip_email.assert_called_once_with('', 'User_Summary', '_test')
+
+    @patch('content.tasks.pass_zip_encrypt_email', side_effect=OSError('Disk full'))
+    @patch('content.tasks.merge_report_chunks.delay')
+    def test_failed_merge(self, merge_delay, zip_email):
+        for user in self.users:
+            Profile.objects.create(user=user, mobile='0800')
+        job = ReportJob.objects.create(export_name='User_Summary', unique_time='_test',
+                                       chunk_bounds=get_chunk_bounds(Profile.objects.all(), 10))
+
+        with self.settings(SENDFILE_ROOT=self.storage):
+            export_report_chunk(job.pk, 0)
+            merge_report_chunks(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, ReportJob.STATE_FAILED, "Job of a failed merge left in flight.")
+        self.assertIn('Disk full', job.error)
+        self.assertIn('User_Summary_test.part0000.csv', os.listdir(self.storage),
+                      "Chunk files of a failed merge were removed.")
+
+
+class TestReportJobs(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@ymous.org', 'Blarg')
+        self.storage = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage)
+
+    def test_duplicate_request(self):
+        self.client.force_login(self.admin)
+        for i in range(2):
+            response = self.client.post(reverse('content-admin:reports-goals'), {'action': 'EXPORT-GOAL'})
+            self.assertRedirects(response, reverse('content-admin:reports-jobs'), fetch_redirect_response=False)
+
+        self.assertEqual(ReportJob.objects.count(), 1, "Identical in flight report was queued twice.")
+        job = ReportJob.objects.get()
+        self.assertEqual(job.state, ReportJob.STATE_PENDING)
+        self.assertEqual(job.requested_by, self.admin)
+
+        job.mark_failed('Worker lost')
+        self.client.post(reverse('content-admin:reports-goals'), {'action': 'EXPORT-GOAL'})
+        self.assertEqual(ReportJob.objects.count(), 2, "Failed report blocked a new request.")
+
+    @patch('content.tasks.run_report_job.apply_async')
+    def test_time_limits(self, apply_async):
+        job = ReportJob.objects.create(export_name='Baseline_Survey', unique_time='_test', requested_by=self.admin)
+
+        with self.settings(REPORT_TIME_LIMITS={'default': (60, 70), 'Baseline_Survey': (600, 700)}):
+            dispatch_report_job(job)
+
+        apply_async.assert_called_once_with((job.pk,), soft_time_limit=600, time_limit=700)
+
+    def test_export_routing(self):
+        router = ExportTaskRouter()
+
+        self.assertEqual(router.route_for_task('export_baseline_survey'), {'queue': 'reports'})
+        self.assertIsNone(router.route_for_task('content.tasks.generate_image_renditions'))
+
+    def test_download(self):
+        job = ReportJob.objects.create(export_name='Goal_Summary', unique_time='_test', requested_by=self.admin)
+        with open(os.path.join(self.storage, 'Goal_Summary_test.zip'), 'wb') as f:
+            f.write(b'archive')
+
+        self.client.force_login(self.admin)
+        url = reverse('content-admin:reports-job-download', kwargs={'job_pk': job.pk})
+        with self.settings(SENDFILE_ROOT=self.storage):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, "Unfinished report was downloadable.")
+
+            job.mark_done(0)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, "Finished report was not downloadable.")
+
+    def test_remove_archives_of_finished_jobs(self):
+        running = ReportJob.objects.create(export_name='User_Summary', unique_time='_running')
+        running.mark_running()
+        ReportJob.objects.create(export_name='User_Summary', unique_time='_done').mark_done(0)
+
+        with self.settings(SENDFILE_ROOT=self.storage):
+            kept = [chunk_path('User_Summary', '_running', 0), chunk_path('User_Summary', '_running', 1) + '.tmp']
+            removed = [zip_path('User_Summary', '_done'), chunk_path('User_Summary', '_lost', 0)]
+            for path in kept + removed:
+                open(path, 'w').close()
+
+            remove_report_archives()
+
+        self.assertEqual(sorted(os.listdir(self.storage)), [os.path.basename(path) for path in kept],
+                         "Files of a running report were removed, or files of other reports were kept.")
+
+
 # ==== #
 # Tips #
 # ==== #
@@ -761,6 +1022,52 @@ class TestGoalModel(TestCase):
         self.assertEqual(weekly_aggregates[2], 300)
         self.assertEqual(weekly_aggregates[3], 400)
 
+    def test_transaction_weeks(self):
+        user = create_test_regular_user()
+        goal = Goal.objects.create(
+            name='Goal 1',
+            user=user,
+            target=25000,
+            start_date=date(2016, 11, 2),
+            end_date=date(2016, 11, 25)
+        )
+
+        trans = goal.transactions.create(date=timezone.make_aware(datetime(2016, 11, 10)), value=100)
+
+        self.assertEqual(trans.user_id, user.id, "Transaction user was not set.")
+        self.assertEqual(trans.week_key, date(2016, 11, 7), "Week key is not the Monday of the week.")
+        self.assertEqual(trans.week_index, 1, "Unexpected goal week.")
+
+        goal.start_date = date(2016, 11, 9)
+        goal.save()
+
+        trans.refresh_from_db()
+        self.assertEqual(trans.week_index, 0, "Goal week was not updated with the start date.")
+
+        goal.name = 'Goal 2'
+        with CaptureQueriesContext(connection) as queries:
+            goal.save()
+        self.assertFalse([q for q in queries if GoalTransaction._meta.db_table in q['sql']],
+                         "Goal weeks were updated without a change of start date.")
+
+    def test_weekly_aggregates_cached(self):
+        user = create_test_regular_user()
+        goal = Goal.objects.create(
+            name='Goal 1',
+            user=user,
+            target=25000,
+            start_date=date(2016, 11, 2),
+            end_date=date(2016, 11, 25)
+        )
+        goal.transactions.create(date=timezone.make_aware(datetime(2016, 11, 10)), value=100)
+
+        self.assertEqual(goal.get_weekly_aggregates(), [0, 100, 0, 0])
+        with self.assertNumQueries(0):
+            goal.get_weekly_aggregates()
+
+        goal.transactions.create(date=timezone.make_aware(datetime(2016, 11, 3)), value=50)
+        self.assertEqual(goal.get_weekly_aggregates(), [50, 100, 0, 0], "Totals were not updated with a transaction.")
+
 
 class TestGoalAPI(APITestCase):
     @staticmethod
@@ -1107,6 +1414,54 @@ class TestGoalTransactionAPI(APITestCase):
         self.assertEqual(updated_trans[3].value, 300, "Unexpected transaction.")
 
 
+class TestGoalImage(APITestCase):
+    @staticmethod
+    def create_image_file(size=(1200, 800)):
+        buffer = BytesIO()
+        PILImage.new('RGB', size, (0, 128, 255)).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue())
+
+    def test_renditions_created(self):
+        """Size variants of an uploaded goal image must be generated, scaled down and re-encoded."""
+        user = create_test_regular_user()
+        goal = create_goal('Goal 1', user, 1000)
+        goal.image.save('goal.png', self.create_image_file())
+
+        generate_image_renditions('content', 'goal', goal.pk, 'image')
+
+        for size, max_length in IMAGE_SIZES.items():
+            path = get_image_path(goal.image, size)
+            self.assertTrue(path.endswith('.{}.jpg'.format(size)), "Rendition was not created.")
+            with PILImage.open(path) as image:
+                self.assertEqual(max(image.size), max_length, "Rendition was not scaled.")
+                self.assertEqual(image.format, 'JPEG', "Rendition was not re-encoded.")
+            goal.image.storage.delete(get_rendition_name(goal.image.name, size))
+
+        goal.image.delete()
+
+    def test_original_without_renditions(self):
+        """The original image must be served while its variants have not been generated yet."""
+        user = create_test_regular_user()
+        goal = create_goal('Goal 1', user, 1000)
+        goal.image.save('goal.png', self.create_image_file())
+
+        self.assertEqual(get_image_path(goal.image, 'thumb'), goal.image.path, "Original image was not used.")
+
+        goal.image.delete()
+
+    def test_invalid_size(self):
+        user = create_test_regular_user()
+        goal = create_goal('Goal 1', user, 1000)
+        goal.image.save('goal.png', self.create_image_file())
+
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('api:goal-image', kwargs={'goal_pk': goal.pk}), {'size': 'huge'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, "Unknown image size was accepted.")
+
+        goal.image.delete()
+
+
 class TestGoalPrototypesAPI(APITestCase):
     def test_goal_proto_list(self):
         user = create_test_regular_user('anon')
@@ -1120,6 +1475,49 @@ class TestGoalPrototypesAPI(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK, "Listing Goal prototypes failed.")
         self.assertEqual(len(response.data), 1, "No prototypes returned.")
 
+    def test_goal_proto_list_num_users(self):
+        user = create_test_regular_user('anon')
+        protos = [GoalPrototype.objects.create(name='Proto %d' % i, state=GoalPrototype.ACTIVE) for i in range(3)]
+        for i, proto in enumerate(protos):
+            Goal.objects.create(name='Goal %d' % i, user=user, target=1000, prototype=proto,
+                                start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30))
+
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:goal-prototypes-list'))
+
+        self.assertEqual([proto['num_users'] for proto in response.data], [1, 1, 1],
+                         "User counts were not annotated.")
+        self.assertEqual(len([q for q in queries if 'content_goalprototype' in q['sql']]), 1,
+                         "Prototypes were not listed in one query.")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api:goal-prototypes-list'))
+
+        self.assertFalse([q for q in queries if 'content_goalprototype' in q['sql']],
+                         "Prototype list was not cached.")
+
+        other_user = create_test_regular_user('other')
+        goal = Goal.objects.create(name='Goal 3', user=other_user, target=1000, prototype=protos[0],
+                                   start_date=timezone.now().date(),
+                                   end_date=timezone.now().date() + timedelta(days=30))
+
+        response = self.client.get(reverse('api:goal-prototypes-list'))
+        self.assertEqual(response.data[0]['num_users'], 2, "Cached prototype list was not cleared on goal create.")
+
+        goal.name = 'Renamed'
+        goal.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api:goal-prototypes-list'))
+        self.assertFalse([q for q in queries if 'content_goalprototype' in q['sql']],
+                         "Cached prototype list was cleared by a change that doesn't affect it.")
+
+        goal.prototype = protos[1]
+        goal.save()
+        response = self.client.get(reverse('api:goal-prototypes-list'))
+        self.assertEqual([proto['num_users'] for proto in response.data], [1, 2, 1],
+                         "Cached prototype list was not cleared when a goal changed prototype.")
+
     def test_goal_create_with_proto(self):
         """Test basic Goal creation from a prototype."""
         user = create_test_regular_user('anon')
@@ -1162,6 +1560,111 @@ class TestGoalPrototypesAPI(APITestCase):
         self.assertEquals(proto2.num_users, 1, "num_users field on Goal Prototype not calculated correctly")
 
 
+class TestCampaignReconciliation(TestCase):
+    def setUp(self):
+        self.report_path = os.path.join(os.path.dirname(__file__), 'test_data', 'ga_campaign_report.json')
+        with open(self.report_path) as f:
+            self.response = json.load(f)
+
+    @staticmethod
+    def create_user_uuid(username, gaid):
+        return UserUUID.objects.create(user=create_test_regular_user(username), gaid=gaid)
+
+    def test_connect_ga_to_user(self):
+        new_uuid = self.create_user_uuid('new', '8c6a8d1e-3f0b-4b59-9d43-6f1d2b0c7a11')
+        existing_uuid = self.create_user_uuid('existing', '2f4e9b70-5c1d-4e8a-a2b6-0d9c3e7f1b22')
+        CampaignInformation.objects.create(user=existing_uuid.user, user_uuid=existing_uuid,
+                                           campaign='', source='sms', medium='')
+
+        with CaptureQueriesContext(connection) as queries:
+            created, updated = connect_ga_to_user(self.response)
+
+        self.assertEqual((created, updated), (1, 1))
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('SELECT')]), 2,
+                         "Users and campaign information were not read in bulk.")
+
+        info = CampaignInformation.objects.get(user_uuid=new_uuid)
+        self.assertEqual((info.campaign, info.source, info.medium), ('launch_sms', 'sms', 'referral'),
+                         "Campaign information was not taken from the first row of the user.")
+
+        info = CampaignInformation.objects.get(user_uuid=existing_uuid)
+        self.assertEqual((info.campaign, info.source, info.medium), ('launch_facebook', 'sms', 'cpc'),
+                         "Only empty campaign information should be filled in.")
+
+    def test_no_response(self):
+        self.assertEqual(connect_ga_to_user(None), (0, 0))
+
+    def test_sync_pages(self):
+        self.create_user_uuid('first', '8c6a8d1e-3f0b-4b59-9d43-6f1d2b0c7a11')
+        self.create_user_uuid('second', '2f4e9b70-5c1d-4e8a-a2b6-0d9c3e7f1b22')
+        analytics = FakeAnalyticsReporting.from_file(self.report_path, page_size=2)
+
+        created, updated = sync_ga_campaigns(analytics, today=date(2017, 6, 10))
+
+        self.assertEqual(created, 2, "Rows after the first page were not synced.")
+        self.assertEqual([body['reportRequests'][0].get('pageToken') for body in analytics.requests],
+                         [None, '2', '4'], "Unexpected pages requested.")
+        self.assertEqual(analytics.requests[0]['reportRequests'][0]['dateRanges'],
+                         [{'startDate': '2017-03-12', 'endDate': '2017-06-10'}],
+                         "First sync did not request the initial window.")
+
+    def test_sync_incremental(self):
+        self.create_user_uuid('first', '8c6a8d1e-3f0b-4b59-9d43-6f1d2b0c7a11')
+        analytics = FakeAnalyticsReporting.from_file(self.report_path)
+
+        self.assertEqual(sync_ga_campaigns(analytics, today=date(2017, 6, 10)), (1, 0))
+        self.assertEqual(sync_ga_campaigns(analytics, today=date(2017, 6, 11)), (0, 0),
+                         "Syncing the same rows again changed campaign information.")
+
+        self.assertEqual(analytics.requests[1]['reportRequests'][0]['dateRanges'],
+                         [{'startDate': '2017-06-08', 'endDate': '2017-06-11'}],
+                         "Sync did not start from the watermark.")
+        self.assertEqual(AnalyticsSyncMark.objects.get(source=GA_CAMPAIGN_SOURCE).last_date, date(2017, 6, 11),
+                         "Watermark was not moved.")
+        self.assertEqual(CampaignInformation.objects.count(), 1)
+
+
+class TestGoalPrototypeAggregates(TestCase):
+    def create_goal(self, user, prototype, target, *values):
+        start_date = timezone.now().date() - timedelta(weeks=6)
+        goal = Goal.objects.create(name='Goal', user=user, target=target, prototype=prototype,
+                                   start_date=start_date, end_date=start_date + timedelta(weeks=10))
+        for week, value in enumerate(values):
+            GoalTransaction.objects.create(goal=goal, value=value,
+                                           date=timezone.now() - timedelta(weeks=6) + timedelta(weeks=week, days=1))
+        return goal
+
+    def test_matches_helpers(self):
+        """The grouped query must give the same results as the per prototype helpers."""
+        user1 = create_test_regular_user('sam')
+        user2 = create_test_regular_user('dan')
+        user3 = create_test_regular_user('vlad')
+        staff = create_test_admin_user('staff')
+        proto1 = GoalPrototype.objects.create(name='Proto 1')
+        proto2 = GoalPrototype.objects.create(name='Proto 2')
+
+        self.create_goal(user1, proto1, 100, 60, 50)
+        self.create_goal(user1, proto1, 200, 20)
+        self.create_goal(user2, proto1, 100, 55)
+        self.create_goal(user3, proto1, 1000)
+        self.create_goal(user3, proto2, 300, 100, 100, 100)
+        self.create_goal(staff, proto2, 100, 100)
+
+        aggregates = goal_prototype_aggregates()
+
+        for proto in (proto1, proto2):
+            for metric in ('total_users_achieved_at_least_one_goal', 'average_total_goal_amount',
+                           'average_percentage_of_goal_reached', 'total_users_50_percent_achieved',
+                           'total_users_100_percent_achieved', 'percentage_of_weeks_saved_out_of_total_weeks'):
+                expected = getattr(report_helpers, metric)(proto)
+                self.assertAlmostEqual(float(aggregates[proto.pk][metric]), float(expected),
+                                       msg="{} of {} differs from helper".format(metric, proto))
+
+        self.assertEqual(aggregates[proto1.pk]['total_users_at_least_one_goal'], 3)
+        self.assertEqual(aggregates[proto1.pk]['total_goals_set'], 4)
+        self.assertEqual(aggregates[proto2.pk]['total_goals_set'], 1, "Goals of staff were counted.")
+
+
 class TestGoalPrototypesModel(TestCase):
     def test_goal_proto_num_users_field_caculation(self):
         user1 = create_test_regular_user("sam")
@@ -1298,6 +1801,67 @@ class TestWeeklyStreaks(TestCase):
 
         self.assertEqual(streak, 0, "Unexpected weekly streak.")
 
+    def test_long_streak(self):
+        """Streaks longer than six weeks must be counted."""
+        now = datetime(2016, 11, 30, tzinfo=timezone.utc)
+
+        user = create_test_regular_user('anon')
+        goal = Goal.objects.create(
+            name='Goal 1',
+            user=user,
+            target=100000,
+            start_date=now - timedelta(weeks=12),
+            end_date=now
+        )
+
+        for weeks in range(10):
+            goal.transactions.create(value=1000, date=now - timedelta(weeks=weeks))
+
+        self.assertEqual(Goal.get_current_streak(user, now), 10, "Unexpected weekly streak.")
+        self.assertEqual(UserSavingStreak.objects.get(user=user).longest_run, 10, "Unexpected longest streak.")
+
+    def test_streak_changed_history(self):
+        """Streaks must follow transactions added out of order and deleted transactions."""
+        now = datetime(2016, 11, 30, tzinfo=timezone.utc)
+
+        user = create_test_regular_user('anon')
+        goal = Goal.objects.create(
+            name='Goal 1',
+            user=user,
+            target=100000,
+            start_date=now - timedelta(weeks=12),
+            end_date=now
+        )
+
+        goal.transactions.create(value=1000, date=now)
+        goal.transactions.create(value=1000, date=now - timedelta(weeks=2))
+        self.assertEqual(Goal.get_current_streak(user, now), 0, "Unexpected weekly streak.")
+
+        trans = goal.transactions.create(value=1000, date=now - timedelta(weeks=1))
+        self.assertEqual(Goal.get_current_streak(user, now), 3, "Backdated transaction was not counted.")
+
+        trans.delete()
+        self.assertEqual(Goal.get_current_streak(user, now), 0, "Deleted transaction was still counted.")
+
+    def test_rebuild_command(self):
+        now = timezone.now()
+
+        user = create_test_regular_user('anon')
+        goal = Goal.objects.create(
+            name='Goal 1',
+            user=user,
+            target=100000,
+            start_date=now - timedelta(weeks=12),
+            end_date=now
+        )
+        goal.transactions.create(value=1000, date=now - timedelta(weeks=1))
+        goal.transactions.create(value=1000, date=now - timedelta(weeks=2))
+        UserSavingStreak.objects.filter(user=user).update(run_length=0, longest_run=0)
+
+        call_command('rebuild_streaks', stdout=StringIO())
+
+        self.assertEqual(UserSavingStreak.objects.get(user=user).longest_run, 2, "Streak was not rebuilt.")
+
 
 class TestWeeklyTargetStreaks(TestCase):
     def test_basic_streak_2(self):
@@ -1486,6 +2050,27 @@ class TestWeeklyTargetStreaks(TestCase):
 
         self.assertEqual(streak, 0, "Unexpected weekly streak, should be 0")
 
+    def test_target_changed(self):
+        """Weeks must be compared to the goal's current weekly target."""
+        now = datetime(2017, 1, 27, tzinfo=timezone.utc)
+
+        user = create_test_regular_user('anon')
+        goal = Goal.objects.create(
+            name='Goal 1',
+            user=user,
+            target=36,  # Thus the weekly target is 6 for 6 weeks to reach the target
+            start_date=now + timedelta(days=-36),  # Goal duration is 6 weeks
+            end_date=now,
+        )
+
+        for weeks in range(3):
+            goal.transactions.create(value=6, date=now - timedelta(weeks=weeks))
+        self.assertEqual(Goal.get_current_weekly_target_badge(user, goal, now), 3, "Unexpected weekly streak.")
+
+        goal.weekly_target = 7
+        goal.save()
+        self.assertEqual(Goal.get_current_weekly_target_badge(user, goal, now), 0, "Weekly target change was ignored.")
+
 
 class TestAchievementAPI(APITestCase):
     def test_basic(self):
@@ -2681,6 +3266,51 @@ class TestBadgeUrls(APITestCase):
         self.assertEquals(response.data['urls'].__len__(), 0, "No urls should have been returned")
 
 
+class TestBadgeManifest(APITestCase):
+    def setUp(self):
+        buffer = BytesIO()
+        PILImage.new('RGB', (600, 600), (0, 128, 255)).save(buffer, 'PNG')
+        self.image = wagtail_image_models.Image.objects.create(
+            title='Badge', file=ContentFile(buffer.getvalue(), name='badge.png'))
+        self.badge = Badge.objects.create(name='Badge 1', slug='badge-1', image=self.image)
+
+    def tearDown(self):
+        self.image.delete()
+
+    def test_manifest(self):
+        response = self.client.get(reverse('api:badge-manifest'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, "Badge manifest request failed.")
+        self.assertIn('ETag', response, "Badge manifest has no ETag.")
+        self.assertIn('max-age=', response['Cache-Control'], "Badge manifest has no max age.")
+
+        badge = response.data['badges'][0]
+        self.assertEqual(badge['id'], self.badge.id, "Unexpected badge.")
+        self.assertTrue(badge['image']['url'].startswith('http://testserver/'), "Image URL is not absolute.")
+        self.assertEqual(set(badge['renditions'].keys()), set(BADGE_RENDITION_FILTERS.keys()),
+                         "Renditions missing.")
+        self.assertEqual(badge['renditions']['mdpi']['width'], 96, "Rendition was not scaled.")
+
+    def test_not_modified(self):
+        response = self.client.get(reverse('api:badge-manifest'))
+        response = self.client.get(reverse('api:badge-manifest'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, "Unchanged manifest was sent again.")
+
+    def test_versioned(self):
+        version = self.client.get(reverse('api:badge-manifest')).data['version']
+
+        response = self.client.get(reverse('api:badge-manifest-version', kwargs={'version': version}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, "Versioned badge manifest request failed.")
+
+        Badge.objects.create(name='Badge 2', slug='badge-2', image=self.image)
+
+        response = self.client.get(reverse('api:badge-manifest-version', kwargs={'version': version}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, "Outdated manifest version was served.")
+        self.assertEqual(len(self.client.get(reverse('api:badge-manifest')).data['badges']), 2,
+                         "Badge manifest was not rebuilt.")
+
+
 class TestFeedback(APITestCase):
     def test_create_feedback(self):
         user = create_test_regular_user()
@@ -16,6 +16,21 @@ ERROR_MESSAGE_NO_EMAIL = _('No email address associated with this account.')
 ERROR_MESSAGE_DATA_CLEANUP = _('Report generation ran during data cleanup - try again')
 
 
+def report_path(export_name, unique_time):
+    """Path of the CSV file of a report, among the protected files served with sendfile."""
+    return os.path.join(settings.SENDFILE_ROOT, export_name + unique_time + '.csv')
+
+
+def zip_path(export_name, unique_time):
+    """Path of the encrypted archive of a report, which is emailed and downloaded."""
+    return os.path.join(settings.SENDFILE_ROOT, export_name + unique_time + '.zip')
+
+
+def chunk_path(export_name, unique_time, index):
+    """Path of one chunk of a report that is exported in chunks, merged into the report when all are done."""
+    return os.path.join(settings.SENDFILE_ROOT, '{}{}.part{:04d}.csv'.format(export_name, unique_time, index))
+
+
 def create_csv(filename):
     """Remove old CSV for the impending export"""
 
@@ -34,9 +49,9 @@ def zip_and_encrypt(export_name, unique_time, password):
 
     exe = shutil.which('7z')
 
-    output_name = settings.SENDFILE_ROOT + '\\' + export_name + unique_time + '.zip'
+    output_name = zip_path(export_name, unique_time)
 
-    filename = settings.SENDFILE_ROOT + '\\' + export_name + unique_time + '.csv'
+    filename = report_path(export_name, unique_time)
 
     command = [
         exe,
@@ -92,8 +107,9 @@ def send_password_email(email, export_name, unique_time, password):
     send_to = email
 
     file_name = export_name + unique_time + '.zip'
+    archive = zip_path(export_name, unique_time)
 
-    if os.path.isfile(settings.SENDFILE_ROOT + '\\' + file_name):
+    if os.path.isfile(archive):
         email = EmailMessage(
             subject,
             'Attached report: ' + file_name + '\nPassword: ' + password,
@@ -101,6 +117,6 @@ def send_password_email(email, export_name, unique_time, password):
             [send_to],
         )
 
-        email.attach_file(settings.SENDFILE_ROOT + '\\' + file_name, 'application/zip')
+        email.attach_file(archive, 'application/zip')
 
         email.send()
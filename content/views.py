@@ -3,8 +3,11 @@ from datetime import timedelta
 from django.utils import timezone
 
 from django.contrib.auth.models import User
+from django.db.models import Count
 from django.http import Http404
 from django.shortcuts import get_object_or_404, render
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.decorators import list_route, detail_route
@@ -17,6 +20,7 @@ from sendfile import sendfile
 from wagtail.wagtailcore.models import Site
 
 from .exceptions import ImageNotFound
+from .images import get_badge_manifest, get_image_path, get_requested_size
 
 from .models import award_entry_badge, CustomNotification, award_budget_create, UserBadge, award_budget_edit
 from .models import AchievementStat
@@ -41,6 +45,7 @@ from .serializers import ParticipantAnswerSerializer, ParticipantFreeTextSeriali
     ParticipantRegisterSerializer
 from .serializers import TipSerializer
 from .serializers import ExpenseCategorySerializer, ExpenseSerializer, BudgetSerializer
+from .tasks import schedule_image_renditions
 
 
 # ========== #
@@ -375,7 +380,7 @@ class ParticipantPictureViewSet(viewsets.ModelViewSet):
         # self.check_object_permissions(request, participantpicture)
         if not participantpicture.picture:
             raise ImageNotFound()
-        return sendfile(request, participantpicture.picture.path)
+        return sendfile(request, get_image_path(participantpicture.picture, get_requested_size(request)))
 
     @detail_route(['get'])
     def picture(self, request, pk=None, *args, **kwargs):
@@ -386,7 +391,7 @@ class ParticipantPictureViewSet(viewsets.ModelViewSet):
 
         if not participantpicture.picture:
             raise ImageNotFound()
-        return sendfile(request, participantpicture.picture.path)
+        return sendfile(request, get_image_path(participantpicture.picture, get_requested_size(request)))
 
     @detail_route(methods=['post'])
     def caption(self, request, pk=None, *args, **kwargs):
@@ -425,6 +430,7 @@ class ParticipantImageView(GenericAPIView):
             participant_picture = ParticipantPicture.objects.create(participant=participant)
         participant_picture.picture = request.FILES['file']
         participant_picture.save()
+        schedule_image_renditions(participant_picture, 'picture')
 
         badge_settings = BadgeSettings.for_site(request.site)
 
@@ -451,7 +457,7 @@ class ParticipantImageView(GenericAPIView):
         participant_picture = ParticipantPicture.objects.get(participant=participant)
         if not participant_picture.picture:
             raise ImageNotFound()
-        return sendfile(request, participant_picture.picture)
+        return sendfile(request, get_image_path(participant_picture.picture, get_requested_size(request)))
 
 
 class ParticipantFreeTextViewSet(viewsets.ModelViewSet):
@@ -705,6 +711,7 @@ class GoalImageView(GenericAPIView):
         self.check_object_permissions(request, goal)
         goal.image = request.FILES['file']
         goal.save()
+        schedule_image_renditions(goal, 'image')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get(self, request, goal_pk=None, *args, **kwargs):
@@ -712,7 +719,7 @@ class GoalImageView(GenericAPIView):
         self.check_object_permissions(request, goal)
         if not goal.image:
             raise ImageNotFound()
-        return sendfile(request, goal.image.path)
+        return sendfile(request, get_image_path(goal.image, get_requested_size(request)))
 
 
 class GoalPrototypeView(viewsets.ModelViewSet):
@@ -721,9 +728,14 @@ class GoalPrototypeView(viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated,)
 
     def list(self, request, pk=None, *args, **kwargs):
-        serializer = self.get_serializer(self.get_queryset().filter(state=GoalPrototype.ACTIVE), many=True)
+        def serialize():
+            queryset = self.get_queryset() \
+                .filter(state=GoalPrototype.ACTIVE) \
+                .select_related('image') \
+                .annotate(user_count=Count('goals__user', distinct=True))
+            return self.get_serializer(queryset, many=True).data
 
-        return Response(serializer.data)
+        return Response(GoalPrototype.get_cached_list(request.get_host(), serialize))
 
 
 # ====== #
@@ -733,7 +745,7 @@ class GoalPrototypeView(viewsets.ModelViewSet):
 
 class BadgesView(GenericAPIView):
     def get(self, request, *args, **kwargs):
-        queryset = Badge.objects.all()
+        queryset = Badge.objects.select_related('image')
         urls = []
         for badge in queryset:
             if badge.image is not None:
@@ -744,6 +756,48 @@ class BadgesView(GenericAPIView):
         })
 
 
+class BadgeManifestView(GenericAPIView):
+    """The art of all badges, for clients to prefetch.
+
+    The manifest is versioned. Its current version is served with a short max age and an ETag, so clients and caches
+    revalidate it cheaply. A manifest requested by version never changes, and may be cached for a long time.
+    """
+    MAX_AGE = 5 * 60
+    VERSIONED_MAX_AGE = 365 * 24 * 60 * 60
+
+    def get(self, request, version=None, *args, **kwargs):
+        manifest = get_badge_manifest()
+        if version is not None and version != manifest['version']:
+            raise NotFound("Badge manifest version not found.")
+
+        # Django 1.10 returns the etags without their quotes, and '*' for a request that matches any version
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if manifest['version'] in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(self.make_absolute(request, manifest))
+
+        response['ETag'] = quote_etag(manifest['version'])
+        patch_cache_control(response, public=True,
+                            max_age=self.MAX_AGE if version is None else self.VERSIONED_MAX_AGE)
+        return response
+
+    @staticmethod
+    def make_absolute(request, manifest):
+        def absolute(entry):
+            return dict(entry, url=request.build_absolute_uri(entry['url']))
+
+        return {
+            'version': manifest['version'],
+            'badges': [
+                dict(badge,
+                     image=absolute(badge['image']),
+                     renditions={density: absolute(entry) for density, entry in badge['renditions'].items()})
+                for badge in manifest['badges']
+            ],
+        }
+
+
 # ============ #
 # Achievements #
 # ============ #
@@ -160,6 +160,18 @@ def register_quiz_entry_menu_item(request, menu_items):
 
             menu_item.menu.registered_menu_items.append(custom_menu_item)
 
+
+@hooks.register('construct_main_menu')
+def register_picture_review_menu_item(request, menu_items):
+    custom_menu_item = MenuItem('Picture Review', reverse('content-admin:challenge-picturereview'), classnames='icon icon-image', order=10002)
+    for menu_item in menu_items:
+        if menu_item.name == 'competitions':
+            for reg_menu_item in menu_item.menu.registered_menu_items:
+                if reg_menu_item.name == 'picture-review':
+                    return
+
+            menu_item.menu.registered_menu_items.append(custom_menu_item)
+
 # ===== #
 # Goals #
 # ===== #
@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from celery.signals import task_prerun, task_postrun
+        from django.core.signals import request_started, request_finished
+
+        from .db import close_unusable_connections, mark_connections_used
+
+        request_started.connect(close_unusable_connections, dispatch_uid='core.close_unusable_connections')
+        task_prerun.connect(close_unusable_connections, dispatch_uid='core.close_unusable_connections')
+        request_finished.connect(mark_connections_used, dispatch_uid='core.mark_connections_used')
+        task_postrun.connect(mark_connections_used, dispatch_uid='core.mark_connections_used')
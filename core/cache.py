@@ -0,0 +1,192 @@
+import random
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+
+from .models import get_dirty_fields
+
+
+# Seconds cached values are kept when no timeout is given
+DEFAULT_TIMEOUT = 5 * 60
+
+VERSION_KEY = 'cache-version:{}'
+STATS_KEY = 'cache-stats:{}:{}'
+
+# Namespaces that have been memoized or hooked up to signals, for reporting their hit rates
+NAMESPACES = set()
+
+_missing = object()
+
+
+###############
+# Namespacing #
+###############
+
+
+def get_version(namespace):
+    """The current version of a namespace. Keys are made with it, so bumping it drops every value in the namespace."""
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Start from the time, so a version that was evicted can't be reused while its values are still cached
+        cache.add(key, int(time.time()), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def invalidate(namespace):
+    """Drops every value cached in a namespace."""
+    try:
+        cache.incr(VERSION_KEY.format(namespace))
+    except ValueError:
+        # Not versioned yet, so nothing was cached
+        pass
+
+
+def key_part(value):
+    # Model instances are keyed by their primary key, so an entry can be looked up by either
+    if isinstance(value, models.Model):
+        return str(value.pk)
+    if isinstance(value, type):
+        return value.__qualname__
+    return str(value)
+
+
+def make_key(namespace, *parts):
+    """A cache key in the current version of a namespace. The parts are hashed, so they may contain any characters."""
+    digest = md5(':'.join(key_part(part) for part in parts).encode('utf-8')).hexdigest()
+    return '{}:{}:{}'.format(namespace, get_version(namespace), digest)
+
+
+###########
+# Metrics #
+###########
+
+
+def record(namespace, outcome):
+    """Counts a hit or miss for a sample of the lookups, set by `CACHE_STATS_SAMPLE_RATE`. Counting costs a round trip
+    to the cache, so it's off by default. Sampling leaves the hit rate as it is.
+    """
+    sample_rate = settings.CACHE_STATS_SAMPLE_RATE
+    if not sample_rate or random.random() >= sample_rate:
+        return
+
+    key = STATS_KEY.format(namespace, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_stats():
+    """Hits and misses of each known namespace, sampled since the stats were last reset.
+
+    :return: A dictionary of {'hits': int, 'misses': int} dictionaries keyed by namespace.
+    """
+    keys = {(namespace, outcome): STATS_KEY.format(namespace, outcome)
+            for namespace in NAMESPACES for outcome in ('hits', 'misses')}
+    counts = cache.get_many(keys.values())
+    stats = {namespace: {'hits': 0, 'misses': 0} for namespace in NAMESPACES}
+    for (namespace, outcome), key in keys.items():
+        stats[namespace][outcome] = counts.get(key, 0)
+    return stats
+
+
+def reset_stats():
+    cache.delete_many([STATS_KEY.format(namespace, outcome)
+                       for namespace in NAMESPACES for outcome in ('hits', 'misses')])
+
+
+###########
+# Caching #
+###########
+
+
+def get_or_set(namespace, parts, compute, timeout=DEFAULT_TIMEOUT):
+    """Returns the value cached under the parts in a namespace, or computes and caches it."""
+    NAMESPACES.add(namespace)
+    key = make_key(namespace, *parts)
+
+    value = cache.get(key, _missing)
+    if value is not _missing:
+        record(namespace, 'hits')
+        return value
+
+    record(namespace, 'misses')
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+def default_key(*args, **kwargs):
+    # An unsaved instance has no identity to cache its results by
+    if any(isinstance(arg, models.Model) and arg.pk is None for arg in args):
+        return None
+    return args + tuple(sorted(kwargs.items()))
+
+
+def memoize(namespace, timeout=DEFAULT_TIMEOUT, key=default_key):
+    """Caches the results of a function in a namespace, shared by all processes using the cache.
+
+    Results are keyed by the function's arguments, with model instances standing in for their primary key. The
+    wrapped function gets two methods to drop its results: `forget(*args, **kwargs)` drops the result for the
+    arguments, and `invalidate()` drops all of them.
+
+    :param key: Returns the key parts for the function's arguments, or None to call the function without caching.
+    """
+    NAMESPACES.add(namespace)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            parts = key(*args, **kwargs)
+            if parts is None:
+                return func(*args, **kwargs)
+            return get_or_set(namespace, (func.__qualname__,) + tuple(parts),
+                              lambda: func(*args, **kwargs), timeout)
+
+        def forget(*args, **kwargs):
+            parts = key(*args, **kwargs)
+            if parts is not None:
+                cache.delete(make_key(namespace, func.__qualname__, *parts))
+
+        wrapper.namespace = namespace
+        wrapper.forget = forget
+        wrapper.invalidate = lambda: invalidate(namespace)
+        return wrapper
+
+    return decorator
+
+
+def invalidate_on(target, *senders, args=None, fields=None):
+    """Drops cached values whenever an instance of one of the models is saved or deleted.
+
+    :param target: A namespace, or a memoized function.
+    :param args:   Returns the arguments of the memoized function's result to forget for a changed instance. Without
+                   it, the whole namespace is dropped.
+    :param fields: Attribute names of the fields the cached values depend on. Saves of existing instances that didn't
+                   change any of them are ignored. The models must track their changes with `DirtyFieldsMixin`.
+    """
+    namespace = getattr(target, 'namespace', target)
+    NAMESPACES.add(namespace)
+
+    def receiver(sender, instance, signal, created=False, **kwargs):
+        if fields is not None and signal is post_save and not created and not get_dirty_fields(instance) & fields:
+            return
+
+        if args is None:
+            invalidate(namespace)
+        else:
+            target.forget(*args(instance))
+
+    for sender in senders:
+        uid = 'core.cache:{}:{}'.format(namespace, sender._meta.label)
+        post_save.connect(receiver, sender=sender, weak=False, dispatch_uid=uid)
+        post_delete.connect(receiver, sender=sender, weak=False, dispatch_uid=uid)
+    return receiver
@@ -0,0 +1,85 @@
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import connections, transaction
+
+
+# Rows fetched from a server-side cursor at a time, and objects fetched per query when streaming a queryset
+STREAM_BATCH_SIZE = 2000
+
+LAST_USED_ATTR = '_last_used'
+
+
+def close_unusable_connections(**kwargs):
+    """Closes reused connections that the database has dropped, so the request or task opens a new one instead of
+    failing on the first query.
+
+    Checking a connection costs a query, so only connections left idle for `DB_CONN_HEALTH_CHECK_IDLE` seconds are
+    checked. Connections that failed during a request are already checked by Django when it ends.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        last_used = getattr(connection, LAST_USED_ATTR, None)
+        if last_used is not None and now - last_used < settings.DB_CONN_HEALTH_CHECK_IDLE:
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+def mark_connections_used(**kwargs):
+    """Records when the open connections were last used, at the end of a request or task."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            setattr(connection, LAST_USED_ATTR, now)
+
+
+def stream_ids(queryset, batch_size=STREAM_BATCH_SIZE):
+    """Yields the primary keys of a queryset in batches, in the queryset's order.
+
+    On PostgreSQL the keys are read through a server-side cursor on the export connection, so only one batch is held in
+    memory at a time. Other databases read all keys at once.
+    """
+    ids = queryset.values_list('pk', flat=True)
+
+    # Rows written by a transaction that's still open can only be read on its own connection
+    alias = queryset.db if connections[queryset.db].in_atomic_block else settings.EXPORT_DATABASE
+    connection = connections[alias]
+
+    if connection.vendor != 'postgresql':
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+        return
+
+    sql, params = ids.using(alias).query.sql_with_params()
+
+    # Named cursors only exist inside a transaction
+    with transaction.atomic(using=alias):
+        with connection.connection.cursor(name='stream_{}'.format(uuid4().hex)) as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield [row[0] for row in rows]
+
+
+def stream_queryset(queryset, batch_size=STREAM_BATCH_SIZE):
+    """Iterates over the objects of a queryset without loading all of them into memory.
+
+    Unlike `QuerySet.iterator`, the objects of each batch are fetched with one query, so `select_related` and
+    `prefetch_related` still apply.
+    """
+    for ids in stream_ids(queryset, batch_size):
+        objects = queryset.in_bulk(ids)
+        for pk in ids:
+            if pk in objects:
+                yield objects[pk]
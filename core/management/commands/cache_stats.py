@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = """Lists the cache hits and misses of each namespace, counted by all processes sharing the cache.
+
+    Only the share of lookups set by CACHE_STATS_SAMPLE_RATE is counted."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Start counting again from zero")
+
+    def handle(self, *args, **kwargs):
+        if not settings.CACHE_STATS_SAMPLE_RATE:
+            self.stderr.write('CACHE_STATS_SAMPLE_RATE is not set, so no lookups are being counted.')
+
+        self.stdout.write('namespace                      hits     misses   hit rate')
+        for namespace, counts in sorted(get_stats().items()):
+            total = counts['hits'] + counts['misses']
+            self.stdout.write('%-24s %10d %10d %9.1f%%' % (
+                namespace,
+                counts['hits'],
+                counts['misses'],
+                counts['hits'] / total * 100 if total else 0,
+            ))
+
+        if kwargs['reset']:
+            reset_stats()
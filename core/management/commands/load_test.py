@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = """Measures the throughput of a running server at increasing numbers of concurrent clients.
+
+    To see how throughput scales with cores, run it against the server started with GUNICORN_WORKERS=1, and again with
+    the default of one worker per core."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="URL to request, e.g. http://localhost/healthz")
+        parser.add_argument(
+            '--concurrency',
+            default='1,2,4,8,16,32',
+            help="Comma separated numbers of concurrent clients to measure"
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help="Requests made at each level of concurrency"
+        )
+        parser.add_argument('--token', help="API token to authenticate the requests with")
+
+    def handle(self, *args, **kwargs):
+        try:
+            levels = [int(level) for level in kwargs['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('Concurrency must be a comma separated list of numbers')
+
+        headers = {}
+        if kwargs.get('token'):
+            headers['Authorization'] = 'Token ' + kwargs['token']
+
+        self.stdout.write('clients      req/s     p50 ms     p95 ms   errors')
+        for level in levels:
+            elapsed, latencies, errors = self.measure(kwargs['url'], headers, level, kwargs['requests'])
+            latencies.sort()
+            self.stdout.write('%7d %10.1f %10.1f %10.1f %8d' % (
+                level,
+                len(latencies) / elapsed,
+                percentile(latencies, 50) * 1000,
+                percentile(latencies, 95) * 1000,
+                errors,
+            ))
+
+    @staticmethod
+    def measure(url, headers, concurrency, total):
+        def fetch(_):
+            start = perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers), timeout=30) as response:
+                    response.read()
+            except (URLError, OSError):
+                return None
+            return perf_counter() - start
+
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = perf_counter() - start
+
+        latencies = [latency for latency in results if latency is not None]
+        return elapsed, latencies, len(results) - len(latencies)
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    return values[min(len(values) - 1, len(values) * percent // 100)]
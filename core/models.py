@@ -1,3 +1,63 @@
-from django.db import models
+from django.db.models.fields.files import FieldFile
 
-# Create your models here.
+
+LOADED_VALUES_ATTR = '_loaded_values'
+
+
+def get_field_value(instance, field):
+    value = getattr(instance, field.attname)
+    # Files are changed in place when saved, so they're compared by name
+    if isinstance(value, FieldFile):
+        return value.name
+    return value
+
+
+def remember_values(instance, **kwargs):
+    """Records the field values of an instance as loaded or saved. Can be connected to `post_init` and `post_save`, to
+    track models that can't inherit `DirtyFieldsMixin`.
+    """
+    deferred = instance.get_deferred_fields()
+    setattr(instance, LOADED_VALUES_ATTR, {
+        field.attname: get_field_value(instance, field)
+        for field in instance._meta.concrete_fields
+        if field.attname not in deferred
+    })
+
+
+def get_dirty_fields(instance):
+    """The attribute names of the fields that were changed since the instance was loaded or last saved.
+
+    An instance that wasn't loaded from the database has all its fields dirty. Deferred fields are only dirty once
+    they're set.
+    """
+    deferred = instance.get_deferred_fields()
+    fields = [field for field in instance._meta.concrete_fields if field.attname not in deferred]
+
+    loaded = getattr(instance, LOADED_VALUES_ATTR, None)
+    if loaded is None or instance._state.adding:
+        return {field.attname for field in fields}
+
+    return {
+        field.attname for field in fields
+        if field.attname not in loaded or loaded[field.attname] != get_field_value(instance, field)
+    }
+
+
+class DirtyFieldsMixin(object):
+    """Tracks which fields of a model were changed since it was loaded, so saves and signal handlers can skip work when
+    nothing they depend on changed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(DirtyFieldsMixin, self).__init__(*args, **kwargs)
+        remember_values(self)
+
+    def save(self, *args, **kwargs):
+        super(DirtyFieldsMixin, self).save(*args, **kwargs)
+        remember_values(self)
+
+    def get_dirty_fields(self):
+        return get_dirty_fields(self)
+
+    def is_dirty(self):
+        return bool(get_dirty_fields(self))
@@ -0,0 +1,20 @@
+from unittest import TextTestResult
+
+from django.core.cache import cache
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Runs each test with an empty cache. Each test's database changes are rolled back, so values cached by an earlier
+    test could refer to rows that no longer exist.
+    """
+
+    def get_resultclass(self):
+        resultclass = super(TestRunner, self).get_resultclass() or TextTestResult
+
+        class CacheClearingResult(resultclass):
+            def startTest(self, test):
+                cache.clear()
+                super(CacheClearingResult, self).startTest(test)
+
+        return CacheClearingResult
@@ -1,3 +1,111 @@
-from django.test import TestCase
+import time
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .cache import get_stats, memoize
+from .db import close_unusable_connections, mark_connections_used, stream_queryset
+from .views import check_database
+
+
+class TestHealthz(TestCase):
+    def test_healthy(self):
+        checks = (('database', check_database), ('broker', Mock()))
+        with patch('core.views.HEALTH_CHECKS', checks):
+            response = self.client.get(reverse('healthz'))
+
+        self.assertEqual(response.status_code, 200, "Healthy instance was reported down.")
+        self.assertEqual(response.json()['checks'], {'database': 'ok', 'broker': 'ok'})
+
+    def test_broker_down(self):
+        checks = (('database', check_database), ('broker', Mock(side_effect=OSError('Connection refused'))))
+        with patch('core.views.HEALTH_CHECKS', checks):
+            response = self.client.get(reverse('healthz'))
+
+        self.assertEqual(response.status_code, 503, "Unreachable broker was not reported.")
+        self.assertEqual(response.json()['checks']['broker'], 'down')
+
+
+@memoize('test-usernames')
+def get_username(user):
+    return User.objects.values_list('username', flat=True).get(pk=user.pk)
+
+
+class TestMemoize(TestCase):
+    @override_settings(CACHE_STATS_SAMPLE_RATE=1)
+    def test_cached(self):
+        user = User.objects.create(username='anon')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_username(user), 'anon')
+            self.assertEqual(get_username(user), 'anon')
+
+        self.assertEqual(get_stats()['test-usernames'], {'hits': 1, 'misses': 1}, "Unexpected cache metrics.")
+
+    @override_settings(CACHE_STATS_SAMPLE_RATE=0)
+    def test_stats_off(self):
+        user = User.objects.create(username='anon')
+        get_username(user)
+        get_username(user)
+
+        self.assertEqual(get_stats()['test-usernames'], {'hits': 0, 'misses': 0}, "Lookups were counted.")
+
+    def test_forget(self):
+        user = User.objects.create(username='anon')
+        other_user = User.objects.create(username='other')
+        get_username(user)
+        get_username(other_user)
+
+        User.objects.filter(pk__in=[user.pk, other_user.pk]).update(username='renamed')
+        get_username.forget(user.pk)
+
+        self.assertEqual(get_username(user), 'renamed', "Result was not forgotten.")
+        self.assertEqual(get_username(other_user), 'other', "Result of other arguments was forgotten.")
+
+    def test_invalidate(self):
+        user = User.objects.create(username='anon')
+        get_username(user)
+
+        User.objects.filter(pk=user.pk).update(username='renamed')
+        get_username.invalidate()
+
+        self.assertEqual(get_username(user), 'renamed', "Namespace was not invalidated.")
+
+
+class TestStreamQueryset(TestCase):
+    def test_batches_in_order(self):
+        for i in range(5):
+            User.objects.create(username='user%d' % i)
+
+        queryset = User.objects.order_by('-id')
+        self.assertEqual(list(stream_queryset(queryset, batch_size=2)), list(queryset),
+                         "Streamed objects differ from the queryset.")
+
+
+class TestConnectionHealthChecks(TestCase):
+    def test_unusable_connection_closed(self):
+        connection = Mock(connection=object(), in_atomic_block=False, is_usable=Mock(return_value=False),
+                          _last_used=time.monotonic() - 60)
+        with patch.object(connections, 'all', return_value=[connection]):
+            close_unusable_connections()
+
+        connection.close.assert_called_once_with()
+
+    def test_connection_in_use_not_checked(self):
+        connection = Mock(connection=object(), in_atomic_block=False, _last_used=None)
+        with patch.object(connections, 'all', return_value=[connection]):
+            mark_connections_used()
+            close_unusable_connections()
+
+        connection.is_usable.assert_not_called()
+        connection.close.assert_not_called()
+
+    def test_connection_in_transaction_kept(self):
+        connection = Mock(connection=object(), in_atomic_block=True)
+        with patch.object(connections, 'all', return_value=[connection]):
+            close_unusable_connections()
+
+        connection.close.assert_not_called()
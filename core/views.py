@@ -1,3 +1,49 @@
-from django.shortcuts import render
+import logging
 
-# Create your views here.
+from django.db import connection
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+
+from content.celery import app as celery_app
+
+
+logger = logging.getLogger('dooit.core.views')
+
+# Seconds to wait for the broker before it's reported down
+BROKER_TIMEOUT = 2
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def check_broker():
+    with celery_app.connection() as broker:
+        broker.ensure_connection(max_retries=1, timeout=BROKER_TIMEOUT)
+
+
+HEALTH_CHECKS = (
+    ('database', check_database),
+    ('broker', check_broker),
+)
+
+
+@never_cache
+def healthz(request):
+    """Reports whether the database and the Celery broker can be reached. Responds with 503 when either can't, so load
+    balancers and container schedulers take the instance out of rotation.
+    """
+    checks = {}
+    for name, check in HEALTH_CHECKS:
+        try:
+            check()
+        except Exception:
+            logger.exception('Health check failed: %s', name)
+            checks[name] = 'down'
+        else:
+            checks[name] = 'ok'
+
+    healthy = all(state == 'ok' for state in checks.values())
+    return JsonResponse({'status': 'ok' if healthy else 'down', 'checks': checks}, status=200 if healthy else 503)
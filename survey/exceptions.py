@@ -7,3 +7,8 @@ from rest_framework.exceptions import APIException
 class DuplicateSurveySubmissionError(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = _('Multiple survey submissions are not allowed.')
+
+
+class SurveyDraftConflictError(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('Survey draft was updated concurrently. Try again.')
@@ -0,0 +1,247 @@
+import json
+
+from core.db import stream_queryset
+from users.models import CampaignInformation
+from .models import CoachFormField, CoachSurvey, CoachSurveySubmission, find_answer
+
+
+#############################
+# Answer labels for exports #
+#############################
+
+# Answers are stored as the codes the Coach sends. Questions listed here have their codes replaced with readable labels
+# in exports. Codes that aren't listed, like 998 and 999, are exported as is. Labels are keyed by the question part of
+# the form field key, so that the Baseline and Endline surveys share them.
+
+YES_NO = {
+    0: 'No',
+    1: 'Yes',
+}
+
+MONTHLY_EARNINGS = {
+    1: 'Less than 250 thousand',
+    2: 'Between 250 thousand and 500 thousand',
+    3: 'Between 500 thousand and 750 thousand',
+    4: 'Between 750 thousand and 1 million',
+    5: 'Between 1 million and 1,5 million',
+    6: 'More than 1,5 million',
+}
+
+PHONE_USE = {
+    1: 'Calling or texting friends',
+    2: 'Calling or texting family',
+    3: 'Accessing social media',
+    4: 'Accessing information on the internet',
+    5: 'Using apps or tools to help me manage my life, like trackers or calendars.',
+    6: 'Other',
+}
+
+APPROVAL = {
+    1: 'Approve',
+    2: 'Neutral',
+    3: 'Disapprove',
+}
+
+ANSWER_LABELS = {
+    'q01_occupation': {
+        1: 'Student in elementary school (SD)',
+        2: 'Student in middle school (SMP)',
+        3: 'Student in academic high school (SMA)',
+        4: 'Student in vocational high school (SMK)',
+        5: 'Student in college or above',
+        6: 'Employee working in a job',
+        7: 'Business owner or co-owner',
+        8: 'Volunteer in church or community',
+        9: 'Care giver of family members or children',
+        10: 'Not working, studying, or volunteering',
+    },
+    'q02_grade': {
+        1: '1st Year',
+        2: '2nd Year',
+        3: '3rd Year',
+    },
+    'q05_job_month': YES_NO,
+    'q06_job_earning_range': MONTHLY_EARNINGS,
+    'q07_job_status': {
+        1: 'Permanent staff (signed contract with specific salary and benefits)',
+        2: 'Indefinite term employment (probation, pathway to permanent staff)',
+        3: 'Temporary/casual (working on short assignments or task, no contract)',
+        4: 'Apprenticeship (learning new skill and receiving small monetary support to cover transport cost)',
+        5: 'Daily worker (working on a day to day basis)',
+        6: 'Helping family business with pay',
+        7: 'Does not know',
+    },
+    'q08_shared_ownership': YES_NO,
+    'q09_business_earning_range': MONTHLY_EARNINGS,
+    'q10_save': YES_NO,
+    'q11_savings_frequency': {
+        1: 'Daily',
+        2: 'Weekly',
+        3: 'Monthly',
+        4: 'Every 2 months',
+        5: 'Every 3 or 4 months',
+        6: 'Once or twice a year',
+        7: 'Do not remember',
+        8: 'Varies (different times, not a set frequency)',
+    },
+    'q12_savings_where': {
+        1: 'Bank',
+        2: 'Community savings group',
+        3: 'At home (chicken bank)',
+        4: 'Send to family for safekeeping',
+        5: 'Buy gold or other valuables',
+        6: 'Other',
+    },
+    'q13_savings_3_months': {
+        1: 'Less than 100 thousand',
+        2: 'Between 100 thousand and 150 thousand',
+        3: 'Between 150 thousand and 200 thousand',
+        4: 'Between 200 thousand and 250 thousand',
+        5: 'Between 250 thousand and 300 thousand',
+        6: 'Between 300 thousand and 350 thousand',
+        7: 'Between 350 thousand and 400 thousand',
+        8: 'More than 400 thousand',
+    },
+    'q14_saving_education': YES_NO,
+    'q15_job_hunt': YES_NO,
+    'q16_emergencies': YES_NO,
+    'q17_invest': YES_NO,
+    'q18_family': YES_NO,
+    'q19_clothes_food': YES_NO,
+    'q21_gadgets': YES_NO,
+    'q22_friends': YES_NO,
+    'q23_mobile_frequency': {
+        1: 'Never',
+        2: 'Once a month',
+        3: 'Once a week',
+        4: 'Once a day',
+        5: 'Multiple times per day',
+    },
+    'q24_mobile_most_use': PHONE_USE,
+    'q25_mobile_least_use': PHONE_USE,
+    'q26_mobile_own': {
+        1: 'You',
+        2: 'Mother',
+        3: 'Father',
+        4: 'Sibling',
+        5: 'Another relative',
+        6: 'Someone else',
+    },
+    'q27_1_friends': APPROVAL,
+    'q27_2_family': APPROVAL,
+    'q27_3_community': APPROVAL,
+    'q28_mobile_credit': {
+        1: 'Less than 5 thousand rupiah',
+        2: 'Between 5 thousand and 15 thousand rupiah',
+        3: 'Between 15 thousand and 25 thousand rupiah',
+        4: 'Between 25 thousand and 35 thousand rupiah',
+        5: 'Between 35 thousand and 45 thousand rupiah',
+        6: 'More than 45 thousand rupiah',
+    },
+    'q29_1_desktop': YES_NO,
+    'q29_2_laptop': YES_NO,
+    'q29_3_mobile_no_data': YES_NO,
+    'q29_4_mobile_data': YES_NO,
+}
+
+SURVEY_KEY_PREFIXES = ('survey_baseline_', 'survey_endline_', 'survey_eatool_')
+
+
+def get_answer_labels(key):
+    """Returns the code to label mapping for a form field key, or None when the answers are exported as is."""
+    for prefix in SURVEY_KEY_PREFIXES:
+        if key.startswith(prefix):
+            return ANSWER_LABELS.get(key[len(prefix):], None)
+    return None
+
+
+############################
+# Survey Submission Export #
+############################
+
+
+class SurveyExport:
+    """Builds rows for a CSV export of survey submissions.
+
+    Question columns are taken from the form fields of the given surveys, so a new survey can be exported without
+    changes here. Submissions are read in a single query, and campaign information is loaded once up front.
+    """
+
+    USER_COLUMNS = ('uuid', 'username', 'name', 'mobile', 'email', 'gender', 'age', 'user_type_source_medium',
+                    'date_joined', 'city', 'younger_than_17', 'consent_given', 'submission_date')
+
+    # Answers also exported among the user columns, found by the suffix of their key
+    CITY_KEY_SUFFIX = '_q04_city'
+
+    def __init__(self, surveys):
+        self.surveys = surveys
+        self.fields = self.get_fields()
+
+    def get_fields(self):
+        """List of question keys, in the order they're asked. Keys shared between surveys are exported once."""
+        keys = CoachFormField.objects \
+            .filter(page__in=self.surveys) \
+            .order_by('page__id', 'sort_order') \
+            .values_list('key', flat=True)
+
+        fields = []
+        for key in keys:
+            if key not in fields:
+                fields.append(key)
+        return fields
+
+    def get_submissions(self):
+        return CoachSurveySubmission.objects \
+            .filter(user__is_staff=False, user__is_active=True, survey__in=self.surveys) \
+            .select_related('user') \
+            .order_by('id')
+
+    def get_user_types(self, submissions):
+        campaigns = CampaignInformation.objects \
+            .filter(user__in=submissions.values('user')) \
+            .values_list('user_id', 'source', 'medium')
+
+        return {user_id: '%s/%s' % (source, medium) for user_id, source, medium in campaigns}
+
+    def header(self):
+        return list(self.USER_COLUMNS) + self.fields
+
+    def rows(self):
+        submissions = self.get_submissions()
+        user_types = self.get_user_types(submissions)
+
+        for submission in stream_queryset(submissions):
+            form_data = json.loads(submission.form_data)
+
+            row = [
+                submission.user_unique_id,
+                submission.username,
+                submission.name,
+                submission.mobile,
+                submission.email,
+                submission.gender,
+                submission.age,
+                user_types.get(submission.user_id, ''),
+                submission.user.date_joined,
+                find_answer(form_data, self.CITY_KEY_SUFFIX) or '',
+                find_answer(form_data, CoachSurvey.AGE_CONSENT_KEY_SUFFIX) or '',
+                submission.consent,
+                submission.created_at,
+            ]
+            row += [self.format_answer(key, form_data.get(key, '')) for key in self.fields]
+
+            yield row
+
+    @staticmethod
+    def format_answer(key, answer):
+        if isinstance(answer, list):
+            return ','.join(str(SurveyExport.format_answer(key, a)) for a in answer)
+
+        labels = get_answer_labels(key)
+        if labels is None:
+            return answer
+
+        try:
+            return labels.get(int(answer), answer)
+        except (TypeError, ValueError):
+            return answer
@@ -0,0 +1,55 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Func, Value
+from django.db.utils import NotSupportedError
+
+
+class JSONField(models.TextField):
+    """Stores a JSON document. Uses a native `jsonb` column on PostgreSQL, and falls back to text on other databases
+    so the test suite can still run on SQLite.
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'jsonb'
+        return super(JSONField, self).db_type(connection)
+
+    def from_db_value(self, value, expression, connection, context):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, (dict, list)):
+            return value
+        if not value:
+            return {}
+        return json.loads(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return json.dumps(value, cls=DjangoJSONEncoder)
+
+    def value_to_string(self, obj):
+        return self.get_prep_value(self.value_from_object(obj))
+
+
+class JSONMerge(Func):
+    """Shallow merge of a dictionary into a `jsonb` column, evaluated by the database.
+
+    Only PostgreSQL supports the `||` operator on JSON documents.
+    """
+    arg_joiner = ' || '
+    template = '(%(expressions)s)'
+
+    def __init__(self, expression, data, **extra):
+        delta = Func(Value(json.dumps(data, cls=DjangoJSONEncoder)), template='%(expressions)s::jsonb')
+        super(JSONMerge, self).__init__(expression, delta, output_field=JSONField(), **extra)
+
+    def as_sql(self, compiler, connection, *args, **kwargs):
+        # Other databases would compile `||` to string concatenation, and corrupt the document
+        raise NotSupportedError('JSONMerge is only supported on PostgreSQL.')
+
+    def as_postgresql(self, compiler, connection):
+        return super(JSONMerge, self).as_sql(compiler, connection)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+import survey.fields
+
+
+def empty_drafts_to_json(apps, schema_editor):
+    """Drafts created without answers have an empty string, which can't be cast to a JSON column."""
+    CoachSurveySubmissionDraft = apps.get_model('survey', 'CoachSurveySubmissionDraft')
+    CoachSurveySubmissionDraft.objects.filter(submission_data='').update(submission_data='{}')
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0021_link_user_endline'),
+    ]
+
+    operations = [
+        migrations.RunPython(empty_drafts_to_json, noop),
+        migrations.AlterField(
+            model_name='coachsurveysubmissiondraft',
+            name='submission_data',
+            field=survey.fields.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0022_coachsurveysubmissiondraft_json_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coachsurveysubmissiondraft',
+            name='last_sequence',
+            field=models.IntegerField(default=0),
+        ),
+    ]
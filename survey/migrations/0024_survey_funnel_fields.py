@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.db import migrations, models
+
+
+def find_answer(data, key_suffix):
+    for key, value in data.items():
+        if key.endswith(key_suffix):
+            return value
+    return None
+
+
+def extract_funnel_answers(apps, schema_editor):
+    """Populate the reporting fields from existing drafts and submissions."""
+    CoachSurveySubmissionDraft = apps.get_model('survey', 'CoachSurveySubmissionDraft')
+    CoachSurveySubmission = apps.get_model('survey', 'CoachSurveySubmission')
+
+    for draft in CoachSurveySubmissionDraft.objects.exclude(submission_data={}).iterator():
+        intro = find_answer(draft.submission_data, '_intro')
+        if intro is not None:
+            CoachSurveySubmissionDraft.objects.filter(pk=draft.pk).update(accepted_intro=str(intro) != '0')
+
+    for submission in CoachSurveySubmission.objects.all().iterator():
+        if str(find_answer(json.loads(submission.form_data), '_q1_consent')) == '1':
+            CoachSurveySubmission.objects.filter(pk=submission.pk).update(claims_over_17=True)
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0023_coachsurveysubmissiondraft_last_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coachsurveysubmissiondraft',
+            name='accepted_intro',
+            field=models.NullBooleanField(db_index=True, default=None),
+        ),
+        migrations.AddField(
+            model_name='coachsurveysubmission',
+            name='claims_over_17',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.RunPython(extract_funnel_answers, noop),
+    ]
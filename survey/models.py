@@ -5,7 +5,8 @@ import json
 
 from django.contrib.auth.models import User
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db import models
+from django.db import connection, models
+from django.db.models import F
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
@@ -21,7 +22,10 @@ from wagtailsurveys.models import AbstractSurvey, AbstractFormField, AbstractFor
 from unidecode import unidecode
 
 from content.edit_handlers import ReadOnlyPanel
+from core.cache import invalidate_on, memoize
 from users.models import RegUser
+from .exceptions import DuplicateSurveySubmissionError, SurveyDraftConflictError
+from .fields import JSONField, JSONMerge
 
 
 class CoachSurveyIndex(Page):
@@ -36,6 +40,10 @@ class CoachSurvey(AbstractSurvey):
     ANSWER_NO = '0'
     CONSENT_KEY = 'survey_consent'
 
+    # Keys of the answers used for the survey funnel reports end with these, eg. `survey_baseline_intro`
+    INTRO_KEY_SUFFIX = '_intro'
+    AGE_CONSENT_KEY_SUFFIX = '_q1_consent'
+
     NONE = 0
     BASELINE = 1
     EATOOL = 2
@@ -119,6 +127,7 @@ class CoachSurvey(AbstractSurvey):
             form_data=json.dumps(form.cleaned_data, cls=DjangoJSONEncoder),
             page=self, survey=self, user=form.user,
             consent=consent,
+            claims_over_17=str(find_answer(form.cleaned_data, CoachSurvey.AGE_CONSENT_KEY_SUFFIX)) == CoachSurvey.ANSWER_YES,
 
             # To preserve historic information
             user_unique_id=form.user.id,
@@ -130,6 +139,13 @@ class CoachSurvey(AbstractSurvey):
             email=form.user.email
         )
 
+    @classmethod
+    @memoize('coach-surveys', timeout=60 * 60)
+    def get_live(cls):
+        """The live surveys in the order they're delivered in. They're read for every user checking for a survey, so
+        they're cached until a survey is changed."""
+        return list(cls.objects.filter(live=True).order_by('deliver_after', '-latest_revision_created_at'))
+
     @classmethod
     def get_current(cls, user):
         """
@@ -141,10 +157,8 @@ class CoachSurvey(AbstractSurvey):
                      available for the provided user.
         """
 
-        surveys = cls.objects \
-            .filter(live=True) \
-            .order_by('deliver_after', '-latest_revision_created_at') \
-            .exclude(page_ptr__in=CoachSurveySubmission.objects.filter(user=user).values('page'))
+        submitted = set(CoachSurveySubmission.objects.filter(user=user).values_list('page_id', flat=True))
+        surveys = [survey for survey in cls.get_live() if survey.pk not in submitted]
 
         if user.profile:
             surveys = list(filter(lambda s: user.profile.is_joined_days_passed(s.deliver_after), surveys))
@@ -168,6 +182,18 @@ class CoachSurvey(AbstractSurvey):
         return CoachSurvey._REVERSE.get(bot_conversation_name, None)
 
 
+# Publishing or unpublishing a survey saves it
+invalidate_on(CoachSurvey.get_live, CoachSurvey)
+
+
+def find_answer(data, key_suffix):
+    """Finds the answer in submission data whose key ends with the given suffix. Returns None if not answered."""
+    for key, value in data.items():
+        if key.endswith(key_suffix):
+            return value
+    return None
+
+
 CoachSurvey.content_panels = AbstractSurvey.content_panels + [
     MultiFieldPanel(
         [
@@ -234,6 +260,8 @@ CoachFormField.panels = [
 class CoachSurveySubmission(AbstractFormSubmission):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, blank=False, null=True)
     consent = models.BooleanField(default=False)
+    # Extracted from the submission data for reporting
+    claims_over_17 = models.BooleanField(default=False, db_index=True)
 
     # The abstract base class has a `page` field which references the survey, but it has no related name. To find
     # submissions from the survey, we create another foreign key relation. Deleting the survey will delete submission
@@ -290,11 +318,15 @@ class CoachSurveySubmissionDraft(models.Model):
     survey = models.ForeignKey(CoachSurvey, related_name='drafts')
     consent = models.BooleanField(default=False)
     # Submission is stored as JSON
-    submission_data = models.TextField()
+    submission_data = JSONField(default=dict, blank=True)
     # Submission relation is set when draft is completed.
     submission = models.ForeignKey(CoachSurveySubmission, null=True)
+    # Extracted from the submission data for reporting. None until the user has responded to the Coach's introduction.
+    accepted_intro = models.NullBooleanField(default=None, db_index=True)
     complete = models.BooleanField(default=False)
     version = models.IntegerField(default=0)
+    # Highest client sequence number applied from batched answers, so that retried batches are not applied twice
+    last_sequence = models.IntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
     modified_at = models.DateTimeField(default=timezone.now)
 
@@ -303,6 +335,9 @@ class CoachSurveySubmissionDraft(models.Model):
 
         verbose_name_plural = _('coach survey submission drafts')
 
+    # Number of times a non-PostgreSQL merge is retried when it loses the optimistic lock
+    MERGE_RETRIES = 5
+
     @property
     def has_submission(self):
         return bool(self.submission_data)
@@ -312,6 +347,51 @@ class CoachSurveySubmissionDraft(models.Model):
         self.modified_at = timezone.now()
         super(CoachSurveySubmissionDraft, self).save(*args, **kwargs)
 
+    def merge(self, data, consent=None, sequence=None):
+        """Merges a partial set of answers into the stored submission data.
+
+        On PostgreSQL the merge is done by the database, so only the new answers are sent and concurrent updates can't
+        overwrite each other. Other databases read and write the whole document, guarded by the draft version.
+
+        :param data:     Dictionary of answers to merge.
+        :param consent:  Consent value to store, or None to leave it unchanged.
+        :param sequence: Client sequence number of the last applied answer batch, or None to leave it unchanged.
+        """
+        drafts = CoachSurveySubmissionDraft.objects.filter(pk=self.pk, complete=False, submission=None)
+        updates = {'modified_at': timezone.now()}
+        if consent is not None:
+            updates['consent'] = consent
+        if sequence is not None:
+            updates['last_sequence'] = sequence
+
+        intro = find_answer(data, CoachSurvey.INTRO_KEY_SUFFIX)
+        if intro is not None:
+            updates['accepted_intro'] = str(intro) != CoachSurvey.ANSWER_NO
+
+        if connection.vendor == 'postgresql':
+            updated = drafts.update(submission_data=JSONMerge(F('submission_data'), data),
+                                    version=F('version') + 1, **updates)
+        else:
+            for _attempt in range(self.MERGE_RETRIES):
+                current = drafts.values_list('submission_data', 'version').first()
+                if current is None:
+                    updated = 0
+                    break
+                submission_data, version = current
+                submission_data = dict(submission_data or {}, **data)
+                updated = drafts.filter(version=version).update(submission_data=submission_data,
+                                                                version=version + 1, **updates)
+                if updated:
+                    break
+            else:
+                raise SurveyDraftConflictError()
+
+        if not updated:
+            # Draft was completed in the meantime
+            raise DuplicateSurveySubmissionError()
+
+        self.refresh_from_db()
+
 
 ###############################
 # Endline Survey User Chooser #
@@ -372,4 +452,4 @@ EndlineSurveySelectUser.panels = [
 def create_survey_link(sender, instance, created, **kwargs):
     """Ensure survey link is created"""
     if created:
-        EndlineSurveySelectUser.objects.get_or_create(user=instance)
+        EndlineSurveySelectUser.objects.create(user=instance)
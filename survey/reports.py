@@ -1,9 +1,13 @@
-
-from django.db.models import Count
+from django.contrib.auth.models import User
+from django.db.models import Count, Case, When, IntegerField, Sum
 
 from .models import CoachSurvey, CoachSurveySubmission, CoachSurveySubmissionDraft
 
 
+def count_if(**conditions):
+    return Sum(Case(When(then=1, **conditions), default=0, output_field=IntegerField()))
+
+
 def survey_aggregates():
     """
     Required fields:
@@ -13,7 +17,46 @@ def survey_aggregates():
         - Total users who started but did not complete the survey
         - Total users who choose not to consent
         - Total user who did not respond
+
+    Counts are grouped per survey in the database, using the funnel answers extracted from drafts and submissions when
+    they are saved.
+
+    :return: A list of dictionaries, one per survey, ordered by delivery day.
     """
-    # TODO: Survey Aggregate Report
+    submission_counts = {
+        row['survey']: row for row in CoachSurveySubmission.objects
+        .filter(user__is_staff=False, user__is_active=True)
+        .values('survey')
+        .annotate(completed=Count('id'), claims_over_17=count_if(claims_over_17=True))
+    }
+
+    draft_counts = {
+        row['survey']: row for row in CoachSurveySubmissionDraft.objects
+        .filter(user__is_staff=False, user__is_active=True)
+        .values('survey')
+        .annotate(participated=Count('user', distinct=True),
+                  in_progress=count_if(complete=False),
+                  no_consent=count_if(consent=False, accepted_intro=True),
+                  declined_intro=count_if(consent=False, accepted_intro=False))
+    }
+
+    num_total_users = User.objects.filter(is_staff=False, is_active=True).count()
+
+    aggregates = []
+    for survey in CoachSurvey.objects.order_by('deliver_after', 'id'):
+        submissions = submission_counts.get(survey.pk, {})
+        drafts = draft_counts.get(survey.pk, {})
+
+        aggregates.append({
+            'survey': survey,
+            'name': survey.title,
+            'date_published': survey.first_published_at,
+            'completed': submissions.get('completed', 0),
+            'claims_over_17': submissions.get('claims_over_17', 0),
+            'in_progress': drafts.get('in_progress', 0),
+            'no_consent': drafts.get('no_consent', 0),
+            'declined_intro': drafts.get('declined_intro', 0),
+            'no_engagement': num_total_users - drafts.get('participated', 0),
+        })
 
-    pass
+    return aggregates
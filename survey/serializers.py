@@ -1,4 +1,5 @@
 
+from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 from rest_framework.reverse import reverse as rest_reverse
 
@@ -61,3 +62,21 @@ class CoachSurveyResponseSerializer(serializers.Serializer):
 
     class Meta:
         fields = '__all__'
+
+
+class CoachSurveyAnswerDeltaSerializer(serializers.Serializer):
+    """A set of answers from the Coach chat, numbered by the client so retries can be detected."""
+    seq = serializers.IntegerField(min_value=1)
+    answers = serializers.DictField(child=serializers.CharField(allow_blank=True))
+
+
+class CoachSurveyAnswerBatchSerializer(serializers.Serializer):
+    deltas = CoachSurveyAnswerDeltaSerializer(many=True)
+    submit = serializers.BooleanField(default=False)
+
+    def validate_deltas(self, deltas):
+        sequence = [delta['seq'] for delta in deltas]
+        if sequence != sorted(set(sequence)):
+            # Translators: Error message on API
+            raise serializers.ValidationError(_('Answer sequence numbers must be unique and in ascending order.'))
+        return deltas
@@ -12,6 +12,8 @@ from wagtail.wagtailcore.models import Page
 from users.models import RegUser, Profile
 from .models import (CoachSurvey, CoachFormField, CoachSurveySubmission, CoachSurveySubmissionDraft,
                      EndlineSurveySelectUser)
+from .exceptions import DuplicateSurveySubmissionError
+from .exports import SurveyExport
 from .reports import survey_aggregates
 
 SINGLE_LINE = 'singleline'
@@ -267,7 +269,7 @@ class DraftAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT, "Draft submit request failed")
 
         updated_draft = CoachSurveySubmissionDraft.objects.get(user=user, survey=survey)
-        submission_data = json.loads(updated_draft.submission_data)
+        submission_data = updated_draft.submission_data
         self.assertEqual(submission_data.get('first', None), '1', "First submission field was not set")
         self.assertEqual(submission_data.get('second', None), '2', "Second submission field was not set")
         self.assertFalse(updated_draft.complete, "Draft was set to completed.")
@@ -295,7 +297,7 @@ class DraftAPITest(APITestCase):
         }, format='json')
 
         updated_draft = CoachSurveySubmissionDraft.objects.get(user=user, survey=survey)
-        data = json.loads(updated_draft.submission_data if updated_draft.has_submission else {})
+        data = updated_draft.submission_data
 
         self.assertEqual(data.get('second', None), '2', "Second field was not set")
 
@@ -352,7 +354,7 @@ class DraftAPITest(APITestCase):
         }, format='json')
 
         updated_draft = CoachSurveySubmissionDraft.objects.get(user=user, survey=survey)
-        data = json.loads(updated_draft.submission_data) if updated_draft.has_submission else {}
+        data = updated_draft.submission_data
 
         self.assertTrue(updated_draft.consent, "Consent was not stored")
         self.assertIsNone(data.get(CoachSurvey.CONSENT_KEY, None), "Consent was stored in submission data")
@@ -409,11 +411,150 @@ class DraftAPITest(APITestCase):
         }, format='json')
 
         updated_draft = CoachSurveySubmissionDraft.objects.get(user=user, survey=survey)
-        data = json.loads(updated_draft.submission_data) if updated_draft.has_submission else {}
+        data = updated_draft.submission_data
 
         self.assertTrue(updated_draft.consent, "Consent was not set.")
         self.assertEqual(data, {}, "Draft submission unexpectedly contains data.")
 
+    def test_draft_merge(self):
+        """Test that consecutive partial updates are merged into the stored answers, and each bumps the version."""
+        user = create_user()
+        survey = create_survey()
+        survey.form_fields.create(
+            key='first',
+            label='First',
+            field_type=SINGLE_LINE
+        )
+        survey.form_fields.create(
+            key='second',
+            label='Second',
+            field_type=SINGLE_LINE
+        )
+        publish(survey, create_user('Staff'))
+
+        self.client.force_authenticate(user=user)
+        self.client.patch(reverse('api:surveys-draft', kwargs={'pk': survey.pk}), {
+            'first': '1'
+        }, format='json')
+        version = CoachSurveySubmissionDraft.objects.get(user=user, survey=survey).version
+
+        self.client.patch(reverse('api:surveys-draft', kwargs={'pk': survey.pk}), {
+            'first': '3',
+            'second': '2'
+        }, format='json')
+
+        updated_draft = CoachSurveySubmissionDraft.objects.get(user=user, survey=survey)
+
+        self.assertEqual(updated_draft.submission_data, {'first': '3', 'second': '2'}, "Answers were not merged.")
+        self.assertEqual(updated_draft.version, version + 1, "Version was not incremented.")
+
+    def test_completed_draft_not_merged(self):
+        """Test that answers can't be merged into a draft that has already been submitted."""
+        user = create_user()
+        survey = create_survey()
+        publish(survey, create_user('Staff'))
+
+        draft = CoachSurveySubmissionDraft.objects.create(user=user, survey=survey, complete=True)
+
+        with self.assertRaises(DuplicateSurveySubmissionError):
+            draft.merge({'first': '1'})
+
+
+class AnswerBatchAPITest(APITestCase):
+    def create_survey(self):
+        survey = create_survey()
+        survey.form_fields.create(
+            key='first',
+            label='First',
+            field_type=SINGLE_LINE
+        )
+        survey.form_fields.create(
+            key='second',
+            label='Second',
+            field_type=SINGLE_LINE
+        )
+        publish(survey, create_user('Staff'))
+        return survey
+
+    def test_batch_applied_in_order(self):
+        """Test that answer deltas in a batch are applied to the draft in sequence order."""
+        user = create_user()
+        survey = self.create_survey()
+
+        self.client.force_authenticate(user=user)
+        response = self.client.post(reverse('api:surveys-answers', kwargs={'pk': survey.pk}), {
+            'deltas': [
+                {'seq': 1, 'answers': {CoachSurvey.CONSENT_KEY: CoachSurvey.ANSWER_YES, 'first': '1'}},
+                {'seq': 2, 'answers': {'first': '3', 'second': '2'}},
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, "Answer batch request failed.")
+        self.assertEqual(response.data['last_seq'], 2, "Unexpected last sequence number.")
+        self.assertFalse(response.data['complete'], "Draft was unexpectedly completed.")
+
+        draft = CoachSurveySubmissionDraft.objects.get(user=user, survey=survey)
+        self.assertEqual(draft.submission_data, {'first': '3', 'second': '2'}, "Answers were not applied in order.")
+        self.assertTrue(draft.consent, "Consent was not stored.")
+
+    def test_retried_batch_skipped(self):
+        """Test that resending deltas that were already applied does not overwrite newer answers."""
+        user = create_user()
+        survey = self.create_survey()
+
+        self.client.force_authenticate(user=user)
+        self.client.post(reverse('api:surveys-answers', kwargs={'pk': survey.pk}), {
+            'deltas': [{'seq': 1, 'answers': {'first': '1'}}, {'seq': 2, 'answers': {'first': '2'}}]
+        }, format='json')
+        response = self.client.post(reverse('api:surveys-answers', kwargs={'pk': survey.pk}), {
+            'deltas': [{'seq': 1, 'answers': {'first': '1'}}, {'seq': 3, 'answers': {'second': '3'}}]
+        }, format='json')
+
+        self.assertEqual(response.data['last_seq'], 3, "Unexpected last sequence number.")
+
+        draft = CoachSurveySubmissionDraft.objects.get(user=user, survey=survey)
+        self.assertEqual(draft.submission_data, {'first': '2', 'second': '3'}, "Retried delta was applied again.")
+
+    def test_batch_submit(self):
+        """Test that a batch can complete the submission, and that retrying it afterwards is harmless."""
+        user = create_user()
+        survey = self.create_survey()
+        batch = {
+            'deltas': [
+                {'seq': 1, 'answers': {CoachSurvey.CONSENT_KEY: CoachSurvey.ANSWER_YES, 'first': '1'}},
+                {'seq': 2, 'answers': {'second': '2'}},
+            ],
+            'submit': True
+        }
+
+        self.client.force_authenticate(user=user)
+        response = self.client.post(reverse('api:surveys-answers', kwargs={'pk': survey.pk}), batch, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, "Answer batch request failed.")
+        self.assertTrue(response.data['complete'], "Draft was not completed.")
+
+        submission = CoachSurveySubmission.objects.get(user=user, page=survey)
+        self.assertTrue(submission.consent, "Consent was not passed to submission.")
+        self.assertEqual(json.loads(submission.form_data).get('second'), '2', "Answer missing from submission.")
+
+        response = self.client.post(reverse('api:surveys-answers', kwargs={'pk': survey.pk}), batch, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, "Retried batch was rejected.")
+        self.assertEqual(CoachSurveySubmission.objects.filter(user=user, page=survey).count(), 1,
+                         "Retried batch created a second submission.")
+
+    def test_unordered_batch_rejected(self):
+        """Test that sequence numbers must be ascending."""
+        user = create_user()
+        survey = self.create_survey()
+
+        self.client.force_authenticate(user=user)
+        response = self.client.post(reverse('api:surveys-answers', kwargs={'pk': survey.pk}), {
+            'deltas': [{'seq': 2, 'answers': {'first': '1'}}, {'seq': 1, 'answers': {'first': '2'}}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, "Unordered batch was accepted.")
+
 
 class SurveyReportingRequirements(APITestCase):
     def test_survey_report_aggregation(self):
@@ -422,19 +563,115 @@ class SurveyReportingRequirements(APITestCase):
         users = [create_user('anon' + str(i)) for i in range(10)]
         surveys = []
         for i in range(3):
-            survey = create_survey('Survey ' + str(i))
+            survey = create_survey('Survey ' + str(i), deliver_after=i)
+            survey.form_fields.create(
+                key='survey_test_intro',
+                label='Intro',
+                field_type=SINGLE_LINE,
+                required=False
+            )
+            survey.form_fields.create(
+                key='survey_test_q1_consent',
+                label='Over 17',
+                field_type=SINGLE_LINE,
+                required=False
+            )
             publish(survey, staff)
             surveys.append(survey)
 
-        # Users who submitted drafts
-        for user in users[0:7]:
+        # Users who declined the introduction
+        for user in users[0:2]:
             self.client.force_authenticate(user=user)
+            self.client.patch(reverse('api:surveys-draft', kwargs={'pk': surveys[0].pk}), {
+                'survey_test_intro': CoachSurvey.ANSWER_NO
+            }, format='json')
 
-            # Survey 1
-            self.client.put(reverse('api:surveys-draft', kwargs={'pk': surveys[0].pk}), {}, format='json')
+        # Users who did not consent
+        for user in users[2:4]:
+            self.client.force_authenticate(user=user)
+            self.client.patch(reverse('api:surveys-draft', kwargs={'pk': surveys[0].pk}), {
+                'survey_test_intro': CoachSurvey.ANSWER_YES,
+                CoachSurvey.CONSENT_KEY: CoachSurvey.ANSWER_NO
+            }, format='json')
+
+        # Users who consented
+        for user in users[4:7]:
+            self.client.force_authenticate(user=user)
+            self.client.patch(reverse('api:surveys-draft', kwargs={'pk': surveys[0].pk}), {
+                'survey_test_intro': CoachSurvey.ANSWER_YES,
+                CoachSurvey.CONSENT_KEY: CoachSurvey.ANSWER_YES
+            }, format='json')
+
+        # Users who completed the survey
+        for user, over_17 in ((users[4], CoachSurvey.ANSWER_YES), (users[5], CoachSurvey.ANSWER_NO)):
+            self.client.force_authenticate(user=user)
+            self.client.post(reverse('api:surveys-submission', kwargs={'pk': surveys[0].pk}), {
+                CoachSurvey.CONSENT_KEY: CoachSurvey.ANSWER_YES,
+                'survey_test_intro': CoachSurvey.ANSWER_YES,
+                'survey_test_q1_consent': over_17
+            }, format='json')
+
+        # Deactivated users are left out of every count
+        RegUser.objects.create(username='inactive', is_active=False)
+
+        aggregates = survey_aggregates()
+
+        self.assertEqual([a['name'] for a in aggregates], ['Survey 0', 'Survey 1', 'Survey 2'],
+                         "Unexpected surveys in report.")
+
+        report = aggregates[0]
+        self.assertEqual(report['completed'], 2, "Unexpected number of completed submissions.")
+        self.assertEqual(report['in_progress'], 5, "Unexpected number of drafts in progress.")
+        self.assertEqual(report['no_consent'], 2, "Unexpected number of users without consent.")
+        self.assertEqual(report['declined_intro'], 2, "Unexpected number of users who declined the introduction.")
+        self.assertEqual(report['claims_over_17'], 1, "Unexpected number of users older than 17.")
+        self.assertEqual(report['no_engagement'], 4, "Unexpected number of users who did not respond.")
+
+        self.assertEqual(aggregates[1]['completed'], 0, "Unexpected submissions for unanswered survey.")
+        self.assertEqual(aggregates[1]['no_engagement'], 11, "Unexpected number of users who did not respond.")
+
+
+class SurveyExportTests(APITestCase):
+    def test_columns_from_form_fields(self):
+        """Test that question columns are taken from the survey's form fields, and that answer codes are labelled."""
+        user = create_user()
+        survey = create_survey(bot_conversation=CoachSurvey.BASELINE)
+        survey.form_fields.create(
+            key='survey_baseline_q10_save',
+            label='Save',
+            field_type=RADIO_FIELD,
+            choices='0,1,999'
+        )
+        survey.form_fields.create(
+            key='survey_baseline_q03_school_name',
+            label='School',
+            field_type=SINGLE_LINE
+        )
+        publish(survey, create_user('Staff'))
+
+        self.client.force_authenticate(user=user)
+        self.client.post(reverse('api:surveys-submission', kwargs={'pk': survey.pk}), {
+            CoachSurvey.CONSENT_KEY: CoachSurvey.ANSWER_YES,
+            'survey_baseline_q10_save': '1',
+            'survey_baseline_q03_school_name': 'SMK 1'
+        }, format='json')
 
-        survey_aggregates()
-        self.skipTest('TODO')
+        export = SurveyExport(CoachSurvey.objects.filter(bot_conversation=CoachSurvey.BASELINE))
+        header = export.header()
+        rows = list(export.rows())
+
+        self.assertEqual(header[-2:], ['survey_baseline_q10_save', 'survey_baseline_q03_school_name'],
+                         "Unexpected question columns.")
+        self.assertEqual(len(rows), 1, "Unexpected number of rows.")
+        self.assertEqual(rows[0][-2:], ['Yes', 'SMK 1'], "Unexpected answers.")
+        self.assertEqual(rows[0][header.index('user_type_source_medium')], '', "Unexpected user type.")
+        self.assertEqual(rows[0][header.index('younger_than_17')], '', "Unexpected age consent.")
+        self.assertEqual(rows[0][header.index('city')], '', "Unexpected city.")
+
+    def test_unlabelled_code(self):
+        """Test that answer codes without a label are exported as is."""
+        self.assertEqual(SurveyExport.format_answer('survey_baseline_q10_save', '999'), '999')
+        self.assertEqual(SurveyExport.format_answer('survey_eatool_q01_appreciate', '3'), '3')
 
 
 class SurveyDataPreservationTests(APITestCase):
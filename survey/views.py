@@ -1,6 +1,5 @@
 
-import json
-
+from django.db import transaction
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import status
 from rest_framework.exceptions import ValidationError, MethodNotAllowed
@@ -11,7 +10,7 @@ from rest_framework.viewsets import ModelViewSet
 
 from .exceptions import DuplicateSurveySubmissionError
 from .models import CoachSurvey, CoachSurveySubmission, CoachSurveyResponse, CoachSurveySubmissionDraft
-from .serializers import CoachSurveySerializer, CoachSurveyResponseSerializer
+from .serializers import CoachSurveySerializer, CoachSurveyResponseSerializer, CoachSurveyAnswerBatchSerializer
 
 
 class CoachSurveyViewSet(ModelViewSet):
@@ -52,38 +51,83 @@ class CoachSurveyViewSet(ModelViewSet):
             # Users cannot submit multiple times
             raise DuplicateSurveySubmissionError()
 
-        data = json.loads(draft.submission_data) if draft.submission_data else {}
-
         # We don't want consent to default to False in a partial update
+        consent = None
         if CoachSurvey.CONSENT_KEY in request.data:
-            draft.consent = CoachSurveyViewSet.pop_consent(request.data)
+            consent = CoachSurveyViewSet.pop_consent(request.data)
 
-        data.update(request.data)
-        draft.submission_data = json.dumps(data)
-        draft.save()
+        draft.merge(dict(request.data.items()), consent=consent)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @detail_route(['post'])
-    def submission(self, request, pk=None, *args, **kwargs):
-        survey = self.get_object()
-
-        if CoachSurveySubmission.objects.filter(page=survey, user=request.user).exists():
-            raise DuplicateSurveySubmissionError()
-
-        consent = CoachSurveyViewSet.pop_consent(request.data)
+    @staticmethod
+    def complete_submission(survey, user, data, consent):
         # Leveraging form to validate fields
-        form = survey.get_form(request.data, page=survey, user=request.user)
+        form = survey.get_form(data, page=survey, user=user)
         if form.is_valid():
-            draft, created = CoachSurveySubmissionDraft.objects.get_or_create(user=request.user, survey=survey,
+            draft, created = CoachSurveySubmissionDraft.objects.get_or_create(user=user, survey=survey,
                                                                               submission=None, complete=False)
             draft.submission = survey.process_consented_submission(consent, form)
             draft.complete = True
             draft.save()
-            return Response(status=status.HTTP_204_NO_CONTENT)
         else:
             raise ValidationError(form.errors)
 
+    @detail_route(['post'])
+    def submission(self, request, pk=None, *args, **kwargs):
+        survey = self.get_object()
+
+        if CoachSurveySubmission.objects.filter(page=survey, user=request.user).exists():
+            raise DuplicateSurveySubmissionError()
+
+        consent = CoachSurveyViewSet.pop_consent(request.data)
+        CoachSurveyViewSet.complete_submission(survey, request.user, request.data, consent)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @detail_route(['post'])
+    def answers(self, request, pk=None, *args, **kwargs):
+        """Applies a batch of answers to the user's draft in one transaction, and optionally completes the submission.
+
+        Each delta carries a client sequence number. Deltas that the draft has already applied are skipped, so a batch
+        can safely be sent again after a dropped connection.
+        """
+        survey = self.get_object()
+        serializer = CoachSurveyAnswerBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            draft, created = CoachSurveySubmissionDraft.objects.get_or_create(user=request.user, survey=survey)
+            draft = CoachSurveySubmissionDraft.objects.select_for_update().get(pk=draft.pk)
+
+            deltas = [d for d in serializer.validated_data['deltas'] if d['seq'] > draft.last_sequence]
+            if deltas:
+                if draft.complete or draft.submission is not None:
+                    # Users cannot submit multiple times
+                    raise DuplicateSurveySubmissionError()
+
+                data = {}
+                consent = None
+                for delta in deltas:
+                    answers = dict(delta['answers'])
+                    if CoachSurvey.CONSENT_KEY in answers:
+                        consent = CoachSurveyViewSet.pop_consent(answers)
+                    data.update(answers)
+
+                draft.merge(data, consent=consent, sequence=deltas[-1]['seq'])
+
+        # Answers are kept even if the submission turns out to be invalid
+        if serializer.validated_data['submit']:
+            with transaction.atomic():
+                draft = CoachSurveySubmissionDraft.objects.select_for_update().get(pk=draft.pk)
+                if not draft.complete:
+                    CoachSurveyViewSet.complete_submission(survey, request.user, draft.submission_data, draft.consent)
+                    draft.refresh_from_db()
+
+        return Response({
+            'last_seq': draft.last_sequence,
+            'complete': draft.complete
+        })
+
     @list_route(['get'])
     def current(self, request, *args, **kwargs):
         survey, inactivity_age = CoachSurvey.get_current(request.user)
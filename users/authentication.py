@@ -0,0 +1,75 @@
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.deprecation import CallableFalse, CallableTrue
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.cache import make_key, memoize
+
+
+# Seconds a token's user id and flags are cached. They're forgotten when the token is deleted, and when its user is
+# deactivated, changes staff status or logs out, so this only bounds how long queryset updates go unnoticed.
+TOKEN_CACHE_TIMEOUT = 60
+
+TOKEN_CACHE_NAMESPACE = 'auth-tokens'
+
+# What authentication and permission checks need to know about a token's user
+TokenUser = namedtuple('TokenUser', ('user_id', 'is_active', 'is_staff'))
+
+
+@memoize(TOKEN_CACHE_NAMESPACE, timeout=TOKEN_CACHE_TIMEOUT)
+def get_token_user(key):
+    """The user id and flags of the token with the key. None when there's no such token."""
+    row = Token.objects.filter(key=key).values_list('user_id', 'user__is_active', 'user__is_staff').first()
+    if row is None:
+        return None
+
+    # Remembered so the token can be forgotten when its user changes, without looking it up
+    cache.set(make_key(TOKEN_CACHE_NAMESPACE, 'user', row[0]), key, TOKEN_CACHE_TIMEOUT)
+    return TokenUser(*row)
+
+
+def forget_user_tokens(user):
+    key = cache.get(make_key(TOKEN_CACHE_NAMESPACE, 'user', user.pk))
+    if key is not None:
+        get_token_user.forget(key)
+
+
+class TokenAuthenticatedUser(SimpleLazyObject):
+    """The user of a token, loaded from the database the first time a field other than its id or flags is read.
+
+    Requests that only check permissions don't load the user at all.
+    """
+
+    is_authenticated = CallableTrue
+    is_anonymous = CallableFalse
+
+    def __init__(self, token_user):
+        super(TokenAuthenticatedUser, self).__init__(lambda: User.objects.get(pk=token_user.user_id))
+        # Set on the proxy itself, because setting attributes on a lazy object loads it
+        self.__dict__.update(pk=token_user.user_id, id=token_user.user_id, is_active=token_user.is_active,
+                             is_staff=token_user.is_staff)
+
+    def __bool__(self):
+        return True
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that reads the users of tokens from the shared cache, rather than the database on every
+    request. Only the user's id and flags are cached, and the user is loaded when a view needs more.
+    """
+
+    def authenticate_credentials(self, key):
+        token_user = get_token_user(key)
+        if token_user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token_user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return TokenAuthenticatedUser(token_user), Token(key=key, user_id=token_user.user_id)
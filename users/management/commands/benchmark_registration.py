@@ -0,0 +1,54 @@
+from time import perf_counter
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from users.registration import register_user
+
+
+class Command(BaseCommand):
+    help = """Measures how many sign ups a single worker thread can register per second.
+
+    Users are registered the way the registration endpoint does, in a transaction that's rolled back afterwards. Run it
+    against a copy of the production database to include its indexes and constraints. The time spent hashing
+    passwords is reported separately, because it's a fixed cost of each sign up."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=100,
+            help="Number of users to register"
+        )
+
+    def handle(self, *args, **kwargs):
+        count = kwargs['count']
+        if count < 1:
+            raise CommandError('Count must be at least 1')
+
+        prefix = 'benchmark-%s' % uuid4().hex[:8]
+        latencies = []
+
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            start = perf_counter()
+            for i in range(count):
+                signup_start = perf_counter()
+                register_user('benchmark', profile={'mobile': '+27%09d' % i}, username='%s-%d' % (prefix, i))
+                latencies.append(perf_counter() - signup_start)
+            elapsed = perf_counter() - start
+            transaction.set_rollback(True)
+
+        start = perf_counter()
+        for _ in range(count):
+            make_password('benchmark')
+        hashing = perf_counter() - start
+
+        latencies.sort()
+        self.stdout.write('sign ups per second   %10.1f' % (count / elapsed))
+        self.stdout.write('p50 ms                %10.1f' % (latencies[len(latencies) // 2] * 1000))
+        self.stdout.write('p95 ms                %10.1f' % (latencies[min(count - 1, count * 95 // 100)] * 1000))
+        self.stdout.write('hashing ms            %10.1f' % (hashing / count * 1000))
+        self.stdout.write('queries per sign up   %10.1f' % (len(queries) / count))
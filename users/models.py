@@ -5,15 +5,19 @@ import uuid
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
 from django.core.validators import MinLengthValidator, RegexValidator
 from django.db import models
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_init, pre_save, post_save
 from django.dispatch import receiver
 from django.utils.encoding import python_2_unicode_compatible
 from rest_framework.authtoken.models import Token
 
+from .authentication import forget_user_tokens, get_token_user
 from .storage import ProfileImgStorage
 from content.models import Entry, Participant
+from core.cache import invalidate_on
+from core.models import DirtyFieldsMixin, get_dirty_fields, remember_values
 
 
 # proxy managers
@@ -69,7 +73,7 @@ def get_profile_image_filename(instance, filename):
 
 # user profile information
 @python_2_unicode_compatible
-class Profile(models.Model):
+class Profile(DirtyFieldsMixin, models.Model):
     # constants
     text_min_length = 6
 
@@ -186,24 +190,42 @@ class CampaignInformation(models.Model):
     medium = models.TextField(_('medium'), blank=False, null=True)
 
 
-def reset_token(sender, instance, **kwargs):
+def reset_token(sender, instance, update_fields=None, **kwargs):
     """Invalidates a token when a user's password is changed."""
-    new_password = instance.password
+    # A user that wasn't saved yet has no tokens
+    if instance.pk is None:
+        return
 
-    try:
-        old_password = User.objects.get(pk=instance.pk).password
-    except User.DoesNotExist:
-        old_password = None
+    if update_fields is not None and 'password' not in update_fields:
+        return
 
-    if new_password != old_password:
+    if 'password' in get_dirty_fields(instance):
         Token.objects.filter(user=instance).delete()
 
 
+def forget_cached_tokens(sender, instance, created=False, **kwargs):
+    # Only the flags are cached with the user's token. Password changes delete the token in `reset_token`.
+    if not created and get_dirty_fields(instance) & {'is_active', 'is_staff'}:
+        forget_user_tokens(instance)
+
+
+def forget_tokens_on_logout(sender, user=None, **kwargs):
+    if user is not None:
+        forget_user_tokens(user)
+
+
 # Django signals do not consider subclasses of the sender. When connected using User, RegUser will not trigger the
 # handler. Each model is registered separately.
 MODEL_CLASSES = (User, RegUser, SysAdminUser)
 for model in MODEL_CLASSES:
+    # `User` can't inherit `DirtyFieldsMixin`, so its loaded values are tracked with signals
+    post_init.connect(remember_values, model)
     pre_save.connect(reset_token, model)
+    post_save.connect(forget_cached_tokens, model)
+
+# Cached tokens are forgotten when deleted by `reset_token`, and when their user's flags change or they log out
+invalidate_on(get_token_user, Token, args=lambda token: (token.key,))
+user_logged_out.connect(forget_tokens_on_logout)
 
 
 @receiver(post_save, sender=User)
@@ -214,4 +236,12 @@ def create_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    # A profile that wasn't loaded can't have unsaved changes
+    profile = getattr(instance, User.profile.cache_name, None)
+    if profile is not None and profile.is_dirty():
+        profile.save()
+
+
+# Connected last, so the handlers above can still tell what changed
+for model in MODEL_CLASSES:
+    post_save.connect(remember_values, model)
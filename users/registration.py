@@ -0,0 +1,24 @@
+from django.db import transaction
+
+from .models import Profile, RegUser, UserUUID
+
+
+@transaction.atomic
+def register_user(password, profile=None, **fields):
+    """Registers a user with their profile and Google Analytics ID, in one transaction.
+
+    The password is hashed before the user is inserted, so each row is written once. The user's endline survey
+    selection is created by `survey.models.create_survey_link`, in the same transaction.
+
+    :param password: The raw password.
+    :param profile:  Fields of the user's profile.
+    :param fields:   Fields of the user.
+    :return:         The new user, with its profile loaded.
+    """
+    user = RegUser(**fields)
+    user.set_password(password)
+    user.save()
+
+    Profile.objects.create(user=user, **(profile or {}))
+    UserUUID.objects.create(user=user)
+    return user
@@ -2,6 +2,7 @@ from django.core.validators import EmailValidator
 from rest_framework import serializers
 from rest_framework.reverse import reverse
 from .models import Profile, RegUser
+from .registration import register_user
 
 
 class RegUserSerializer(serializers.ModelSerializer):
@@ -72,15 +73,9 @@ class RegUserDeepSerializer(serializers.ModelSerializer):
                     data['username'] = profile.get('mobile')
 
     def create(self, validated_data):
-        user_data = validated_data
         profile_data = validated_data.pop('profile')
         password = validated_data.pop('password')
-        user = RegUser.objects.create(**user_data)
-        # Required to hash password
-        user.set_password(password)
-        user.save()
-        profile = Profile.objects.create(user=user, **profile_data)
-        return user
+        return register_user(password, profile=profile_data, **validated_data)
 
     def update(self, instance, validated_data):
         # TODO: Do not allow password to be updated via RegUserDeepSerializer
@@ -5,12 +5,21 @@ from io import BytesIO
 
 from django import test
 from django.core.files import File
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.test import APITestCase
-from .models import User, RegUser, SysAdminUser, Profile
+from PIL import Image as PILImage
+from content.images import get_image_path
+from content.tasks import generate_image_renditions
+from survey.models import EndlineSurveySelectUser
+from .authentication import CachedTokenAuthentication
+from .models import User, RegUser, SysAdminUser, Profile, UserUUID
+from .registration import register_user
 from .serializers import RegUserDeepSerializer
 
 
@@ -84,6 +93,18 @@ class TestUserAPI(APITestCase):
         self.assertEqual(user.profile.age, 18, "Unexpected age.")
         self.assertEqual(user.profile.gender, Profile.GENDER_FEMALE, "Unexpected gender.")
 
+    def test_registration_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            user = register_user('blargh', profile={'mobile': '1112223334'}, username='anon')
+
+        writes = [q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(len(writes), 4, "User, profile, UUID and endline selection were not each written once.")
+        self.assertTrue(user.check_password('blargh'), "Password was not hashed.")
+        self.assertEqual(Profile.objects.get(user=user).mobile, '1112223334', "Profile was not created.")
+        self.assertTrue(UserUUID.objects.filter(user=user).exists(), "Google Analytics ID was not created.")
+        self.assertTrue(EndlineSurveySelectUser.objects.filter(user=user).exists(),
+                        "Endline selection was not created.")
+
     def test_username_update(self):
         user = RegUser.objects.create(username='First', password='password1')
 
@@ -277,6 +298,64 @@ class TestToken(test.TestCase):
 
         self.assertEqual(token, new_token, "Token was changed unexpectedly.")
 
+    def test_authentication_cached(self):
+        user = self.create_user('anon')
+        token, _ = Token.objects.get_or_create(user=user)
+        auth = CachedTokenAuthentication()
+
+        auth.authenticate_credentials(token.key)
+        with self.assertNumQueries(0):
+            auth_user, auth_token = auth.authenticate_credentials(token.key)
+            self.assertTrue(auth_user and auth_user.is_authenticated and auth_user.is_active)
+            self.assertFalse(auth_user.is_staff)
+
+        self.assertEqual(auth_user.pk, user.pk, "Token authenticated the wrong user.")
+        self.assertEqual(auth_token, token)
+
+        # Other fields are read from the user, loaded on first use
+        with self.assertNumQueries(1):
+            self.assertEqual(auth_user.username, 'anon')
+            self.assertEqual(auth_user, user)
+
+    def test_cached_token_user_saved(self):
+        user = self.create_user('anon')
+        token, _ = Token.objects.get_or_create(user=user)
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+
+        user.first_name = 'Anon'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertFalse([q for q in queries if Token._meta.db_table in q['sql']],
+                         "Tokens were looked up for a change authentication doesn't read.")
+
+        with self.assertNumQueries(0):
+            auth.authenticate_credentials(token.key)
+
+    def test_cached_token_reset(self):
+        user = self.create_user('anon', password='first')
+        token, _ = Token.objects.get_or_create(user=user)
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+
+        user.set_password('second')
+        user.save()
+
+        with self.assertRaises(AuthenticationFailed, msg="Reset token still authenticates."):
+            auth.authenticate_credentials(token.key)
+
+    def test_cached_token_user_deactivated(self):
+        user = self.create_user('anon')
+        token, _ = Token.objects.get_or_create(user=user)
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+
+        user.is_active = False
+        user.save()
+
+        with self.assertRaises(AuthenticationFailed, msg="Token of inactive user still authenticates."):
+            auth.authenticate_credentials(token.key)
+
 
 class TestProfile(test.TestCase):
 
@@ -298,6 +377,24 @@ class TestProfile(test.TestCase):
 
         self.assertFalse(user.profile.is_joined_days_passed(threshold))
 
+    def test_profile_saved_with_user(self):
+        User.objects.create(username='anon')
+        user = User.objects.get(username='anon')
+
+        user.profile.mobile = '+27000000000'
+        user.save()
+
+        self.assertEqual(Profile.objects.get(user=user).mobile, '+27000000000', "Profile changes were not saved.")
+
+    def test_login_update_queries(self):
+        User.objects.create(username='anon')
+        user = User.objects.get(username='anon')
+
+        # Only the user is updated, without checking its password or saving its profile
+        with self.assertNumQueries(1):
+            user.last_login = timezone.now()
+            user.save(update_fields=['last_login'])
+
 
 class TestProfileImage(APITestCase):
 
@@ -328,6 +425,28 @@ class TestProfileImage(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_profile_image_reupload(self):
+        """Renditions of a replaced profile image must not be served for the new one."""
+        user = self.create_user()
+        url = reverse('api:profile-image', kwargs={'user_pk': user.pk})
+        self.client.force_login(user=user)
+
+        def upload(color):
+            buffer = BytesIO()
+            PILImage.new('RGB', (400, 300), color).save(buffer, 'PNG')
+            response = self.client.post(url, buffer.getvalue(), content_type='image/png',
+                                        HTTP_CONTENT_DISPOSITION='attachment;filename="profile.png"')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            return Profile.objects.get(user=user).profile_image
+
+        image = upload((255, 0, 0))
+        self.addCleanup(image.storage.delete, image.name)
+        generate_image_renditions('users', 'profile', user.profile.pk, 'profile_image')
+        self.assertNotEqual(get_image_path(image, 'thumb'), image.path, "Rendition was not created.")
+
+        image = upload((0, 0, 255))
+        self.assertEqual(get_image_path(image, 'thumb'), image.path, "Rendition of the replaced image was served.")
+
     def test_profile_image_upload_for_admin(self):
         user = self.create_admin_user()
 
@@ -14,6 +14,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from sendfile import sendfile
 
+from content.images import get_image_path, get_requested_size
+from content.tasks import schedule_image_renditions
 from .exceptions import PasswordNotMatching
 from .models import Profile, RegUser, User, UserUUID
 from .permissions import IsUserSelf, IsRegisteringOrSelf
@@ -47,6 +49,7 @@ class ProfileImageView(GenericAPIView):
         self.check_object_permissions(request, user)
         user.profile.profile_image = request.FILES['file']
         user.profile.save()
+        schedule_image_renditions(user.profile, 'profile_image')
         response = Response(status=status.HTTP_204_NO_CONTENT)
         response['Location'] = request.build_absolute_uri(reverse('api:profile-image', kwargs={'user_pk': user.pk}))
         return response
@@ -55,7 +58,8 @@ class ProfileImageView(GenericAPIView):
         user = get_object_or_404(User, pk=user_pk)
         self.check_object_permissions(request, user)
         if user.profile.profile_image:
-            return sendfile(request, user.profile.profile_image.path, attachment=True)
+            image_path = get_image_path(user.profile.profile_image, get_requested_size(request))
+            return sendfile(request, image_path, attachment=True)
         else:
             raise NotFound('User has no profile image.')
 